@@ -0,0 +1,65 @@
+import sys
+import importlib
+from pathlib import Path
+
+# 단일 진입점: python src/cli.py <서브커맨드> [옵션]
+#
+# 서브커맨드 이름만 보고 해당 모듈을 그때 import하므로, numpy/tenseal/pandas/sklearn 같은
+# 무거운 의존성은 그 서브커맨드가 실제로 쓰는 것만 로드된다 (이 파일은 표준 라이브러리만 사용).
+# 옵션은 각 모듈의 main(argv)이 그대로 해석한다.
+
+SRC_DIR = Path(__file__).parent
+
+# 서브커맨드 -> (모듈 디렉토리, 모듈 이름, 설명)
+COMMANDS = {
+    'prepare': ('utils', 'data_prep', 'MovieLens 전처리 (--delta: 증분 갱신)'),
+    'keygen': ('utils', 'keygen', 'CKKS 키 생성'),
+    'encrypt': ('client', 'encrypt', '사용자 벡터 암호화 (--batch, --changed, --all)'),
+    'evaluate': ('server', 'evaluator', '서버 동형 연산'),
+    'decrypt': ('client', 'decrypt', '점수 복호화 및 Top-K 추천'),
+    'pipeline': ('utils', 'pipeline', '전체 파이프라인 (입력이 바뀐 단계만 실행)'),
+    'serve': ('server', 'service', '상주 평가 서비스'),
+    'request': ('client', 'service_client', '평가 서비스에 점수 요청'),
+    'batch': ('utils', 'batch_driver', 'JSONL 요청 스트림 마이크로배치 처리 (사용자 중복 제거)'),
+    'scaling': ('server', 'parallel', '워커 수별 확장성 벤치마크'),
+    'ivf-benchmark': ('utils', 'ivf_benchmark', 'IVF 2단계 검색 vs 전수 평가 비교'),
+    'tune': ('utils', 'param_tuner', 'CKKS 파라미터 튜닝'),
+    'benchmark': ('utils', 'benchmark', '합성 데이터 단계별 벤치마크'),
+    'log-benchmark': ('utils', 'log_benchmark', '로깅 백엔드별 오버헤드 측정'),
+    'startup': ('utils', 'startup_benchmark', '서브커맨드별 시작 시간 벤치마크')
+}
+
+def load_command(name):
+    """서브커맨드 모듈 import (모듈 간 bare import를 위해 src 하위 디렉토리를 경로에 추가)"""
+    for directory in ('utils', 'server', 'client'):
+        path = str(SRC_DIR / directory)
+        if path not in sys.path:
+            sys.path.append(path)
+    return importlib.import_module(COMMANDS[name][1])
+
+def print_usage():
+    print(f"사용법: python {Path(sys.argv[0]).name} <서브커맨드> [옵션]\n")
+    print("서브커맨드:")
+    for name, (_, module, description) in COMMANDS.items():
+        print(f"  {name:<14} {description} ({module}.py)")
+    print("\n서브커맨드 옵션: python src/cli.py <서브커맨드> --help")
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ('-h', '--help'):
+        print_usage()
+        return 0
+    if argv[0] not in COMMANDS:
+        print(f"알 수 없는 서브커맨드: {argv[0]}\n")
+        print_usage()
+        return 2
+    
+    name = argv[0]
+    module = load_command(name)
+    # argparse 사용법 출력에 서브커맨드 이름이 나오도록
+    sys.argv[0] = f'{Path(sys.argv[0]).name} {name}'
+    module.main(argv[1:])
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
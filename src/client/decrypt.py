@@ -1,55 +1,284 @@
+import sys
+import time
 import numpy as np
 import tenseal as ts
-import pickle
-import yaml
+from pathlib import Path
 
-def load_secret_context():
-    with open('keys/secret_context.bin', 'rb') as f:
-        return ts.context_from(f.read())
+sys.path.append(str(Path(__file__).parent.parent / 'utils'))
+from container import ScoreContainerReader, ckks_header
+from report_generator import ExperimentReporter
+from context_registry import load_secret_context, load_config, report_context_registry
+from catalog import load_catalog, check_segments
+from instrumentation import span
 
-def load_config():
-    with open('config/params.yaml', 'r') as f:
-        return yaml.safe_load(f)
+def open_score_container(path, seal_config):
+    """점수 컨테이너를 열고 CKKS 파라미터가 설정과 같은지 확인"""
+    reader = ScoreContainerReader(path)
+    if reader.header['ckks'] != ckks_header(seal_config):
+        reader.close()
+        raise ValueError(f"점수 파일의 CKKS 파라미터가 설정과 다릅니다: {reader.header['ckks']}")
+    return reader
 
-def decrypt_and_recommend(user_id=0):
-    """복호화 및 Top-K 추천"""
-    context = load_secret_context()
-    config = load_config()['recommendation']
-    
-    # 암호화된 점수 로드
-    with open(f'data/encrypted/scores_user_{user_id}.npy', 'rb') as f:
-        encrypted_scores_ser = pickle.load(f)
-    
-    # 복호화
-    print("점수 복호화 중...")
-    scores = []
-    for enc_ser in encrypted_scores_ser:
-        enc = ts.ckks_vector_from(context, enc_ser)
-        scores.append(enc.decrypt()[0])
-    
-    scores = np.array(scores)
-    
-    # 임계값 필터링
-    threshold = config['threshold']
+def iter_decrypted_chunks(context, reader, stats=None):
+    """암호문을 하나씩 복호화해 (시작 아이템, (아이템 수, slots_per_item) 점수) 생성
+
+    복호화한 암호문은 바로 버리므로 카탈로그가 커져도 한 번에
+    암호문 하나 분량의 점수만 메모리에 올라온다.
+    stats(dict)를 넘기면 역직렬화+복호화 시간, 암호문 크기, 모듈러스 레벨을 누적한다.
+    """
+    slots_per_item = reader.header.get('slots_per_item', 1)
+    for start, count, enc_ser in reader:
+        decrypt_start = time.time()
+        with span('deserialize'):
+            encrypted = ts.ckks_vector_from(context, enc_ser)
+        with span('decrypt'):
+            values = encrypted.decrypt()[:count * slots_per_item]
+        if stats is not None:
+            stats['decrypt_time_sec'] = stats.get('decrypt_time_sec', 0.0) + time.time() - decrypt_start
+            stats['num_ciphertexts'] = stats.get('num_ciphertexts', 0) + 1
+            stats['score_bytes'] = stats.get('score_bytes', 0) + len(enc_ser)
+            stats['coeff_modulus_size'] = encrypted.ciphertext()[0].coeff_modulus_size()
+        yield start, np.reshape(values, (count, slots_per_item))
+
+def decrypt_scores(context, path, seal_config):
+    """점수 컨테이너 전체를 복호화 (정확도 비교 등 전체 점수가 필요한 경우)
+
+    Returns:
+        (num_items, slots_per_item) 점수 배열, 컨테이너 헤더
+    """
+    with open_score_container(path, seal_config) as reader:
+        # 빠진 범위가 있으면 초기화되지 않은 값이 점수로 남으므로 레코드가 모든 아이템을 덮는지 먼저 확인
+        check_segments(reader.header, layout=reader.layout)
+        scores = np.empty((reader.num_items, reader.header.get('slots_per_item', 1)))
+        for start, chunk in iter_decrypted_chunks(context, reader):
+            scores[start:start + len(chunk)] = chunk
+        return scores, reader.header
+
+def decrypt_layout_scores(context, ciphertexts, layout, slots_per_item=1):
+    """컨테이너 없이 받은 패킹 점수 암호문을 점수 배열로 복원 (IVF 단계별 응답, 배치 요청)
+
+    slots_per_item이 1이면 1차원 배열, 크면 (아이템 수, slots_per_item) 배열
+    (배치 암호문에서 아이템 i, 배치 행 r의 점수는 [i, r]).
+    """
+    scores = np.empty((max(start + count for start, count in layout), slots_per_item))
+    for enc_ser, (start, count) in zip(ciphertexts, layout):
+        with span('deserialize'):
+            encrypted = ts.ckks_vector_from(context, enc_ser)
+        with span('decrypt'):
+            values = encrypted.decrypt()[:count * slots_per_item]
+        scores[start:start + count] = np.reshape(values, (count, slots_per_item))
+    return scores[:, 0] if slots_per_item == 1 else scores
+
+def select_clusters(centroid_scores, nprobe):
+    """IVF 1단계: 중심 점수 상위 nprobe개 클러스터 (2단계 요청에 사용)"""
+    return np.argsort(-centroid_scores, kind='stable')[:nprobe]
+
+def select_top_k(scores, threshold, top_k):
+    """임계값 필터링 후 Top-K 인덱스 선택 (임계값 이상이 없으면 전체에서 선택)"""
     filtered_indices = np.where(scores >= threshold)[0]
-    print(f"임계값 {threshold} 이상인 아이템: {len(filtered_indices)}개")
     
-    # Top-K 선택
-    top_k = config['top_k']
     if len(filtered_indices) > 0:
         filtered_scores = scores[filtered_indices]
         top_k_in_filtered = np.argsort(filtered_scores)[-top_k:][::-1]
-        top_k_indices = filtered_indices[top_k_in_filtered]
-    else:
-        top_k_indices = np.argsort(scores)[-top_k:][::-1]
+        return filtered_indices[top_k_in_filtered], len(filtered_indices)
+    return np.argsort(scores)[-top_k:][::-1], 0
+
+class StreamingTopK:
+    """청크 단위로 들어오는 점수에서 열(사용자)별 Top-K를 유지
+
+    select_top_k와 같은 결과를 내지만 전체 점수 배열을 만들지 않는다.
+    임계값 이상인 아이템은 항상 전체 상위권에 속하므로, 전체 Top-K 후보와
+    임계값 이상 개수만 유지하다가 마지막에 임계값으로 거르면 된다.
+    후보 정리는 argpartition으로 하므로 메모리는 O(k + chunk_size)이다.
+    """
+    
+    def __init__(self, top_k, threshold, columns=1, chunk_size=4096):
+        self.top_k = top_k
+        self.threshold = threshold
+        self.chunk_size = max(chunk_size, top_k)
+        self.scores = np.empty((0, columns))
+        self.indices = np.empty((0, columns), dtype=np.int64)
+        self.num_filtered = np.zeros(columns, dtype=np.int64)
+        self.pending = []
+        self.pending_size = 0
+    
+    def update(self, start, chunk):
+        """아이템 [start, start + len(chunk)) 점수 추가 (chunk: (아이템 수, columns))"""
+        self.num_filtered += (chunk >= self.threshold).sum(axis=0)
+        self.pending.append((start, chunk))
+        self.pending_size += len(chunk)
+        if self.pending_size >= self.chunk_size:
+            self._compact()
+    
+    def _compact(self):
+        if not self.pending:
+            return
+        columns = self.scores.shape[1]
+        scores = np.concatenate([self.scores] + [chunk for _, chunk in self.pending])
+        indices = np.concatenate([self.indices] + [
+            np.repeat(np.arange(start, start + len(chunk))[:, None], columns, axis=1)
+            for start, chunk in self.pending
+        ])
+        self.pending = []
+        self.pending_size = 0
+        
+        if len(scores) > self.top_k:
+            keep = np.argpartition(-scores, self.top_k - 1, axis=0)[:self.top_k]
+            scores = np.take_along_axis(scores, keep, axis=0)
+            indices = np.take_along_axis(indices, keep, axis=0)
+        self.scores = scores
+        self.indices = indices
+    
+    def result(self, column=0):
+        """(Top-K 인덱스, 점수, 임계값 이상 개수) - 점수 내림차순"""
+        self._compact()
+        scores = self.scores[:, column]
+        indices = self.indices[:, column]
+        order = np.argsort(-scores, kind='stable')
+        scores, indices = scores[order], indices[order]
+        
+        num_filtered = int(self.num_filtered[column])
+        if num_filtered > 0:
+            mask = scores >= self.threshold
+            scores, indices = scores[mask], indices[mask]
+        return indices, scores, num_filtered
+
+def stream_top_k(context, path, seal_config, threshold, top_k, stats=None):
+    """점수 컨테이너를 스트리밍 복호화하며 Top-K 선택
+
+    카탈로그 세그먼트별로 계산되어 이어 붙은 점수 파일도 레코드마다 절대 아이템 위치를
+    가지므로, 세그먼트를 가로질러 하나의 Top-K로 합쳐진다.
+
+    Returns:
+        StreamingTopK (열 = 배치 행), 컨테이너 헤더
+    """
+    with open_score_container(path, seal_config) as reader:
+        warning = check_segments(reader.header, load_catalog(), reader.layout)
+        if warning:
+            print(f"경고: {warning}")
+        if reader.header.get('segments'):
+            print(f"카탈로그 버전 {reader.header['catalog_version']}, 세그먼트 {len(reader.header['segments'])}개")
+        print(f"점수 복호화 중... (암호문 {len(reader)}개)")
+        selector = StreamingTopK(top_k, threshold, columns=reader.header.get('slots_per_item', 1))
+        for start, chunk in iter_decrypted_chunks(context, reader, stats):
+            selector.update(start, chunk)
+        return selector, reader.header
+
+def report_decryption(reporter, stats, total_time, **parameters):
+    """클라이언트 복호화 시간과 점수 암호문 크기/레벨 기록"""
+    reporter.add_stage(
+        'Score Decryption',
+        metrics={
+            'decrypt_time_sec': stats['decrypt_time_sec'],
+            'decrypt_time_per_ciphertext_ms': stats['decrypt_time_sec'] / stats['num_ciphertexts'] * 1000,
+            'total_time_sec': total_time,
+            'num_ciphertexts': stats['num_ciphertexts'],
+            'encrypted_scores_size_kb': stats['score_bytes'] / 1024,
+            'coeff_modulus_size': stats['coeff_modulus_size']
+        },
+        parameters=parameters
+    )
+
+def save_report(reporter):
+    report_context_registry(reporter)
+    json_path = reporter.save_json()
+    reporter.generate_markdown_report()
+    print(f"\n복호화 결과 저장: {json_path}")
+
+def print_recommendations(user_id, indices, scores, item_ids, top_k, num_filtered, threshold):
+    print(f"\n사용자 {user_id}에 대한 Top-{top_k} 추천 (임계값 {threshold} 이상 {num_filtered}개):")
+    for rank, (idx, score) in enumerate(zip(indices, scores), 1):
+        print(f"  {rank}. 영화 ID {item_ids[idx]} (점수: {score:.4f})")
+
+def decrypt_and_recommend(user_id=0, context=None, config=None, item_ids=None, reporter=None):
+    """복호화 및 Top-K 추천
+
+    context/config/item_ids를 넘기면 다시 로드하지 않는다 (recommend_users 참고).
+    reporter를 넘기지 않으면 이 사용자 결과만 results/에 저장한다.
+    """
+    owns_reporter = reporter is None
+    reporter = reporter or ExperimentReporter('client_decryption')
+    context = context or load_secret_context()
+    config = config or load_config()
+    item_ids = item_ids if item_ids is not None else np.load('data/processed/item_ids.npy')
+    threshold = config['recommendation']['threshold']
+    top_k = config['recommendation']['top_k']
+    
+    # 스트리밍 복호화 + 임계값 필터링 + Top-K 선택
+    start_time = time.time()
+    stats = {}
+    selector, _ = stream_top_k(
+        context, f'data/encrypted/scores_user_{user_id}.bin', config['seal'], threshold, top_k, stats
+    )
+    top_k_indices, top_k_scores, num_filtered = selector.result()
+    report_decryption(reporter, stats, time.time() - start_time, user_id=user_id, top_k=top_k)
     
-    # 결과 출력
+    print_recommendations(user_id, top_k_indices, top_k_scores, item_ids, top_k, num_filtered, threshold)
+    if owns_reporter:
+        save_report(reporter)
+    return top_k_indices, top_k_scores
+
+def recommend_users(user_ids):
+    """비밀키 컨텍스트와 설정을 한 번만 로드해 여러 사용자의 점수 파일 처리
+
+    Returns:
+        {user_id: (Top-K 인덱스, 점수)}
+    """
+    context = load_secret_context()
+    config = load_config()
     item_ids = np.load('data/processed/item_ids.npy')
-    print(f"\n사용자 {user_id}에 대한 Top-{top_k} 추천:")
-    for rank, idx in enumerate(top_k_indices, 1):
-        print(f"  {rank}. 영화 ID {item_ids[idx]} (점수: {scores[idx]:.4f})")
+    reporter = ExperimentReporter('client_decryption')
+    
+    recommendations = {}
+    for user_id in user_ids:
+        recommendations[user_id] = decrypt_and_recommend(
+            user_id, context=context, config=config, item_ids=item_ids, reporter=reporter
+        )
+    save_report(reporter)
+    return recommendations
+
+def decrypt_batch_and_recommend(batch_id=0, context=None, config=None, item_ids=None):
+    """배치 점수 복호화 후 사용자별 Top-K 추천
+
+    packed 배치 암호문의 슬롯 (아이템 i, 배치 행 r)은 i * rows + r 위치에 있다.
+    """
+    context = context or load_secret_context()
+    config = config or load_config()
+    item_ids = item_ids if item_ids is not None else np.load('data/processed/item_ids.npy')
+    threshold = config['recommendation']['threshold']
+    top_k = config['recommendation']['top_k']
+    
+    print(f"배치 {batch_id} 점수 복호화")
+    start_time = time.time()
+    stats = {}
+    selector, header = stream_top_k(
+        context, f'data/encrypted/scores_batch_{batch_id}.bin', config['seal'], threshold, top_k, stats
+    )
     
-    return top_k_indices, scores[top_k_indices]
+    recommendations = {}
+    for row, user_id in enumerate(header['user_ids']):
+        top_k_indices, top_k_scores, num_filtered = selector.result(row)
+        recommendations[user_id] = (top_k_indices, top_k_scores)
+        print_recommendations(user_id, top_k_indices, top_k_scores, item_ids, top_k, num_filtered, threshold)
+    
+    reporter = ExperimentReporter('client_batch_decryption')
+    report_decryption(reporter, stats, time.time() - start_time, batch_id=batch_id,
+                      num_users=len(header['user_ids']), top_k=top_k)
+    save_report(reporter)
+    return recommendations
+
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='점수 복호화 및 Top-K 추천')
+    parser.add_argument('--user-id', type=int, nargs='+', default=[0], help='사용자 ID (여러 개면 컨텍스트를 한 번만 로드)')
+    parser.add_argument('--batch', type=int, default=None, help='배치 ID (evaluator.py --batch 결과)')
+    args = parser.parse_args(argv)
+    
+    if args.batch is not None:
+        decrypt_batch_and_recommend(batch_id=args.batch)
+    else:
+        recommend_users(args.user_id)
 
 if __name__ == '__main__':
-    decrypt_and_recommend(user_id=0)
+    main()
@@ -1,36 +1,124 @@
+import os
 import sys
+import json
 import time
+import resource
 import numpy as np
 import tenseal as ts
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 
 sys.path.append(str(Path(__file__).parent.parent / 'utils'))
-from logger import setup_logger, log_exception
+from logger import setup_logger, log_exception, forward_worker_logs
 from report_generator import ExperimentReporter
+from rotations import batch_layout
+from container import ScoreContainerWriter, ckks_header
+from user_shards import shard_path, write_shard_index, DEFAULT_SHARD_DIR
+from context_registry import load_secret_context, load_config, SECRET_CONTEXT_PATH
+from instrumentation import span, export_state, merge_state, reset as reset_spans
 
 logger = setup_logger('encrypt')
 
-def load_secret_context():
-    """비밀키 컨텍스트 로드"""
+def encrypt_batch_matrix(context, user_vectors, user_ids, rows, row_dim):
+    """user_ids 순서대로 배치 행에 채운 (rows, row_dim) 행렬을 enc_matmul_encoding으로 암호화"""
+    # 남는 행과 열은 0으로 채움
+    batch_matrix = np.zeros((rows, row_dim))
+    batch_matrix[:len(user_ids), :user_vectors.shape[1]] = user_vectors[user_ids]
+    with span('encrypt'):
+        return ts.enc_matmul_encoding(context, batch_matrix.tolist())
+
+def encrypt_user_batch(batch_id=0):
+    """여러 사용자를 하나의 암호문에 패킹하여 암호화
+
+    performance.batch_size명의 사용자 벡터를 행렬로 쌓아 enc_matmul_encoding으로
+    암호화한다. 서버는 아이템마다 평문 곱셈 1회와 회전 log2(row_dim)회로
+    배치 내 모든 사용자의 점수를 동시에 계산한다.
+    """
+    reporter = ExperimentReporter('batch_encryption')
+    
     try:
-        context_path = Path('keys/secret_context.bin')
-        logger.info(f"비밀키 컨텍스트 로드: {context_path}")
+        config = load_config()
+        slot_count = config['seal']['poly_modulus_degree'] // 2
+        batch_size = config['performance']['batch_size']
         
-        if not context_path.exists():
-            raise FileNotFoundError(f"비밀키 파일이 없습니다: {context_path}")
+        context = load_secret_context()
+        
+        user_vectors_path = Path('data/processed/user_vectors.npy')
+        logger.info(f"사용자 벡터 로드: {user_vectors_path}")
+        user_vectors = np.load(user_vectors_path)
+        
+        vector_dim = user_vectors.shape[1]
+        rows, row_dim = batch_layout(vector_dim, slot_count, batch_size)
+        
+        if rows < batch_size:
+            logger.warning(f"batch_size {batch_size} > 암호문 용량 {rows}: {rows}명으로 제한")
+        
+        user_ids = list(range(batch_id * rows, min((batch_id + 1) * rows, len(user_vectors))))
+        if not user_ids:
+            raise ValueError(f"유효하지 않은 배치 ID: {batch_id} (사용자 수: {len(user_vectors)})")
+        
+        logger.info("=" * 60)
+        logger.info(f"배치 {batch_id} 암호화 시작: 사용자 {user_ids[0]}-{user_ids[-1]} ({len(user_ids)}명)")
+        logger.info(f"배치 레이아웃: {rows}행 x {row_dim}열 (슬롯 {rows * row_dim}/{slot_count})")
+        logger.info("=" * 60)
+        
+        start_time = time.time()
+        encrypted_batch = encrypt_batch_matrix(context, user_vectors, user_ids, rows, row_dim)
+        encrypt_time = time.time() - start_time
+        logger.info(f"암호화 소요 시간: {encrypt_time:.3f}초 ({encrypt_time / len(user_ids):.4f}초/사용자)")
+        
+        # 저장
+        output_dir = Path('data/encrypted')
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        output_path = output_dir / f'batch_{batch_id}.bin'
+        with span('serialize'):
+            serialized = encrypted_batch.serialize()
+        with open(output_path, 'wb') as f:
+            f.write(serialized)
+        
+        meta_path = output_dir / f'batch_{batch_id}.json'
+        with open(meta_path, 'w') as f:
+            json.dump({'user_ids': user_ids, 'rows': rows, 'row_dim': row_dim}, f)
+        
+        file_size = output_path.stat().st_size
+        logger.info(f"암호문 저장: {output_path} ({file_size / 1024:.1f} KB)")
         
-        with open(context_path, 'rb') as f:
-            context = ts.context_from(f.read())
+        reporter.add_stage(
+            'Batch Vector Encryption',
+            metrics={
+                'batch_id': batch_id,
+                'num_users': len(user_ids),
+                'vector_dimension': vector_dim,
+                'encryption_time_sec': encrypt_time,
+                'encryption_time_per_user_sec': encrypt_time / len(user_ids),
+                'ciphertext_size_bytes': file_size,
+                'ciphertext_size_per_user_kb': file_size / 1024 / len(user_ids),
+                'slot_utilization': len(user_ids) * vector_dim / slot_count
+            },
+            parameters={
+                'encryption_scheme': 'CKKS',
+                'encoding': 'enc_matmul_encoding',
+                'batch_size': batch_size,
+                'rows': rows,
+                'row_dim': row_dim,
+                'output_path': str(output_path)
+            }
+        )
         
-        logger.info("비밀키 컨텍스트 로드 완료")
-        return context
+        json_path = reporter.save_json()
+        md_path = reporter.generate_markdown_report()
+        logger.info(f"실험 결과 저장: {json_path}")
+        logger.info(f"마크다운 리포트: {md_path}")
         
+        return encrypted_batch
+    
     except Exception as e:
-        log_exception(logger, e, "load_secret_context")
+        log_exception(logger, e, "encrypt_user_batch")
         raise
 
-def encrypt_user_vector(user_id=0):
-    """사용자 벡터 암호화 with 결과 기록"""
+def encrypt_user_vector(user_id=0, user_vectors=None):
+    """사용자 벡터 암호화 with 결과 기록 (user_vectors를 넘기면 파일에서 다시 읽지 않음)"""
     reporter = ExperimentReporter('encryption')
     
     try:
@@ -40,9 +128,10 @@ def encrypt_user_vector(user_id=0):
         
         context = load_secret_context()
         
-        user_vectors_path = Path('data/processed/user_vectors.npy')
-        logger.info(f"사용자 벡터 로드: {user_vectors_path}")
-        user_vectors = np.load(user_vectors_path)
+        if user_vectors is None:
+            user_vectors_path = Path('data/processed/user_vectors.npy')
+            logger.info(f"사용자 벡터 로드: {user_vectors_path}")
+            user_vectors = np.load(user_vectors_path)
         
         logger.info(f"전체 사용자 수: {len(user_vectors)}")
         
@@ -65,7 +154,8 @@ def encrypt_user_vector(user_id=0):
         logger.info("CKKS 암호화 수행 중...")
         start_time = time.time()
         
-        encrypted_user = ts.ckks_vector(context, user_vector.tolist())
+        with span('encrypt'):
+            encrypted_user = ts.ckks_vector(context, user_vector.tolist())
         
         encrypt_time = time.time() - start_time
         logger.info(f"암호화 소요 시간: {encrypt_time:.3f}초")
@@ -75,8 +165,10 @@ def encrypt_user_vector(user_id=0):
         output_dir.mkdir(parents=True, exist_ok=True)
         
         output_path = output_dir / f'user_{user_id}.bin'
+        with span('serialize'):
+            serialized = encrypted_user.serialize()
         with open(output_path, 'wb') as f:
-            f.write(encrypted_user.serialize())
+            f.write(serialized)
         
         file_size = output_path.stat().st_size
         plaintext_size = user_vector.nbytes
@@ -119,16 +211,192 @@ def encrypt_user_vector(user_id=0):
         logger.info("=" * 60)
         
         return encrypted_user
-        
+    
     except Exception as e:
         log_exception(logger, e, "encrypt_user_vector")
         raise
 
-if __name__ == '__main__':
-    import logging
+# 벌크 암호화 워커별 상태 (초기화 시 한 번만 로드)
+_worker_state = {}
+
+def _init_encrypt_worker(context_path, user_vectors_path):
+    """워커 초기화: 비밀키 컨텍스트 로드, 사용자 벡터는 mmap으로 열어 필요한 행만 읽음"""
+    with open(context_path, 'rb') as f:
+        # 프로세스 단위로 병렬화하므로 TenSEAL 내부 스레드는 1개로 제한
+        _worker_state['context'] = ts.context_from(f.read(), n_threads=1)
+    _worker_state['user_vectors'] = np.load(user_vectors_path, mmap_mode='r')
+
+def _encrypt_shard(task):
+    """사용자 [start, end)를 암호화해 샤드 컨테이너에 바로 기록 (워커 프로세스에서 실행)"""
+    start_time = time.time()
+    context = _worker_state['context']
+    user_vectors = _worker_state['user_vectors']
+    
+    with ScoreContainerWriter(task['path'], task['header']) as writer:
+        for user_id in range(task['start'], task['end']):
+            # mmap에서 한 행씩 읽으므로 워커 메모리는 샤드 크기와 무관
+            with span('encrypt'):
+                encrypted = ts.ckks_vector(context, np.asarray(user_vectors[user_id], dtype=np.float64).tolist())
+            writer.write(encrypted, user_id, 1)
+    
+    # 워커 구간 계측은 샤드마다 부모로 넘기고 비워서 중복 집계를 막음
+    spans = export_state()
+    reset_spans()
+    return {
+        'shard': task['shard'],
+        'start': task['start'],
+        'end': task['end'],
+        'pid': os.getpid(),
+        'elapsed': time.time() - start_time,
+        'bytes': Path(task['path']).stat().st_size,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'spans': spans
+    }
+
+def encrypt_all_users(num_workers=None, shard_size=None, limit=None):
+    """전체 사용자를 프로세스 풀로 암호화해 샤드 컨테이너에 스트리밍 저장
+
+    사용자 벡터는 mmap으로 열어 워커가 자기 샤드의 행만 읽고, 암호문은 샤드 파일에
+    바로 기록하므로 메모리 사용량이 사용자 수와 무관하다. 샤드 목록과 사용자 범위는
+    index.json에, 샤드 안 사용자별 위치는 컨테이너 푸터 오프셋에 기록된다
+    (읽기: user_shards.read_user_ciphertext).
+    """
+    reporter = ExperimentReporter('bulk_encryption')
+    
+    try:
+        config = load_config()
+        bulk_config = config.get('bulk_encryption', {})
+        num_workers = num_workers or bulk_config.get('num_workers') or config['performance'].get('num_threads', 1)
+        shard_size = shard_size or bulk_config.get('shard_size', 512)
+        shard_dir = Path(bulk_config.get('output_dir', DEFAULT_SHARD_DIR))
+        
+        context_path = Path(SECRET_CONTEXT_PATH)
+        if not context_path.exists():
+            raise FileNotFoundError(f"비밀키 파일이 없습니다: {context_path}")
+        
+        user_vectors_path = Path('data/processed/user_vectors.npy')
+        logger.info(f"사용자 벡터 mmap: {user_vectors_path}")
+        user_vectors = np.load(user_vectors_path, mmap_mode='r')
+        num_users = min(limit or len(user_vectors), len(user_vectors))
+        vector_dim = user_vectors.shape[1]
+        
+        header = {'ckks': ckks_header(config['seal']), 'packing': 'user', 'vector_dim': vector_dim}
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        tasks = [
+            {
+                'shard': shard, 'start': start, 'end': min(start + shard_size, num_users),
+                'path': str(shard_path(shard_dir, shard)), 'header': header
+            }
+            for shard, start in enumerate(range(0, num_users, shard_size))
+        ]
+        
+        logger.info("=" * 60)
+        logger.info(f"벌크 암호화 시작: 사용자 {num_users}명, 샤드 {len(tasks)}개 ({shard_size}명/샤드), "
+                    f"워커 {num_workers}개")
+        logger.info("=" * 60)
+        
+        start_time = time.time()
+        shard_results = []
+        forward_worker_logs()
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            initializer=_init_encrypt_worker,
+            initargs=(str(context_path), str(user_vectors_path))
+        ) as executor:
+            for result in executor.map(_encrypt_shard, tasks):
+                merge_state(result.pop('spans'))
+                shard_results.append(result)
+                done = result['end']
+                logger.info(f"샤드 {result['shard']} 완료: 사용자 {result['start']}-{result['end'] - 1}, "
+                            f"{result['elapsed']:.2f}초 ({done}/{num_users}, "
+                            f"{done / (time.time() - start_time):.1f}명/초)")
+        total_time = time.time() - start_time
+        
+        # 인덱스는 모든 샤드를 기록한 뒤 마지막에 교체
+        index_path = write_shard_index(shard_dir, shard_size, num_users, [
+            {'path': Path(task['path']).name, 'start': task['start'], 'end': task['end']}
+            for task in tasks
+        ], header)
+        
+        total_bytes = sum(result['bytes'] for result in shard_results)
+        users_per_sec = num_users / total_time
+        worker_time = sum(result['elapsed'] for result in shard_results)
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        worker_peak_rss_mb = max(result['peak_rss_mb'] for result in shard_results)
+        
+        logger.info(f"벌크 암호화 완료: {total_time:.2f}초, {users_per_sec:.1f}명/초, "
+                    f"{total_bytes / 1024 / 1024:.1f} MB")
+        logger.info(f"최대 RSS: 메인 {peak_rss_mb:.1f} MB, 워커 {worker_peak_rss_mb:.1f} MB")
+        logger.info(f"샤드 인덱스: {index_path}")
+        
+        reporter.add_stage(
+            'Bulk User Encryption',
+            metrics={
+                'num_users': num_users,
+                'num_shards': len(tasks),
+                'vector_dimension': vector_dim,
+                'total_time_sec': total_time,
+                'users_per_sec': users_per_sec,
+                'encryption_time_per_user_sec': worker_time / num_users,
+                'parallel_efficiency': worker_time / (total_time * min(num_workers, len(tasks))),
+                'total_size_mb': total_bytes / 1024 / 1024,
+                'ciphertext_size_per_user_kb': total_bytes / 1024 / num_users,
+                'peak_rss_main_mb': peak_rss_mb,
+                'peak_rss_worker_mb': worker_peak_rss_mb
+            },
+            parameters={
+                'encryption_scheme': 'CKKS',
+                'num_workers': num_workers,
+                'shard_size': shard_size,
+                'output_dir': str(shard_dir)
+            }
+        )
+        
+        json_path = reporter.save_json()
+        md_path = reporter.generate_markdown_report()
+        logger.info(f"실험 결과 저장: {json_path}")
+        logger.info(f"마크다운 리포트: {md_path}")
+        
+        return index_path
+    
+    except Exception as e:
+        log_exception(logger, e, "encrypt_all_users")
+        raise
+
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='사용자 벡터 암호화')
+    parser.add_argument('--user-id', type=int, default=0)
+    parser.add_argument('--batch', type=int, default=None, help='배치 ID (performance.batch_size명 단위)')
+    parser.add_argument('--changed', action='store_true',
+                        help='data_prep.py --delta로 바뀐 사용자(data/processed/changed_users.json)만 재암호화')
+    parser.add_argument('--all', action='store_true',
+                        help='전체 사용자를 병렬 암호화해 샤드 파일로 저장 (bulk_encryption 설정)')
+    parser.add_argument('--workers', type=int, default=None, help='--all 워커 프로세스 수')
+    parser.add_argument('--limit', type=int, default=None, help='--all 앞에서부터 암호화할 사용자 수')
+    args = parser.parse_args(argv)
     
     try:
-        encrypt_user_vector(user_id=0)
+        if args.all:
+            encrypt_all_users(num_workers=args.workers, limit=args.limit)
+        elif args.changed:
+            with open('data/processed/changed_users.json', 'r') as f:
+                changes = json.load(f)
+            logger.info(f"변경 사용자 {len(changes['user_rows'])}명 재암호화 ({changes['delta']})")
+            for user_id in changes['user_rows']:
+                encrypt_user_vector(user_id=user_id)
+            # 이미 암호화해 둔 배치 중 변경 사용자가 속한 배치만 다시 생성
+            for batch_id in changes['batches']:
+                if Path(f'data/encrypted/batch_{batch_id}.bin').exists():
+                    encrypt_user_batch(batch_id=batch_id)
+        elif args.batch is not None:
+            encrypt_user_batch(batch_id=args.batch)
+        else:
+            encrypt_user_vector(user_id=args.user_id)
     except Exception as e:
         logger.critical("암호화 실패!")
         sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import sys
+import json
+import time
+import socket
+import numpy as np
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent.parent / 'utils'))
+from wire import send_frame, recv_frame, recv_json
+from container import ScoreContainerWriter, ckks_header
+from user_shards import read_user_ciphertext
+from context_registry import load_secret_context, load_config
+from decrypt import decrypt_layout_scores, select_clusters, select_top_k, print_recommendations
+
+class ServiceClient:
+    """평가 서비스(src/server/service.py) 클라이언트 - 연결을 재사용해 여러 요청 전송"""
+    
+    def __init__(self, host=None, port=None, timeout=600):
+        service_config = load_config()['service']
+        self.sock = socket.create_connection(
+            (host or service_config['host'], port or service_config['port']), timeout=timeout
+        )
+    
+    def score(self, ciphertext, mode=None, stream=False, **extra):
+        """암호문 전송 후 (응답 헤더, 암호화된 점수 리스트) 반환
+        
+        stream=True이면 점수 암호문을 수신하는 대로 하나씩 돌려주는 제너레이터를 반환한다
+        (같은 연결로 다음 요청을 보내기 전에 끝까지 소비해야 한다).
+        """
+        header = {'op': 'score', **extra}
+        if mode is not None:
+            header['mode'] = mode
+        send_frame(self.sock, header)
+        send_frame(self.sock, ciphertext)
+        
+        response = recv_json(self.sock)
+        if response['status'] != 'ok':
+            raise RuntimeError(f"서비스 오류 ({response['status']}): {response.get('message', '')}")
+        ciphertexts = (recv_frame(self.sock) for _ in range(response['num_ciphertexts']))
+        return response, (ciphertexts if stream else list(ciphertexts))
+    
+    def stats(self):
+        send_frame(self.sock, {'op': 'stats'})
+        return recv_json(self.sock)
+    
+    def close(self):
+        self.sock.close()
+
+def request_scores(user_id=0, mode=None):
+    """암호화된 사용자 벡터를 서비스에 보내고 점수를 컨테이너 형식으로 스트리밍 저장"""
+    ciphertext = read_user_ciphertext(user_id)
+    
+    output_path = Path(f'data/encrypted/scores_user_{user_id}.bin')
+    header = {'ckks': ckks_header(load_config()['seal']), 'packing': 'packed', 'slots_per_item': 1}
+    
+    client = ServiceClient()
+    try:
+        start_time = time.time()
+        response, ciphertexts = client.score(ciphertext, mode=mode, stream=True)
+        with ScoreContainerWriter(output_path, header) as writer:
+            for ciphertext_bytes, (start, count) in zip(ciphertexts, response['layout']):
+                writer.write(ciphertext_bytes, start, count)
+        elapsed = time.time() - start_time
+    finally:
+        client.close()
+    
+    print(f"사용자 {user_id} 점수 수신: 암호문 {response['num_ciphertexts']}개, "
+          f"왕복 {elapsed * 1000:.1f}ms (대기 {response['queue_delay_ms']:.1f}ms, 연산 {response['compute_ms']:.1f}ms)")
+    print(f"저장: {output_path}")
+    return output_path
+
+def request_ivf_recommendations(user_id=0, nprobe=None):
+    """IVF 2단계 검색: 중심 점수를 복호화해 상위 nprobe개 클러스터의 아이템만 점수 요청"""
+    config = load_config()
+    nprobe = nprobe or config['ivf']['nprobe']
+    threshold = config['recommendation']['threshold']
+    top_k = config['recommendation']['top_k']
+    context = load_secret_context()
+    ciphertext = read_user_ciphertext(user_id)
+    
+    client = ServiceClient()
+    try:
+        start_time = time.time()
+        response, ciphertexts = client.score(ciphertext, mode='ivf_centroids')
+        centroid_scores = decrypt_layout_scores(context, ciphertexts, response['layout'])
+        clusters = select_clusters(centroid_scores, nprobe)
+        stage1_time = time.time() - start_time
+        
+        response, ciphertexts = client.score(ciphertext, mode='ivf_items', clusters=clusters.tolist())
+        scores = decrypt_layout_scores(context, ciphertexts, response['layout'])
+        elapsed = time.time() - start_time
+    finally:
+        client.close()
+    
+    item_ids = np.load('data/processed/item_ids.npy')
+    candidates = np.array(response['item_ids'])
+    indices, num_filtered = select_top_k(scores, threshold, top_k)
+    print(f"사용자 {user_id} IVF 검색: 클러스터 {len(centroid_scores)}개 중 {len(clusters)}개, "
+          f"후보 아이템 {len(candidates)}개, 왕복 {elapsed * 1000:.1f}ms (1단계 {stage1_time * 1000:.1f}ms)")
+    print_recommendations(user_id, candidates[indices], scores[indices], item_ids, top_k, num_filtered, threshold)
+    return candidates[indices], scores[indices]
+
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='평가 서비스에 점수 요청')
+    parser.add_argument('--user-id', type=int, default=0)
+    parser.add_argument('--mode', choices=['packed', 'per_item'], default=None)
+    parser.add_argument('--stats', action='store_true', help='서비스 지연시간 통계 출력')
+    parser.add_argument('--ivf', action='store_true', help='IVF 2단계 검색 (상위 클러스터 아이템만 점수 요청)')
+    parser.add_argument('--nprobe', type=int, default=None, help='--ivf 선택 클러스터 수 (기본값: ivf.nprobe)')
+    args = parser.parse_args(argv)
+    
+    if args.stats:
+        client = ServiceClient()
+        print(json.dumps(client.stats(), indent=2, ensure_ascii=False))
+        client.close()
+    elif args.ivf:
+        request_ivf_recommendations(user_id=args.user_id, nprobe=args.nprobe)
+    else:
+        request_scores(user_id=args.user_id, mode=args.mode)
+
+if __name__ == '__main__':
+    main()
@@ -1,46 +1,117 @@
 import sys
+import json
 import time
+import hashlib
 import numpy as np
 import tenseal as ts
-import yaml
 from pathlib import Path
-from tqdm import tqdm
 
+sys.path.append(str(Path(__file__).parent))
 sys.path.append(str(Path(__file__).parent.parent / 'utils'))
 from logger import setup_logger, log_exception
 from report_generator import ExperimentReporter
+from scoring import (score_items_per_item, score_items_packed, score_items_batched, pack_scores,
+                     drop_levels_serialized, merge_level_drop_stats)
+from parallel import score_items_parallel, summarize_workers
+from plaintext_cache import get_item_cache
+from container import ScoreContainerWriter, ScoreContainerReader, ckks_header
+from catalog import (load_catalog, validate_catalog, catalog_config, describe_segments, reusable_segments,
+                     copy_segment_records)
+from rotations import check_rotation_keys
+from user_shards import read_user_ciphertext
+from context_registry import load_public_context, load_config, report_context_registry
+from instrumentation import span
 
 logger = setup_logger('evaluator')
 
-def load_public_context():
-    """공개키 컨텍스트 로드"""
-    try:
-        context_path = Path('keys/public_context.bin')
-        logger.info(f"공개키 컨텍스트 로드: {context_path}")
-        
-        if not context_path.exists():
-            raise FileNotFoundError(f"공개키 파일이 없습니다: {context_path}")
-        
-        with open(context_path, 'rb') as f:
-            context = ts.context_from(f.read())
-        
-        logger.info("공개키 컨텍스트 로드 완료")
-        return context
-        
-    except Exception as e:
-        log_exception(logger, e, "load_public_context")
-        raise
+def open_score_writer(output_path, seal_config, packing, extra=None):
+    """점수 컨테이너 writer 생성 (packing: 'per_item' | 'packed')
 
-def load_config():
+    extra는 헤더에 추가할 필드 (예: 배치 사용자 목록).
+    """
+    header = {'ckks': ckks_header(seal_config), 'packing': packing, 'slots_per_item': 1}
+    header.update(extra or {})
+    return ScoreContainerWriter(output_path, header)
+
+def save_encrypted_scores(output_path, encrypted_scores, seal_config, layout=None, extra=None):
+    """암호화된 점수를 컨테이너 형식(src/utils/container.py)으로 저장
+
+    layout이 없으면 아이템당 암호문 1개(점수는 슬롯 0)로,
+    있으면 암호문별 (시작 아이템, 아이템 수) 범위로 기록한다.
+    """
+    packing = 'per_item' if layout is None else 'packed'
+    if layout is None:
+        layout = [(idx, 1) for idx in range(len(encrypted_scores))]
+    
+    with open_score_writer(output_path, seal_config, packing, extra) as writer:
+        writer.write_all(encrypted_scores, layout)
+    return len(layout)
+
+def open_previous_scores(path, seal_config):
+    """증분 계산에 쓸 이전 점수 컨테이너 (없거나 형식/CKKS 파라미터가 다르면 None)"""
+    if not Path(path).exists():
+        return None
     try:
-        with open('config/params.yaml', 'r') as f:
-            return yaml.safe_load(f)
-    except Exception as e:
-        log_exception(logger, e, "load_config")
-        raise
+        reader = ScoreContainerReader(path)
+    except ValueError:
+        return None
+    if reader.header['ckks'] != ckks_header(seal_config):
+        reader.close()
+        return None
+    return reader
 
-def compute_encrypted_recommendations(user_id=0):
-    """암호화 상태에서 추천 연산 with 결과 기록"""
+def report_catalog_segments(reporter, catalog, reused, pending, total_time, incremental):
+    """카탈로그 세그먼트 재사용/계산 현황 기록"""
+    def items(segments):
+        return sum(segment['end'] - segment['start'] for segment in segments)
+    
+    reporter.add_stage(
+        'Catalog Segments',
+        metrics={
+            'catalog_version': catalog['version'],
+            'num_segments': len(catalog['segments']),
+            'segments_reused': len(reused),
+            'segments_scored': len(pending),
+            'items_reused': items(reused),
+            'items_scored': items(pending),
+            'rescored_fraction': items(pending) / catalog['num_items'],
+            'total_computation_time_sec': total_time
+        },
+        parameters={
+            'incremental': incremental,
+            'segments': [[segment['start'], segment['end'], segment['version']] for segment in catalog['segments']]
+        }
+    )
+
+def report_level_drop(reporter, drop_stats, num_ciphertexts):
+    """레벨 하향 전/후 직렬화 크기와 소요 시간 기록"""
+    reduction = 1 - drop_stats['bytes_after_level_drop'] / drop_stats['bytes_before_level_drop']
+    logger.info(f"레벨 하향: 모듈러스 {drop_stats['coeff_modulus_size_before']} -> "
+                f"{drop_stats['coeff_modulus_size_after']}, 점수 암호문 "
+                f"{drop_stats['bytes_before_level_drop'] / 1024:.1f} KB -> "
+                f"{drop_stats['bytes_after_level_drop'] / 1024:.1f} KB ({reduction * 100:.1f}% 감소)")
+    
+    reporter.add_stage(
+        'Score Ciphertext Level Drop',
+        metrics={
+            **drop_stats,
+            'bytes_per_ciphertext_before': drop_stats['bytes_before_level_drop'] / num_ciphertexts,
+            'bytes_per_ciphertext_after': drop_stats['bytes_after_level_drop'] / num_ciphertexts,
+            'size_reduction': reduction
+        },
+        parameters={'num_ciphertexts': num_ciphertexts, 'method': 'rescale_by_scalar_one'}
+    )
+
+def compute_encrypted_recommendations(user_id=0, mode=None, num_workers=None, item_vectors=None, incremental=None):
+    """암호화 상태에서 추천 연산 with 결과 기록
+
+    num_workers(기본값 performance.num_threads)가 2 이상이면 per_item 모드는
+    카탈로그를 프로세스 풀로 샤딩하고, packed 모드는 TenSEAL 내부 스레드로
+    대각선 연산을 병렬화한다. item_vectors를 넘기면 item_vectors.npy를 다시 읽지 않는다
+    (병렬 워커는 여전히 파일을 mmap으로 읽음).
+    incremental(기본값 catalog.incremental)이면 이전 점수 파일에서 바뀌지 않은 카탈로그
+    세그먼트(src/utils/catalog.py)는 옮기고 새로 추가되거나 바뀐 세그먼트만 계산한다.
+    """
     reporter = ExperimentReporter('server_evaluation')
     
     try:
@@ -48,82 +119,178 @@ def compute_encrypted_recommendations(user_id=0):
         logger.info(f"사용자 {user_id} 추천 연산 시작 (서버)")
         logger.info("=" * 60)
         
-        context = load_public_context()
-        config = load_config()['recommendation']
+        full_config = load_config()
+        eval_config = full_config['evaluation']
+        mode = mode or eval_config['mode']
+        pack = eval_config.get('pack_scores', True)
+        level_drop = eval_config.get('level_drop', False)
+        slot_count = full_config['seal']['poly_modulus_degree'] // 2
+        num_workers = num_workers or full_config['performance'].get('num_threads', 1)
         
-        # 암호화된 사용자 벡터 로드
-        encrypted_path = Path(f'data/encrypted/user_{user_id}.bin')
-        logger.info(f"암호화된 사용자 벡터 로드: {encrypted_path}")
+        context = load_public_context(n_threads=num_workers)
         
-        if not encrypted_path.exists():
-            raise FileNotFoundError(f"암호화된 사용자 파일이 없습니다: {encrypted_path}")
+        if mode not in ('packed', 'per_item'):
+            raise ValueError(f"지원하지 않는 평가 모드: {mode} (packed | per_item)")
         
-        with open(encrypted_path, 'rb') as f:
-            encrypted_user = ts.ckks_vector_from(context, f.read())
+        logger.info(f"평가 모드: {mode}")
+        
+        # 암호화된 사용자 벡터 로드 (user_{id}.bin, 없으면 벌크 암호화 샤드)
+        logger.info(f"암호화된 사용자 {user_id} 벡터 로드")
+        user_ciphertext = read_user_ciphertext(user_id)
+        with span('deserialize'):
+            encrypted_user = ts.ckks_vector_from(context, user_ciphertext)
         
         logger.info("암호화된 사용자 벡터 로드 완료")
         
         # 아이템 벡터 로드
         item_vectors_path = Path('data/processed/item_vectors.npy')
-        logger.info(f"아이템 벡터 로드: {item_vectors_path}")
-        item_vectors = np.load(item_vectors_path)
+        if item_vectors is None:
+            logger.info(f"아이템 벡터 로드: {item_vectors_path}")
+            item_vectors = np.load(item_vectors_path)
         
         logger.info(f"아이템 벡터 shape: {item_vectors.shape}")
         
-        # Shape 확인 및 수정
-        # item_vectors는 (512, 6039) 형태 → 각 아이템은 6039차원
-        # 하지만 사용자 벡터는 512차원이므로, 아이템 벡터를 전치해야 함
-        # 실제로는: 각 아이템을 512차원으로 표현해야 함
-        
-        # 수정: 아이템 벡터를 행 기준으로 읽어야 함 (각 행이 하나의 아이템)
+        # 각 행이 하나의 아이템 (num_items, item_dim)
         num_items = item_vectors.shape[0]
         item_dim = item_vectors.shape[1]
         
         logger.info(f"아이템 수: {num_items}, 아이템 차원: {item_dim}")
-        logger.info(f"총 {num_items}개 아이템과 내적 연산 수행 중...")
+        check_rotation_keys(mode, item_dim)
         
-        # 내적 연산 (암호화 상태)
-        encrypted_scores = []
-        computation_times = []
+        # 카탈로그 세그먼트: 이전 점수 파일에서 범위와 내용이 같은 세그먼트는 레코드를 옮기고 나머지만 계산
+        # 카탈로그는 data_prep이 관리하므로 서버는 현재 아이템 벡터와 맞는지만 확인
+        catalog = load_catalog()
+        validate_catalog(catalog, item_vectors)
+        logger.info(f"카탈로그 버전 {catalog['version']}: 세그먼트 {len(catalog['segments'])}개")
+        incremental = catalog_config(full_config)['incremental'] if incremental is None else incremental
+        output_path = Path(f'data/encrypted/scores_user_{user_id}.bin')
+        user_digest = hashlib.sha256(user_ciphertext).hexdigest()
+        # 평가 모드/패킹/레벨 하향이 다르면 레코드 형식과 기준 모드 비교가 달라지므로 재사용하지 않음
+        scoring = {'mode': mode, 'pack_scores': pack, 'level_drop': level_drop}
+        previous = open_previous_scores(output_path, full_config['seal']) if incremental else None
+        reused = reusable_segments(previous.header if previous else None, previous.layout if previous else None,
+                                   catalog, user_digest, scoring)
+        pending = [segment for segment in catalog['segments'] if segment not in reused]
+        num_scored = sum(segment['end'] - segment['start'] for segment in pending)
+        full_catalog = [(segment['start'], segment['end']) for segment in pending] == [(0, num_items)]
+        all_scored = len(pending) == len(catalog['segments'])
+        small_segment = catalog_config(full_config)['small_segment_items']
+        logger.info(f"세그먼트 {len(catalog['segments'])}개 중 재사용 {len(reused)}개, "
+                    f"계산 {len(pending)}개 (아이템 {num_scored}/{num_items}개)")
+        
+        if not pending and previous.header.get('segments') == catalog['segments']:
+            previous.close()
+            logger.info(f"점수 파일이 카탈로그 버전 {catalog['version']}과 같아 연산 생략: {output_path}")
+            report_catalog_segments(reporter, catalog, reused, pending, 0.0, incremental)
+            report_context_registry(reporter)
+            json_path = reporter.save_json()
+            reporter.generate_markdown_report()
+            logger.info(f"실험 결과 저장: {json_path}")
+            return {'output_path': output_path, 'total_computation_time_sec': 0.0,
+                    'num_items': num_items, 'num_items_scored': 0}
         
+        # 아이템 평문 피연산자 준비 (캐시 적중 시 전치/변환 생략)
+        cache = None
+        cache_config = None
+        operands = None
+        if eval_config.get('plaintext_cache', False) and (full_catalog or mode == 'per_item'):
+            cache_config = (full_config['seal'], eval_config.get('plaintext_cache_dir'))
+            cache = get_item_cache(cache_config[0], item_vectors_path, cache_config[1])
+            if mode == 'packed':
+                # 전치 블록은 카탈로그 전체 기준이므로 전체를 다시 계산할 때만 사용
+                if full_catalog:
+                    operands = cache.matmul_blocks()
+            elif num_workers == 1:
+                operands = cache.item_rows()
+            logger.info(f"평문 캐시 키 {cache.key}: 준비 {cache.stats['build_time_sec']:.3f}초, "
+                        f"디스크 적중 {cache.stats['disk_hits']}회")
+        
+        logger.info(f"총 {num_scored}개 아이템과 내적 연산 수행 중...")
+        
+        # 내적 연산 (암호화 상태)
         start_total = time.time()
         
-        for idx in tqdm(range(num_items), desc="동형 내적 연산"):
-            item_vec = item_vectors[idx]
-            
-            # 연산 시간 측정
-            start_time = time.time()
+        packing = 'packed' if mode == 'packed' or pack else 'per_item'
+        container_extra = {'catalog_version': catalog['version'], 'segments': catalog['segments'],
+                           'user_digest': user_digest, 'scoring': scoring}
+        computation_times = []
+        pack_time = 0.0
+        shard_results = []
+        drop_stats_list = []
+        with open_score_writer(output_path, full_config['seal'], packing, container_extra) as writer:
+            if previous is not None:
+                copied = copy_segment_records(previous, writer, reused)
+                previous.close()
+                if reused:
+                    logger.info(f"재사용 세그먼트 {describe_segments(reused)}: 암호문 {copied}개 복사")
             
-            try:
-                # 내적 연산: encrypted_user · item_vec
-                score = encrypted_user.dot(item_vec.tolist())
-                encrypted_scores.append(score)
+            # 세그먼트마다 따로 계산하고 패킹해 암호문 레코드가 세그먼트 경계를 넘지 않게 함
+            # (경계를 넘는 레코드는 다음 증분 계산에서 세그먼트 단위로 옮길 수 없음)
+            for segment in pending:
+                start, end = segment['start'], segment['end']
+                segment_vectors = item_vectors[start:end]
+                
+                if mode == 'per_item' and num_workers > 1:
+                    # 워커별 샤드 안에서 점수 계산과 패킹을 함께 수행하고,
+                    # 샤드 결과는 도착 순서대로 컨테이너에 바로 기록
+                    _, _, results = score_items_parallel(
+                        Path('keys/public_context.bin'), user_ciphertext, item_vectors_path, end - start,
+                        num_workers, op='replicated' if pack else 'dot', slot_count=slot_count, pack=pack,
+                        cache_config=cache_config, writer=writer, level_drop=level_drop, item_start=start
+                    )
+                    shard_results.extend(results)
+                    drop_stats_list.extend(result['level_drop'] for result in results)
+                    computation_times.extend(result['elapsed'] for result in results)
+                    continue
                 
-                comp_time = time.time() - start_time
-                computation_times.append(comp_time)
+                # 행렬-벡터 곱 비용은 아이템 수가 아니라 벡터 차원에 비례하므로
+                # 증분 계산의 작은 세그먼트는 packed 모드에서도 아이템별 내적 후 패킹
+                if mode == 'packed' and (full_catalog or end - start >= small_segment):
+                    # packed 모드는 이미 연속 슬롯에 점수가 담겨 있음
+                    encrypted_scores, times = score_items_packed(
+                        encrypted_user, segment_vectors, slot_count, operands=operands
+                    )
+                    layout = [(start + block_idx * slot_count, block.size())
+                              for block_idx, block in enumerate(encrypted_scores)]
+                else:
+                    encrypted_scores, times = score_items_per_item(
+                        encrypted_user, segment_vectors, replicated=pack or mode == 'packed',
+                        operands=operands[start:end] if operands is not None and mode == 'per_item' else None
+                    )
+                    if pack or mode == 'packed':
+                        logger.info("점수 패킹 중 (마스크 기반)...")
+                        pack_start = time.time()
+                        encrypted_scores, layout = pack_scores(encrypted_scores, slot_count)
+                        pack_time += time.time() - pack_start
+                        layout = [(start + offset, count) for offset, count in layout]
+                        logger.info(f"패킹 완료: {end - start}개 점수 -> {len(encrypted_scores)}개 암호문")
+                    else:
+                        layout = [(start + idx, 1) for idx in range(len(encrypted_scores))]
+                computation_times.extend(times)
                 
-            except Exception as e:
-                logger.error(f"아이템 {idx} 연산 실패: {str(e)}")
-                logger.error(f"사용자 벡터 차원 vs 아이템 벡터 차원: ? vs {len(item_vec)}")
-                raise
+                # 저장 전에 마지막 레벨로 낮춰 직렬화 크기와 클라이언트 복호화 시간 감소
+                if level_drop:
+                    encrypted_scores, stats = drop_levels_serialized(encrypted_scores)
+                    drop_stats_list.append(stats)
+                writer.write_all(encrypted_scores, layout)
+            num_ciphertexts = len(writer.offsets)
+            # 옮긴 레코드와 새로 계산한 레코드가 모든 아이템을 덮지 않으면 이전 점수 파일을 유지
+            if writer.num_items != num_items:
+                raise ValueError(f"점수 레코드가 아이템 {writer.num_items}개만 덮습니다 (전체 {num_items}개)")
         
         total_time = time.time() - start_total
-        avg_time = np.mean(computation_times)
+        drop_stats = merge_level_drop_stats(drop_stats_list)
+        worker_metrics = summarize_workers(shard_results, total_time) if shard_results else None
+        if worker_metrics is not None:
+            logger.info(f"워커 {worker_metrics['num_workers_used']}개 병렬 효율: "
+                        f"{worker_metrics['parallel_efficiency'] * 100:.1f}%")
+        computation_times = computation_times or [0.0]
+        avg_time = total_time / max(num_scored, 1)
         
-        logger.info(f"총 {len(encrypted_scores)}개 암호화된 점수 생성")
+        logger.info(f"총 {num_ciphertexts}개 암호문에 {num_items}개 점수 ({num_scored}개 새로 계산)")
         logger.info(f"총 연산 시간: {total_time:.2f}초")
         logger.info(f"평균 연산 시간: {avg_time:.4f}초/아이템")
-        logger.info(f"처리량: {num_items / total_time:.2f} 아이템/초")
-        
-        # 암호화된 점수 저장
-        output_path = Path(f'data/encrypted/scores_user_{user_id}.npy')
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        logger.info(f"암호화된 점수 저장 중: {output_path}")
-        
-        import pickle
-        with open(output_path, 'wb') as f:
-            pickle.dump([s.serialize() for s in encrypted_scores], f)
+        logger.info(f"처리량: {num_scored / total_time:.2f} 아이템/초")
         
         file_size = output_path.stat().st_size
         logger.info(f"저장 완료: {output_path} ({file_size / 1024:.1f} KB)")
@@ -134,20 +301,74 @@ def compute_encrypted_recommendations(user_id=0):
             metrics={
                 'user_id': user_id,
                 'num_items': num_items,
+                'num_items_scored': num_scored,
+                'num_ciphertexts': num_ciphertexts,
+                'score_packing_time_sec': pack_time,
                 'total_computation_time_sec': total_time,
                 'average_computation_time_sec': avg_time,
-                'throughput_items_per_sec': num_items / total_time,
+                'throughput_items_per_sec': num_scored / total_time,
                 'min_computation_time_sec': float(np.min(computation_times)),
                 'max_computation_time_sec': float(np.max(computation_times)),
-                'encrypted_scores_size_kb': file_size / 1024
+                'p50_computation_time_sec': float(np.percentile(computation_times, 50)),
+                'p95_computation_time_sec': float(np.percentile(computation_times, 95)),
+                'p99_computation_time_sec': float(np.percentile(computation_times, 99)),
+                'encrypted_scores_size_kb': file_size / 1024,
+                'plaintext_cache_prepare_time_sec': cache.stats['build_time_sec'] if cache else 0.0,
+                'plaintext_cache_disk_hit': bool(cache and cache.stats['disk_hits'])
             },
             parameters={
                 'encryption_scheme': 'CKKS',
-                'operation': 'dot_product',
-                'num_operations': num_items
+                'operation': 'matmul_diagonal' if mode == 'packed' else 'dot_product',
+                'evaluation_mode': mode,
+                'output_format': 'legacy' if packing == 'per_item' else 'packed',
+                'num_workers': num_workers,
+                'num_operations': len(computation_times),
+                'plaintext_cache': cache.key if cache else None
             }
         )
         
+        if worker_metrics is not None:
+            reporter.add_stage(
+                'Parallel Worker Timing',
+                metrics=worker_metrics,
+                parameters={'num_workers': num_workers, 'num_shards': len(computation_times)}
+            )
+        
+        if drop_stats is not None:
+            report_level_drop(reporter, drop_stats, num_ciphertexts)
+        
+        report_catalog_segments(reporter, catalog, reused, pending, total_time, incremental)
+        
+        # packed 모드: 아이템 일부에 기준 모드를 돌려 전체 시간을 외삽 (카탈로그 전체를 계산한 경우)
+        if mode == 'packed' and eval_config.get('compare_reference', False) and all_scored:
+            sample_size = min(eval_config.get('reference_sample_items', 32), num_items)
+            logger.info(f"기준 모드(per_item) 비교 측정: {sample_size}개 아이템 샘플")
+            
+            _, reference_times = score_items_per_item(encrypted_user, item_vectors[:sample_size])
+            reference_avg = float(np.mean(reference_times))
+            reference_total_est = reference_avg * num_items
+            speedup = reference_total_est / total_time
+            
+            logger.info(f"기준 모드 추정 시간: {reference_total_est:.2f}초 ({reference_avg:.4f}초/아이템)")
+            logger.info(f"packed 모드 속도 향상: {speedup:.2f}x")
+            
+            reporter.add_stage(
+                'Packed vs Per-item Speedup',
+                metrics={
+                    'packed_total_time_sec': total_time,
+                    'reference_average_time_sec': reference_avg,
+                    'reference_total_time_estimated_sec': reference_total_est,
+                    'speedup': speedup
+                },
+                parameters={
+                    'reference_mode': 'per_item',
+                    'reference_sample_items': sample_size,
+                    'num_items': num_items
+                }
+            )
+        
+        report_context_registry(reporter)
+        
         # 저장
         json_path = reporter.save_json()
         md_path = reporter.generate_markdown_report()
@@ -159,15 +380,177 @@ def compute_encrypted_recommendations(user_id=0):
         logger.info("서버 연산 완료!")
         logger.info("=" * 60)
         
+        return {'output_path': output_path, 'total_computation_time_sec': total_time,
+                'num_items': num_items, 'num_items_scored': num_scored}
+    
     except Exception as e:
         log_exception(logger, e, "compute_encrypted_recommendations")
         raise
 
-if __name__ == '__main__':
-    import logging
+def compute_encrypted_batch_recommendations(batch_id=0, num_workers=None):
+    """여러 사용자가 패킹된 배치 암호문에 대한 추천 연산 with 결과 기록"""
+    reporter = ExperimentReporter('server_batch_evaluation')
     
     try:
-        compute_encrypted_recommendations(user_id=0)
+        logger.info("=" * 60)
+        logger.info(f"배치 {batch_id} 추천 연산 시작 (서버)")
+        logger.info("=" * 60)
+        
+        config = load_config()
+        slot_count = config['seal']['poly_modulus_degree'] // 2
+        num_workers = num_workers or config['performance'].get('num_threads', 1)
+        
+        context = load_public_context()
+        
+        batch_path = Path(f'data/encrypted/batch_{batch_id}.bin')
+        meta_path = Path(f'data/encrypted/batch_{batch_id}.json')
+        logger.info(f"배치 암호문 로드: {batch_path}")
+        
+        if not batch_path.exists() or not meta_path.exists():
+            raise FileNotFoundError(f"배치 암호문 파일이 없습니다: {batch_path}")
+        
+        with open(meta_path, 'r') as f:
+            batch_meta = json.load(f)
+        with open(batch_path, 'rb') as f:
+            with span('deserialize'):
+                encrypted_batch = ts.ckks_vector_from(context, f.read())
+        
+        user_ids = batch_meta['user_ids']
+        rows = batch_meta['rows']
+        num_users = len(user_ids)
+        logger.info(f"배치 사용자 {num_users}명 (레이아웃 {rows}x{batch_meta['row_dim']})")
+        check_rotation_keys('batched', batch_meta['row_dim'], rows, batch_meta['row_dim'])
+        
+        item_vectors_path = Path('data/processed/item_vectors.npy')
+        item_vectors = np.load(item_vectors_path)
+        num_items = item_vectors.shape[0]
+        
+        eval_config = config['evaluation']
+        level_drop = eval_config.get('level_drop', False)
+        cache_config = None
+        operands = None
+        if eval_config.get('plaintext_cache', False):
+            cache_config = (config['seal'], eval_config.get('plaintext_cache_dir'))
+            if num_workers == 1:
+                # 배치 행 길이까지 패딩된 아이템 평문을 캐시에서 재사용
+                operands = get_item_cache(cache_config[0], item_vectors_path, cache_config[1]).item_rows(batch_meta['row_dim'])
+        
+        # 아이템 차원을 배치 행 길이에 맞춰 0으로 패딩
+        if operands is None and item_vectors.shape[1] < batch_meta['row_dim']:
+            item_vectors = np.pad(item_vectors, ((0, 0), (0, batch_meta['row_dim'] - item_vectors.shape[1])))
+        
+        output_path = Path(f'data/encrypted/scores_batch_{batch_id}.bin')
+        container_extra = {'user_ids': user_ids, 'rows': rows, 'slots_per_item': rows}
+        
+        start_total = time.time()
+        worker_metrics = None
+        drop_stats = None
+        pack_time = 0.0
+        if num_workers > 1:
+            with open_score_writer(output_path, config['seal'], 'packed', container_extra) as writer:
+                _, layout, shard_results = score_items_parallel(
+                    Path('keys/public_context.bin'), batch_path, item_vectors_path,
+                    num_items, num_workers, op='batched', slot_count=slot_count, pack=True,
+                    rows=rows, row_dim=batch_meta['row_dim'], cache_config=cache_config, writer=writer,
+                    level_drop=level_drop
+                )
+            num_ciphertexts = len(writer.offsets)
+            drop_stats = merge_level_drop_stats(result['level_drop'] for result in shard_results)
+            computation_times = [result['elapsed'] / (result['end'] - result['start']) for result in shard_results]
+            worker_metrics = summarize_workers(shard_results, time.time() - start_total)
+        else:
+            encrypted_scores, computation_times = score_items_batched(
+                encrypted_batch, item_vectors, rows, operands=operands
+            )
+            
+            logger.info("점수 패킹 중 (마스크 기반)...")
+            pack_start = time.time()
+            encrypted_scores, layout = pack_scores(encrypted_scores, slot_count)
+            pack_time = time.time() - pack_start
+            if level_drop:
+                encrypted_scores, drop_stats = drop_levels_serialized(encrypted_scores)
+            num_ciphertexts = save_encrypted_scores(
+                output_path, encrypted_scores, config['seal'], layout, extra=container_extra
+            )
+        
+        total_time = time.time() - start_total
+        
+        logger.info(f"{num_users}명 x {num_items}개 아이템 -> {num_ciphertexts}개 암호문")
+        logger.info(f"총 연산 시간: {total_time:.2f}초 (사용자당 {total_time / num_users:.2f}초)")
+        logger.info(f"처리량: {num_users * num_items / total_time:.2f} 점수/초, {num_users / total_time:.4f} 사용자/초")
+        
+        file_size = output_path.stat().st_size
+        logger.info(f"저장 완료: {output_path} ({file_size / 1024:.1f} KB)")
+        
+        reporter.add_stage(
+            'Batched Encrypted Dot Product Computation',
+            metrics={
+                'batch_id': batch_id,
+                'num_users': num_users,
+                'num_items': num_items,
+                'num_ciphertexts': num_ciphertexts,
+                'total_computation_time_sec': total_time,
+                'time_per_user_sec': total_time / num_users,
+                'throughput_users_per_sec': num_users / total_time,
+                'throughput_scores_per_sec': num_users * num_items / total_time,
+                'average_item_time_sec': float(np.mean(computation_times)),
+                'score_packing_time_sec': pack_time,
+                'encrypted_scores_size_kb': file_size / 1024,
+                'encrypted_scores_size_per_user_kb': file_size / 1024 / num_users
+            },
+            parameters={
+                'encryption_scheme': 'CKKS',
+                'operation': 'enc_matmul_plain',
+                'evaluation_mode': 'batched',
+                'rows': rows,
+                'row_dim': batch_meta['row_dim'],
+                'num_workers': num_workers
+            }
+        )
+        
+        if worker_metrics is not None:
+            reporter.add_stage(
+                'Parallel Worker Timing',
+                metrics=worker_metrics,
+                parameters={'num_workers': num_workers, 'num_shards': len(computation_times)}
+            )
+        
+        if drop_stats is not None:
+            report_level_drop(reporter, drop_stats, num_ciphertexts)
+        report_context_registry(reporter)
+        
+        json_path = reporter.save_json()
+        md_path = reporter.generate_markdown_report()
+        
+        logger.info(f"실험 결과 저장: {json_path}")
+        logger.info(f"마크다운 리포트: {md_path}")
+        
+        logger.info("=" * 60)
+        logger.info("배치 서버 연산 완료!")
+        logger.info("=" * 60)
+        
+    except Exception as e:
+        log_exception(logger, e, "compute_encrypted_batch_recommendations")
+        raise
+
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='서버 동형 연산')
+    parser.add_argument('--user-id', type=int, default=0)
+    parser.add_argument('--mode', choices=['packed', 'per_item'], default=None)
+    parser.add_argument('--batch', type=int, default=None, help='배치 ID (encrypt.py --batch 결과)')
+    parser.add_argument('--workers', type=int, default=None, help='워커 수 (기본값: performance.num_threads)')
+    args = parser.parse_args(argv)
+    
+    try:
+        if args.batch is not None:
+            compute_encrypted_batch_recommendations(batch_id=args.batch, num_workers=args.workers)
+        else:
+            compute_encrypted_recommendations(user_id=args.user_id, mode=args.mode, num_workers=args.workers)
     except Exception as e:
         logger.critical("서버 연산 실패!")
         sys.exit(1)
+
+if __name__ == '__main__':
+    main()
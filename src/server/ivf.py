@@ -0,0 +1,148 @@
+import os
+import time
+import logging
+import numpy as np
+from pathlib import Path
+
+from scoring import score_items_packed, score_items_per_item, pack_scores
+from plaintext_cache import catalog_fingerprint, encode_plain
+
+# scoring.py와 같이 evaluator/service 양쪽에서 import되므로 호출 측 로거 설정을 따른다
+logger = logging.getLogger('evaluator')
+
+# IVF(inverted file) 2단계 검색
+#
+#   1단계: 서버가 암호화된 사용자 벡터와 k-means 중심 nlist개의 점수를 계산
+#   2단계: 클라이언트가 중심 점수를 복호화해 상위 nprobe개 클러스터를 고르고,
+#          서버는 그 클러스터에 속한 아이템만 점수를 계산
+#
+# 동형 연산량이 카탈로그 전체가 아니라 nlist + (선택 클러스터 아이템 수)에 비례한다.
+# 서버는 선택된 클러스터(= 후보 아이템 집합)를 알게 되지만 점수와 사용자 벡터는 여전히 암호문이다.
+
+def default_nlist(num_items):
+    """클러스터 수 기본값: sqrt(아이템 수)"""
+    return max(1, int(round(np.sqrt(num_items))))
+
+def build_ivf_index(item_vectors, nlist, max_iter=100, seed=42):
+    """아이템 벡터를 k-means로 클러스터링해 역색인 생성
+
+    Returns:
+        centroids: (nlist, item_dim) 클러스터 중심
+        list_items: 클러스터 순으로 정렬한 아이템 인덱스
+        list_offsets: 클러스터 c의 아이템 = list_items[list_offsets[c]:list_offsets[c + 1]]
+    """
+    # sklearn import에 1초 이상 걸리므로 인덱스를 새로 만들 때만 로드 (서비스 시작 시간)
+    from sklearn.cluster import KMeans
+    nlist = min(nlist, len(item_vectors))
+    kmeans = KMeans(n_clusters=nlist, n_init=1, max_iter=max_iter, random_state=seed)
+    assignments = kmeans.fit_predict(item_vectors)
+    
+    list_items = np.argsort(assignments, kind='stable')
+    list_offsets = np.searchsorted(assignments[list_items], np.arange(nlist + 1))
+    return {
+        'centroids': kmeans.cluster_centers_,
+        'list_items': list_items,
+        'list_offsets': list_offsets
+    }
+
+def get_ivf_index(ivf_config, item_vectors_path='data/processed/item_vectors.npy'):
+    """IVF 인덱스 로드 (없거나 카탈로그/nlist/seed가 바뀌었으면 다시 생성해 저장)
+
+    파일 이름에 카탈로그 내용 해시를 넣어 item_vectors.npy가 바뀌면 자동으로 무효화한다.
+    """
+    item_vectors = np.load(item_vectors_path, mmap_mode='r')
+    nlist = ivf_config.get('nlist') or default_nlist(len(item_vectors))
+    seed = ivf_config.get('seed', 42)
+    fingerprint = catalog_fingerprint(item_vectors_path)[:16]
+    
+    index_dir = Path(ivf_config.get('index_dir') or 'data/cache')
+    index_path = index_dir / f'ivf_index_{fingerprint}_{nlist}_{seed}.npz'
+    if index_path.exists():
+        with np.load(index_path) as stored:
+            index = {name: stored[name] for name in stored.files}
+        index['build_time_sec'] = 0.0
+        logger.info(f"IVF 인덱스 로드: {index_path} (클러스터 {len(index['centroids'])}개)")
+        return index
+    
+    start_time = time.time()
+    index = build_ivf_index(np.asarray(item_vectors), nlist, ivf_config.get('max_iter', 100), seed)
+    build_time = time.time() - start_time
+    
+    index_dir.mkdir(parents=True, exist_ok=True)
+    for stale in index_dir.glob('ivf_index_*.npz'):
+        if stale != index_path:
+            logger.info(f"무효화된 IVF 인덱스 삭제: {stale}")
+            stale.unlink()
+    tmp_path = index_dir / f'.ivf_index_{fingerprint}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **index)
+    os.replace(tmp_path, index_path)
+    
+    sizes = np.diff(index['list_offsets'])
+    logger.info(f"IVF 인덱스 생성: 클러스터 {len(sizes)}개, 크기 최소 {sizes.min()} / 최대 {sizes.max()}, "
+                f"{build_time:.2f}초 -> {index_path}")
+    index['build_time_sec'] = build_time
+    return index
+
+def cluster_items(index, cluster_ids):
+    """선택한 클러스터에 속한 아이템 인덱스 (오름차순)"""
+    offsets = index['list_offsets']
+    items = index['list_items']
+    return np.sort(np.concatenate([items[offsets[c]:offsets[c + 1]] for c in cluster_ids]))
+
+def centroid_operands(index, mode, slot_count):
+    """클러스터 중심의 평문 피연산자 (인덱스당 한 번만 준비해 재사용)"""
+    name = f'operands_{mode}'
+    if name not in index:
+        centroids = index['centroids']
+        if mode == 'packed':
+            index[name] = [encode_plain(np.ascontiguousarray(centroids[start:start + slot_count].T))
+                           for start in range(0, len(centroids), slot_count)]
+        else:
+            index[name] = [encode_plain(row) for row in centroids]
+    return index[name]
+
+def score_vectors(encrypted_user, vectors, mode, slot_count, operands=None):
+    """벡터 행렬의 점수를 연속 슬롯에 담아 계산 (layout 시작 위치는 vectors 행 기준)
+
+    packed: 대각선 행렬-벡터 곱, per_item: 행별 내적 후 pack_scores로 패킹
+    """
+    if mode == 'packed':
+        scores, _ = score_items_packed(encrypted_user, vectors, slot_count, progress=False, operands=operands)
+        layout = [(idx * slot_count, block.size()) for idx, block in enumerate(scores)]
+    else:
+        scores, _ = score_items_per_item(encrypted_user, vectors, replicated=True, progress=False,
+                                         operands=operands)
+        scores, layout = pack_scores(scores, slot_count)
+    return scores, layout
+
+def stage_mode(num_vectors, vector_dim, slot_count, mode):
+    """단계별 점수 계산 방식 선택
+
+    packed 행렬-벡터 곱은 블록(slot_count개)마다 대각선 vector_dim개를 처리해 벡터 수와
+    무관하게 비용이 같고, per_item은 벡터 수에 비례한다. 측정상 packed 블록 1개가
+    per_item 약 vector_dim / 2개와 비슷하므로 (N=8192, 512차원: 7.9초 vs 25ms/아이템),
+    중심이나 후보처럼 벡터 수가 적은 단계는 설정이 packed여도 per_item으로 계산한다.
+    """
+    if mode == 'per_item':
+        return mode
+    packed_cost = -(-num_vectors // slot_count) * vector_dim / 2
+    return 'per_item' if num_vectors < packed_cost else 'packed'
+
+def score_centroids(encrypted_user, index, mode, slot_count):
+    """1단계: 클러스터 중심 점수"""
+    centroids = index['centroids']
+    mode = stage_mode(len(centroids), centroids.shape[1], slot_count, mode)
+    return score_vectors(encrypted_user, centroids, mode, slot_count,
+                         operands=centroid_operands(index, mode, slot_count))
+
+def score_clusters(encrypted_user, item_vectors, index, cluster_ids, mode, slot_count):
+    """2단계: 선택한 클러스터의 아이템 점수
+
+    Returns:
+        점수 암호문, layout (후보 목록 내 위치 기준), 후보 아이템 인덱스
+    """
+    item_ids = cluster_items(index, cluster_ids)
+    mode = stage_mode(len(item_ids), item_vectors.shape[1], slot_count, mode)
+    scores, layout = score_vectors(encrypted_user, item_vectors[item_ids], mode, slot_count)
+    return scores, layout, item_ids
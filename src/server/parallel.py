@@ -0,0 +1,276 @@
+import os
+import sys
+import time
+import numpy as np
+import tenseal as ts
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent.parent / 'utils'))
+from logger import setup_logger, log_exception, forward_worker_logs
+from report_generator import ExperimentReporter
+from scoring import (score_items_per_item, score_items_batched, pack_scores, drop_levels_serialized,
+                     serialize_ciphertexts)
+from instrumentation import span, export_state, merge_state, reset as reset_spans
+from plaintext_cache import get_item_cache
+from context_registry import load_config
+
+logger = setup_logger('parallel')
+
+# 워커 프로세스별 상태 (초기화 시 한 번만 역직렬화)
+_worker_state = {}
+
+def _init_worker(context_path, ciphertext, item_vectors_path, cache_config=None):
+    """워커 초기화: 공개키 컨텍스트와 사용자 암호문을 프로세스당 한 번만 로드
+
+    ciphertext: 암호문 파일 경로 또는 직렬화 바이트 (벌크 샤드에서 읽은 사용자 등)
+    cache_config (seal 설정, 캐시 디렉토리)가 주어지면 아이템 평문 캐시를 사용한다.
+    """
+    with open(context_path, 'rb') as f:
+        # 프로세스 단위로 병렬화하므로 TenSEAL 내부 스레드는 1개로 제한
+        context = ts.context_from(f.read(), n_threads=1)
+    if not isinstance(ciphertext, bytes):
+        with open(ciphertext, 'rb') as f:
+            ciphertext = f.read()
+    with span('deserialize'):
+        encrypted = ts.ckks_vector_from(context, ciphertext)
+    
+    _worker_state['encrypted'] = encrypted
+    _worker_state['item_vectors'] = np.load(item_vectors_path, mmap_mode='r')
+    _worker_state['cache'] = get_item_cache(cache_config[0], item_vectors_path, cache_config[1]) if cache_config else None
+
+def _score_shard(task):
+    """아이템 샤드 [start, end) 점수 계산 (워커 프로세스에서 실행)"""
+    start_time = time.time()
+    encrypted = _worker_state['encrypted']
+    items = np.asarray(_worker_state['item_vectors'][task['start']:task['end']])
+    cache = _worker_state['cache']
+    
+    if task['op'] == 'batched':
+        if cache is not None:
+            operands = cache.item_rows(task['row_dim'])[task['start']:task['end']]
+        else:
+            operands = None
+            if items.shape[1] < task['row_dim']:
+                items = np.pad(items, ((0, 0), (0, task['row_dim'] - items.shape[1])))
+        scores, _ = score_items_batched(encrypted, items, task['rows'], progress=False, operands=operands)
+    else:
+        operands = cache.item_rows()[task['start']:task['end']] if cache is not None else None
+        scores, _ = score_items_per_item(
+            encrypted, items, replicated=(task['op'] == 'replicated'), progress=False, operands=operands
+        )
+    
+    layout = None
+    if task['pack']:
+        scores, layout = pack_scores(scores, task['slot_count'])
+        layout = [(task['start'] + start, count) for start, count in layout]
+    
+    level_drop = None
+    if task['level_drop']:
+        ciphertexts, level_drop = drop_levels_serialized(scores)
+    else:
+        ciphertexts = serialize_ciphertexts(scores)
+    
+    # 워커 구간 계측은 샤드마다 부모로 넘기고 비워서 중복 집계를 막음
+    spans = export_state()
+    reset_spans()
+    
+    return {
+        'shard': task['shard'],
+        'start': task['start'],
+        'end': task['end'],
+        'pid': os.getpid(),
+        'elapsed': time.time() - start_time,
+        'ciphertexts': ciphertexts,
+        'layout': layout,
+        'level_drop': level_drop,
+        'spans': spans
+    }
+
+def shard_ranges(num_items, num_shards, align=1):
+    """카탈로그를 연속된 아이템 범위로 분할
+    
+    샤드가 align보다 크면 align의 배수로 맞춰 패킹 암호문이 샤드 경계에서
+    불필요하게 쪼개지지 않도록 한다.
+    """
+    shard_size = -(-num_items // num_shards)
+    if shard_size > align:
+        shard_size = -(-shard_size // align) * align
+    return [(start, min(start + shard_size, num_items)) for start in range(0, num_items, shard_size)]
+
+def score_items_parallel(context_path, ciphertext, item_vectors_path, num_items,
+                         num_workers, op='replicated', slot_count=4096, pack=True,
+                         rows=1, row_dim=None, cache_config=None, writer=None, level_drop=False, item_start=0):
+    """프로세스 풀로 아이템 카탈로그를 샤딩하여 점수 계산
+    
+    Args:
+        ciphertext: 사용자(배치) 암호문 파일 경로 또는 직렬화 바이트
+        op: 'dot' (기존 아이템별 내적), 'replicated' (패킹 가능한 아이템별 내적),
+            'batched' (배치 암호문)
+        pack: 워커 안에서 샤드별로 점수를 패킹할지 여부
+        cache_config: (seal 설정, 캐시 디렉토리) - 워커별 아이템 평문 캐시 사용
+        writer: ScoreContainerWriter - 주어지면 샤드 결과를 도착 순서대로 기록하고
+                암호문을 메모리에 모으지 않는다 (반환 ciphertexts는 빈 리스트)
+        level_drop: 워커 안에서 점수 암호문을 마지막 레벨로 낮춘 뒤 직렬화
+        item_start: 아이템 [item_start, item_start + num_items) 범위만 계산 (카탈로그 세그먼트)
+    
+    Returns:
+        ciphertexts: 아이템 순서로 병합된 직렬화 암호문 리스트
+        layout: 암호문별 (시작 아이템, 아이템 수), pack=False이면 None
+        shard_results: 샤드별 타이밍 (워커 PID 포함)
+    """
+    # 패킹 시 암호문 하나에 들어가는 아이템 수의 배수로 샤드 정렬
+    align = slot_count // rows if pack else 1
+    ranges = [(item_start + start, item_start + end) for start, end in shard_ranges(num_items, num_workers, align)]
+    tasks = [
+        {
+            'shard': shard, 'start': start, 'end': end, 'op': op, 'rows': rows,
+            'row_dim': row_dim, 'slot_count': slot_count, 'pack': pack,
+            'level_drop': level_drop
+        }
+        for shard, (start, end) in enumerate(ranges)
+    ]
+    
+    logger.info(f"프로세스 풀 시작: 워커 {num_workers}개, 샤드 {len(tasks)}개")
+    
+    forward_worker_logs()
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        initializer=_init_worker,
+        initargs=(str(context_path), ciphertext if isinstance(ciphertext, bytes) else str(ciphertext),
+                  str(item_vectors_path), cache_config)
+    ) as executor:
+        # map은 입력 순서를 유지하므로 결과가 아이템 순서로 병합됨
+        ciphertexts = []
+        layout = [] if pack else None
+        shard_results = []
+        for result in executor.map(_score_shard, tasks):
+            merge_state(result.pop('spans'))
+            shard_ciphertexts = result.pop('ciphertexts')
+            if writer is not None:
+                shard_layout = result['layout'] or [(result['start'] + idx, 1) for idx in range(len(shard_ciphertexts))]
+                writer.write_all(shard_ciphertexts, shard_layout)
+            else:
+                ciphertexts.extend(shard_ciphertexts)
+            if pack:
+                layout.extend(result['layout'])
+            shard_results.append(result)
+    
+    return ciphertexts, layout, shard_results
+
+def summarize_workers(shard_results, wall_time):
+    """샤드 결과를 워커별로 집계하여 리포트용 지표 생성"""
+    workers = {}
+    for result in shard_results:
+        stats = workers.setdefault(result['pid'], {'items': 0, 'time': 0.0, 'shards': 0})
+        stats['items'] += result['end'] - result['start']
+        stats['time'] += result['elapsed']
+        stats['shards'] += 1
+    
+    worker_times = [stats['time'] for stats in workers.values()]
+    metrics = {
+        'num_workers_used': len(workers),
+        'wall_time_sec': wall_time,
+        'max_worker_time_sec': max(worker_times),
+        'mean_worker_time_sec': float(np.mean(worker_times)),
+        'load_imbalance': max(worker_times) / float(np.mean(worker_times)),
+        'parallel_efficiency': sum(worker_times) / (len(workers) * wall_time)
+    }
+    for idx, stats in enumerate(workers.values()):
+        metrics[f'worker_{idx}_items'] = stats['items']
+        metrics[f'worker_{idx}_time_sec'] = stats['time']
+        metrics[f'worker_{idx}_items_per_sec'] = stats['items'] / stats['time']
+    
+    return metrics
+
+def benchmark_worker_scaling(user_id=0, worker_counts=None, num_items=None):
+    """워커 수에 따른 아이템별(per_item) 평가 확장성 측정"""
+    reporter = ExperimentReporter('parallel_scaling')
+    
+    try:
+        config = load_config()
+        slot_count = config['seal']['poly_modulus_degree'] // 2
+        
+        context_path = Path('keys/public_context.bin')
+        ciphertext_path = Path(f'data/encrypted/user_{user_id}.bin')
+        item_vectors_path = Path('data/processed/item_vectors.npy')
+        
+        for path in (context_path, ciphertext_path, item_vectors_path):
+            if not path.exists():
+                raise FileNotFoundError(f"벤치마크 입력 파일이 없습니다: {path}")
+        
+        total_items = np.load(item_vectors_path, mmap_mode='r').shape[0]
+        num_items = min(num_items or total_items, total_items)
+        
+        if worker_counts is None:
+            cpu_count = os.cpu_count() or 1
+            worker_counts = [1]
+            while worker_counts[-1] * 2 <= cpu_count:
+                worker_counts.append(worker_counts[-1] * 2)
+        # 속도 향상은 실제로 측정한 워커 1개 실행 시간 기준
+        worker_counts = sorted({1, *worker_counts})
+        
+        logger.info("=" * 60)
+        logger.info(f"병렬 확장성 벤치마크: 아이템 {num_items}개, 워커 {worker_counts}")
+        logger.info("=" * 60)
+        
+        baseline_time = None
+        for num_workers in worker_counts:
+            start_time = time.time()
+            _, _, shard_results = score_items_parallel(
+                context_path, ciphertext_path, item_vectors_path, num_items,
+                num_workers, op='replicated', slot_count=slot_count, pack=True
+            )
+            wall_time = time.time() - start_time
+            
+            if num_workers == 1:
+                baseline_time = wall_time
+            speedup = baseline_time / wall_time
+            
+            logger.info(f"워커 {num_workers}개: {wall_time:.2f}초, 속도 향상 {speedup:.2f}x, "
+                        f"효율 {speedup / num_workers * 100:.1f}%")
+            
+            metrics = summarize_workers(shard_results, wall_time)
+            metrics.update({
+                'throughput_items_per_sec': num_items / wall_time,
+                'speedup': speedup,
+                'scaling_efficiency': speedup / num_workers
+            })
+            reporter.add_stage(
+                f'Parallel Scoring ({num_workers} workers)',
+                metrics=metrics,
+                parameters={
+                    'num_workers': num_workers,
+                    'num_items': num_items,
+                    'cpu_count': os.cpu_count(),
+                    'operation': 'per_item_replicated'
+                }
+            )
+        
+        json_path = reporter.save_json()
+        md_path = reporter.generate_markdown_report()
+        logger.info(f"실험 결과 저장: {json_path}")
+        logger.info(f"마크다운 리포트: {md_path}")
+    
+    except Exception as e:
+        log_exception(logger, e, "benchmark_worker_scaling")
+        raise
+
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='프로세스 풀 평가 확장성 벤치마크')
+    parser.add_argument('--user-id', type=int, default=0)
+    parser.add_argument('--workers', type=int, nargs='+', default=None, help='측정할 워커 수 목록 (기준인 워커 1개는 항상 측정)')
+    parser.add_argument('--num-items', type=int, default=None, help='측정에 사용할 아이템 수')
+    args = parser.parse_args(argv)
+    
+    try:
+        benchmark_worker_scaling(user_id=args.user_id, worker_counts=args.workers, num_items=args.num_items)
+    except Exception as e:
+        logger.critical("확장성 벤치마크 실패!")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import numpy as np
+import tenseal as ts
+from pathlib import Path
+from instrumentation import span
+
+# scoring.py와 같이 워커 프로세스에서도 import되므로 호출 측 로거 설정을 따른다
+logger = logging.getLogger('evaluator')
+
+# 프로세스 단위 메모리 캐시: {캐시 키: ItemPlaintextCache}
+_memory_cache = {}
+# 카탈로그 파일 해시: {경로: ((크기, 수정 시각), sha256)}
+_fingerprints = {}
+
+def encode_plain(values):
+    """평문 피연산자 변환 (구간 계측 포함)"""
+    with span('encode'):
+        return ts.plain_tensor(values)
+
+def catalog_fingerprint(item_vectors_path, chunk_size=1 << 20):
+    """아이템 벡터 파일 내용의 sha256 ((크기, 수정 시각)이 같으면 이전 값 재사용)"""
+    path = Path(item_vectors_path).resolve()
+    stat = path.stat()
+    signature = (stat.st_size, stat.st_mtime_ns)
+    cached = _fingerprints.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    _fingerprints[path] = (signature, digest.hexdigest())
+    return _fingerprints[path][1]
+
+def cache_key(seal_config, item_vectors_path):
+    """CKKS 파라미터와 카탈로그 내용으로 캐시 키 생성
+
+    파라미터(슬롯 수)가 바뀌면 블록 구성이, 카탈로그가 바뀌면 값이 달라지므로
+    둘 중 하나만 바뀌어도 다른 키가 되어 이전 캐시는 자동으로 무효화된다.
+    """
+    params = {
+        'poly_modulus_degree': seal_config['poly_modulus_degree'],
+        'coeff_mod_bit_sizes': list(seal_config['coeff_mod_bit_sizes']),
+        'scale_bits': seal_config['scale_bits']
+    }
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8'))
+    digest.update(catalog_fingerprint(item_vectors_path).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+class ItemPlaintextCache:
+    """아이템 카탈로그의 평문 피연산자 캐시
+
+    요청마다 아이템 행렬을 전치/패딩하고 파이썬 리스트로 변환하는 대신,
+    연산 모드별 피연산자(ts.PlainTensor)를 한 번만 만들어 재사용한다.
+        - item_rows(row_dim): 아이템별 행 (per_item, batched 모드)
+        - matmul_blocks(): slot_count개 단위 (item_dim, block) 전치 행렬 (packed 모드)
+
+    cache_dir이 주어지면 준비된 배열을 item_plaintexts_{key}.npz로 저장해
+    다음 실행에서 재사용하고, 키가 다른 이전 파일은 삭제한다.
+    """
+    
+    def __init__(self, seal_config, item_vectors_path='data/processed/item_vectors.npy', cache_dir=None, key=None):
+        self.item_vectors_path = Path(item_vectors_path)
+        self.slot_count = seal_config['poly_modulus_degree'] // 2
+        self.key = key or cache_key(seal_config, self.item_vectors_path)
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.item_vectors = None
+        self.disk_checked = False
+        self.arrays = {}
+        self.operands = {}
+        self.stats = {'hits': 0, 'misses': 0, 'disk_hits': 0, 'build_time_sec': 0.0}
+    
+    @property
+    def cache_path(self):
+        return self.cache_dir / f'item_plaintexts_{self.key}.npz'
+    
+    def _load_items(self):
+        if self.item_vectors is None:
+            self.item_vectors = np.load(self.item_vectors_path)
+        return self.item_vectors
+    
+    def _load_disk(self):
+        if self.cache_dir is None or not self.cache_path.exists():
+            return
+        with np.load(self.cache_path) as stored:
+            self.arrays.update({name: stored[name] for name in stored.files})
+        self.stats['disk_hits'] += 1
+        logger.info(f"평문 캐시 로드: {self.cache_path} (배열 {len(self.arrays)}개)")
+    
+    def _save_disk(self):
+        if self.cache_dir is None:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        for stale in self.cache_dir.glob('item_plaintexts_*.npz'):
+            if stale != self.cache_path:
+                logger.info(f"무효화된 평문 캐시 삭제: {stale}")
+                stale.unlink()
+        # 워커 프로세스가 동시에 읽고 쓸 수 있으므로 임시 파일에 쓴 뒤 교체
+        tmp_path = self.cache_dir / f'.item_plaintexts_{self.key}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **self.arrays)
+        os.replace(tmp_path, self.cache_path)
+    
+    def _array(self, name, build):
+        """준비된 배열 조회 (메모리 -> 디스크 -> 생성 순)"""
+        if not self.disk_checked:
+            self.disk_checked = True
+            self._load_disk()
+        if name not in self.arrays:
+            self.arrays[name] = np.ascontiguousarray(build(self._load_items()))
+            self._save_disk()
+        return self.arrays[name]
+    
+    def _get(self, name, build, to_operands):
+        if name in self.operands:
+            self.stats['hits'] += 1
+            return self.operands[name]
+        
+        self.stats['misses'] += 1
+        start_time = time.time()
+        self.operands[name] = to_operands(self._array(name, build))
+        elapsed = time.time() - start_time
+        self.stats['build_time_sec'] += elapsed
+        logger.info(f"평문 피연산자 준비: {name} ({len(self.operands[name])}개, {elapsed:.3f}초)")
+        return self.operands[name]
+    
+    def item_rows(self, row_dim=None):
+        """아이템별 평문 행 (row_dim까지 0 패딩)"""
+        def build(items):
+            if row_dim is not None and items.shape[1] < row_dim:
+                return np.pad(items, ((0, 0), (0, row_dim - items.shape[1])))
+            return items
+        
+        name = 'rows' if row_dim is None or row_dim <= self._load_items().shape[1] else f'rows_{row_dim}'
+        return self._get(name, build, lambda arr: [encode_plain(row) for row in arr])
+    
+    def matmul_blocks(self):
+        """packed 모드용 (item_dim, block) 전치 블록"""
+        def to_blocks(arr):
+            # 전치 행렬을 열 방향으로 slot_count개씩 자른다
+            return [encode_plain(np.ascontiguousarray(arr[:, start:start + self.slot_count]))
+                    for start in range(0, arr.shape[1], self.slot_count)]
+        
+        return self._get('blocks_T', lambda items: items.T, to_blocks)
+
+def get_item_cache(seal_config, item_vectors_path='data/processed/item_vectors.npy', cache_dir=None):
+    """프로세스 안에서 키가 같은 캐시 인스턴스를 공유"""
+    key = cache_key(seal_config, item_vectors_path)
+    if key not in _memory_cache:
+        _memory_cache.clear()
+        _memory_cache[key] = ItemPlaintextCache(seal_config, item_vectors_path, cache_dir, key=key)
+    return _memory_cache[key]
@@ -0,0 +1,198 @@
+import logging
+import time
+import tenseal as ts
+from instrumentation import span
+from logger import debug_sampled
+
+# 워커 프로세스에서도 import되므로 핸들러는 호출 측(evaluator) 로거 설정을 따른다
+logger = logging.getLogger('evaluator')
+
+def progress_bar(iterable, desc, enabled=True):
+    """tqdm 진행률 표시 (워커/서비스처럼 표시하지 않는 경로는 tqdm을 import하지 않음)"""
+    if not enabled:
+        return iterable
+    from tqdm import tqdm
+    return tqdm(iterable, desc=desc)
+
+def score_items_per_item(encrypted_user, item_vectors, replicated=False, progress=True, operands=None):
+    """아이템별 내적 (기준 모드)
+
+    아이템마다 평문 인코딩, 곱셈, rotate-and-sum을 따로 수행하므로
+    연산 시간이 카탈로그 크기에 선형으로 증가한다.
+
+    replicated=True이면 dot 대신 enc_matmul_plain(row=1)을 사용한다.
+    연산량은 같지만 dot 결과는 슬롯 0에만 유효한 반면, 이 경우 점수가
+    모든 슬롯에 복제되어 pack_scores로 마스킹해 모을 수 있다.
+
+    operands: 미리 변환된 아이템별 평문 (ItemPlaintextCache.item_rows)
+    """
+    encrypted_scores = []
+    computation_times = []
+    
+    for idx in progress_bar(range(len(item_vectors)), "동형 내적 연산", progress):
+        item_vec = item_vectors[idx]
+        operand = operands[idx] if operands is not None else item_vec.tolist()
+        
+        # 연산 시간 측정
+        start_time = time.time()
+        
+        try:
+            # 내적 연산: encrypted_user · item_vec
+            if replicated:
+                with span('matmul_plain'):
+                    score = encrypted_user.enc_matmul_plain(operand, 1)
+            else:
+                # dot과 같은 연산 순서 (평문 곱셈 후 rotate-and-sum)를 나눠 구간별로 계측
+                with span('multiply'):
+                    product = encrypted_user.mul(operand)
+                with span('rotate'):
+                    score = product.sum()
+            encrypted_scores.append(score)
+            
+            comp_time = time.time() - start_time
+            computation_times.append(comp_time)
+            debug_sampled(logger, 'dot', "아이템 %d 내적 %.2fms", idx, comp_time * 1000)
+            
+        except Exception as e:
+            logger.error(f"아이템 {idx} 연산 실패: {str(e)}")
+            logger.error(f"사용자 벡터 차원 vs 아이템 벡터 차원: ? vs {len(item_vec)}")
+            raise
+    
+    return encrypted_scores, computation_times
+
+def score_items_packed(encrypted_user, item_vectors, slot_count, progress=True, operands=None):
+    """대각선(Halevi-Shoup) 방식 행렬-벡터 곱으로 전체 아이템 점수 계산
+
+    TenSEAL의 matmul은 슬롯 전체에 복제된 사용자 벡터를 회전시키며
+    아이템 행렬의 대각선마다 평문 곱셈 1회를 수행한다. 비용은 아이템 수가 아니라
+    벡터 차원에 비례하고, 점수는 연속된 슬롯에 담긴다 (암호문당 최대 slot_count개).
+
+    operands: 미리 전치된 블록별 평문 (ItemPlaintextCache.matmul_blocks)
+    """
+    encrypted_blocks = []
+    computation_times = []
+    
+    for block_idx, start in enumerate(progress_bar(range(0, len(item_vectors), slot_count),
+                                                   "동형 행렬-벡터 곱", progress)):
+        block = item_vectors[start:start + slot_count]
+        
+        start_time = time.time()
+        try:
+            # (item_dim, block_size) 행렬: 결과 슬롯 i = 아이템 start + i 점수
+            operand = operands[block_idx] if operands is not None else block.T.tolist()
+            with span('matmul'):
+                encrypted_blocks.append(encrypted_user.matmul(operand))
+        except Exception as e:
+            logger.error(f"아이템 블록 {start}-{start + len(block) - 1} 연산 실패: {str(e)}")
+            raise
+        computation_times.append(time.time() - start_time)
+        debug_sampled(logger, 'matmul', "블록 %d 행렬-벡터 곱 %.2fms", block_idx, computation_times[-1] * 1000)
+    
+    return encrypted_blocks, computation_times
+
+def pack_scores(score_vectors, slot_count):
+    """아이템별 점수 암호문을 마스크로 연속 슬롯에 모으기
+
+    각 입력은 크기 k의 점수 묶음이 슬롯 전체에 주기 k로 복제된 암호문이어야 한다.
+    i번째 입력은 슬롯 [i*k, (i+1)*k)만 남기는 마스크와 곱해져 합산되므로,
+    암호문 하나에 slot_count // k개 아이템의 점수가 순서대로 담긴다.
+    마스크 곱셈에 레벨 1개를 사용한다.
+
+    Returns:
+        packed: 패킹된 암호문 리스트
+        layout: 암호문별 (시작 아이템, 아이템 수)
+    """
+    group_size = slot_count // score_vectors[0].size()
+    packed = []
+    layout = []
+    
+    for start in range(0, len(score_vectors), group_size):
+        group = score_vectors[start:start + group_size]
+        with span('pack'):
+            packed.append(ts.CKKSVector.pack_vectors(group))
+        layout.append((start, len(group)))
+    
+    return packed, layout
+
+def score_items_batched(encrypted_batch, item_vectors, rows, progress=True, operands=None):
+    """배치 암호문에 대해 아이템별 점수 계산
+
+    enc_matmul_plain은 아이템 벡터를 슬롯 전체에 복제해 곱한 뒤 row_dim 범위를
+    회전 합산한다. 결과는 배치 내 rows명의 점수가 주기 rows로 복제된 암호문이다.
+
+    operands: row_dim까지 패딩된 아이템별 평문 (ItemPlaintextCache.item_rows(row_dim))
+    """
+    encrypted_scores = []
+    computation_times = []
+    
+    for idx in progress_bar(range(len(item_vectors)), "배치 동형 내적 연산", progress):
+        start_time = time.time()
+        try:
+            operand = operands[idx] if operands is not None else item_vectors[idx].tolist()
+            with span('matmul_plain'):
+                encrypted_scores.append(encrypted_batch.enc_matmul_plain(operand, rows))
+        except Exception as e:
+            logger.error(f"아이템 {idx} 배치 연산 실패: {str(e)}")
+            raise
+        computation_times.append(time.time() - start_time)
+        debug_sampled(logger, 'batched', "아이템 %d 배치 내적 %.2fms", idx, computation_times[-1] * 1000)
+    
+    return encrypted_scores, computation_times
+
+def coeff_modulus_size(encrypted):
+    """암호문에 남은 계수 모듈러스 소수 개수 (1이면 마지막 레벨)"""
+    return encrypted.ciphertext()[0].coeff_modulus_size()
+
+def drop_to_last_level(encrypted_scores):
+    """점수 암호문을 마지막 레벨까지 낮춰 직렬화 크기와 복호화 비용 감소
+
+    TenSEAL은 mod switch를 노출하지 않으므로 스칼라 1.0 곱셈 후 자동 rescale로
+    레벨을 하나씩 소비한다 (오차는 1e-7 수준으로 증가). 마지막 레벨에는 60비트 소수
+    하나에 scale 2^40이 남으므로 점수 절댓값이 2^19보다 작아야 한다.
+    """
+    for encrypted in encrypted_scores:
+        with span('rescale'):
+            while coeff_modulus_size(encrypted) > 1:
+                encrypted.mul_(1.0)
+    return encrypted_scores
+
+def serialize_ciphertexts(encrypted_scores):
+    serialized = []
+    for encrypted in encrypted_scores:
+        with span('serialize'):
+            serialized.append(encrypted.serialize())
+    return serialized
+
+def drop_levels_serialized(encrypted_scores):
+    """마지막 레벨로 낮춘 뒤 직렬화하고, 보고용 전/후 크기와 소요 시간을 함께 반환"""
+    levels_before = coeff_modulus_size(encrypted_scores[0])
+    # 이미 마지막 레벨이면 (pack_scores 결과 등) 전/후 크기가 같으므로 한 번만 직렬화하고,
+    # 아니면 레벨이 같은 암호문은 크기가 거의 같으므로 첫 암호문 크기 x 개수로 추정
+    bytes_before = None
+    if levels_before > 1:
+        bytes_before = len(encrypted_scores[0].serialize()) * len(encrypted_scores)
+    
+    start_time = time.time()
+    drop_to_last_level(encrypted_scores)
+    drop_time = time.time() - start_time
+    
+    serialized = serialize_ciphertexts(encrypted_scores)
+    bytes_after = sum(len(data) for data in serialized)
+    return serialized, {
+        'level_drop_time_sec': drop_time,
+        'bytes_before_level_drop': bytes_after if bytes_before is None else bytes_before,
+        'bytes_after_level_drop': bytes_after,
+        'coeff_modulus_size_before': levels_before,
+        'coeff_modulus_size_after': coeff_modulus_size(encrypted_scores[0])
+    }
+
+def merge_level_drop_stats(stats_list):
+    """샤드별 drop_levels_serialized 통계 합산"""
+    stats_list = [stats for stats in stats_list if stats]
+    if not stats_list:
+        return None
+    merged = dict(stats_list[0])
+    for stats in stats_list[1:]:
+        for key in ('level_drop_time_sec', 'bytes_before_level_drop', 'bytes_after_level_drop'):
+            merged[key] += stats[key]
+    return merged
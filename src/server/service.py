@@ -0,0 +1,310 @@
+import re
+import sys
+import json
+import time
+import signal
+import asyncio
+import numpy as np
+import tenseal as ts
+from collections import deque
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent.parent / 'utils'))
+from logger import setup_logger, log_exception
+from report_generator import ExperimentReporter
+from scoring import (score_items_per_item, score_items_packed, score_items_batched, pack_scores,
+                     drop_to_last_level, serialize_ciphertexts)
+from instrumentation import span
+from wire import read_frame, encode_frame
+from plaintext_cache import get_item_cache
+from rotations import check_rotation_keys
+from ivf import get_ivf_index, score_centroids, score_clusters
+from context_registry import load_public_context, load_config, get_registry
+
+logger = setup_logger('service')
+
+TENANT_PATTERN = re.compile(r'[A-Za-z0-9_-]+')
+
+class EvaluationService:
+    """공개키 컨텍스트와 아이템 카탈로그를 메모리에 상주시키는 평가 서비스
+    
+    요청마다 Galois 키가 포함된 컨텍스트와 item_vectors.npy를 다시 읽지 않도록
+    시작 시 한 번만 로드하고, 암호화된 사용자 벡터를 받아 암호화된 점수를 돌려준다.
+    
+    프로토콜 (길이 접두 프레임, src/utils/wire.py):
+        요청: JSON 헤더 {"op": "score", "mode": ..., "rows": ..., "tenant": ...} + 암호문 프레임
+              (tenant: service.tenant_context_dir/{tenant}/public_context.bin으로 연산)
+              (IVF: mode "ivf_centroids", 이어서 mode "ivf_items" + "clusters": [...])
+              JSON 헤더 {"op": "stats"}
+        응답: JSON 헤더 {"status": "ok", "layout": ..., "num_ciphertexts": n, ...}
+              + 암호문 프레임 n개
+    """
+    
+    def __init__(self, config):
+        self.config = config
+        self.service_config = config['service']
+        self.default_mode = config['evaluation']['mode']
+        self.level_drop = config['evaluation'].get('level_drop', False)
+        self.slot_count = config['seal']['poly_modulus_degree'] // 2
+        
+        start_time = time.time()
+        self.n_threads = config['performance'].get('num_threads', 1)
+        self.context = load_public_context(n_threads=self.n_threads)
+        tenant_dir = self.service_config.get('tenant_context_dir')
+        self.tenant_dir = Path(tenant_dir) if tenant_dir else None
+        
+        item_vectors_path = Path('data/processed/item_vectors.npy')
+        self.item_vectors = np.load(item_vectors_path)
+        if self.default_mode != 'batched':
+            check_rotation_keys(self.default_mode, self.item_vectors.shape[1])
+        
+        # 기본 모드의 아이템 평문 피연산자는 시작 시 미리 준비 (나머지는 첫 요청 시)
+        self.cache = None
+        eval_config = config['evaluation']
+        if eval_config.get('plaintext_cache', False):
+            self.cache = get_item_cache(config['seal'], item_vectors_path, eval_config.get('plaintext_cache_dir'))
+            if self.default_mode == 'packed':
+                self.cache.matmul_blocks()
+            elif self.default_mode == 'per_item':
+                self.cache.item_rows()
+        self.ivf_config = config.get('ivf', {})
+        self.ivf_index = None
+        self.startup_time = time.time() - start_time
+        logger.info(f"컨텍스트/카탈로그 로드 완료 ({self.startup_time:.3f}초), "
+                    f"아이템 {self.item_vectors.shape[0]}개")
+        
+        self.semaphore = asyncio.Semaphore(self.service_config['max_concurrent_requests'])
+        self.executor = ThreadPoolExecutor(max_workers=self.service_config['max_concurrent_requests'])
+        self.pending = 0
+        
+        window = self.service_config.get('latency_window', 1000)
+        self.latencies = deque(maxlen=window)
+        self.queue_delays = deque(maxlen=window)
+        self.compute_times = deque(maxlen=window)
+        self.counters = {'requests': 0, 'errors': 0, 'rejected': 0}
+    
+    def tenant_context(self, tenant):
+        """요청 클라이언트의 공개키 컨텍스트 (레지스트리 LRU에서 조회, tenant 없으면 기본 컨텍스트)"""
+        if tenant is None:
+            return self.context
+        if self.tenant_dir is None:
+            raise ValueError("tenant 요청을 받으려면 service.tenant_context_dir 설정이 필요합니다")
+        if not TENANT_PATTERN.fullmatch(str(tenant)):
+            raise ValueError(f"유효하지 않은 tenant: {tenant}")
+        return get_registry().get(self.tenant_dir / tenant / 'public_context.bin', self.n_threads)
+    
+    def ivf_scoring_mode(self):
+        """IVF 단계별 점수 계산 방식 (배치 기본 모드는 사용자 한 명 요청이므로 packed)"""
+        return 'per_item' if self.default_mode == 'per_item' else 'packed'
+    
+    def evaluate(self, header, ciphertext):
+        """요청 하나의 동형 연산 (스레드 풀에서 실행)
+        
+        Returns:
+            모드, 직렬화 점수 암호문, layout, 응답 헤더에 추가할 필드
+        """
+        mode = header.get('mode', self.default_mode)
+        context = self.tenant_context(header.get('tenant'))
+        with span('deserialize'):
+            encrypted = ts.ckks_vector_from(context, ciphertext)
+        
+        cache = self.cache
+        extra = {}
+        if mode in ('ivf_centroids', 'ivf_items'):
+            # 인덱스는 첫 IVF 요청에서 로드 (없으면 k-means로 생성해 저장)
+            if self.ivf_index is None:
+                self.ivf_index = get_ivf_index(self.ivf_config)
+            if mode == 'ivf_centroids':
+                scores, layout = score_centroids(encrypted, self.ivf_index, self.ivf_scoring_mode(), self.slot_count)
+                extra['num_items'] = len(self.ivf_index['centroids'])
+            else:
+                clusters = [int(c) for c in header['clusters']]
+                if not all(0 <= c < len(self.ivf_index['centroids']) for c in clusters):
+                    raise ValueError(f"유효하지 않은 클러스터 ID: {clusters}")
+                scores, layout, item_ids = score_clusters(
+                    encrypted, self.item_vectors, self.ivf_index, clusters, self.ivf_scoring_mode(), self.slot_count
+                )
+                extra['num_items'] = len(item_ids)
+                extra['item_ids'] = item_ids.tolist()
+        elif mode == 'packed':
+            scores, _ = score_items_packed(
+                encrypted, self.item_vectors, self.slot_count, progress=False,
+                operands=cache.matmul_blocks() if cache else None
+            )
+            layout = [(idx * self.slot_count, block.size()) for idx, block in enumerate(scores)]
+        elif mode == 'per_item':
+            scores, _ = score_items_per_item(
+                encrypted, self.item_vectors, replicated=True, progress=False,
+                operands=cache.item_rows() if cache else None
+            )
+            scores, layout = pack_scores(scores, self.slot_count)
+        elif mode == 'batched':
+            rows = header['rows']
+            items = self.item_vectors
+            if cache is None and items.shape[1] < header['row_dim']:
+                items = np.pad(items, ((0, 0), (0, header['row_dim'] - items.shape[1])))
+            scores, _ = score_items_batched(
+                encrypted, items, rows, progress=False,
+                operands=cache.item_rows(header['row_dim']) if cache else None
+            )
+            scores, layout = pack_scores(scores, self.slot_count)
+        else:
+            raise ValueError(f"지원하지 않는 평가 모드: {mode}")
+        
+        if self.level_drop:
+            drop_to_last_level(scores)
+        return mode, serialize_ciphertexts(scores), layout, extra
+    
+    def latency_summary(self):
+        """최근 요청의 지연시간 백분위 (ms)"""
+        summary = dict(self.counters)
+        summary.update({f'context_registry_{name}': value for name, value in get_registry().stats().items()})
+        if self.cache is not None:
+            summary.update({f'plaintext_cache_{name}': value for name, value in self.cache.stats.items()})
+        for name, values in (('latency', self.latencies), ('queue_delay', self.queue_delays),
+                             ('compute', self.compute_times)):
+            if not values:
+                continue
+            arr = np.array(values) * 1000
+            summary[f'{name}_p50_ms'] = float(np.percentile(arr, 50))
+            summary[f'{name}_p95_ms'] = float(np.percentile(arr, 95))
+            summary[f'{name}_p99_ms'] = float(np.percentile(arr, 99))
+            summary[f'{name}_mean_ms'] = float(arr.mean())
+        return summary
+    
+    async def handle_score(self, header, writer, reader, received_at):
+        ciphertext = await read_frame(reader)
+        if ciphertext is None:
+            return False
+        
+        if self.pending >= self.service_config['max_pending_requests']:
+            self.counters['rejected'] += 1
+            writer.write(encode_frame({'status': 'busy', 'pending': self.pending}))
+            return True
+        
+        self.pending += 1
+        try:
+            async with self.semaphore:
+                started_at = time.time()
+                loop = asyncio.get_running_loop()
+                mode, ciphertexts, layout, extra = await loop.run_in_executor(
+                    self.executor, self.evaluate, header, ciphertext
+                )
+                finished_at = time.time()
+        except Exception as e:
+            self.counters['errors'] += 1
+            log_exception(logger, e, "handle_score")
+            writer.write(encode_frame({'status': 'error', 'message': str(e)}))
+            return True
+        finally:
+            self.pending -= 1
+        
+        self.counters['requests'] += 1
+        self.queue_delays.append(started_at - received_at)
+        self.compute_times.append(finished_at - started_at)
+        self.latencies.append(finished_at - received_at)
+        
+        writer.write(encode_frame({
+            'status': 'ok',
+            'mode': mode,
+            'num_items': int(self.item_vectors.shape[0]),
+            'layout': [list(entry) for entry in layout],
+            **extra,
+            'num_ciphertexts': len(ciphertexts),
+            'queue_delay_ms': (started_at - received_at) * 1000,
+            'compute_ms': (finished_at - started_at) * 1000
+        }))
+        for ciphertext_bytes in ciphertexts:
+            writer.write(encode_frame(ciphertext_bytes))
+        return True
+    
+    async def handle_client(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        logger.debug(f"클라이언트 연결: {peer}")
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                received_at = time.time()
+                header = json.loads(frame.decode('utf-8'))
+                
+                if header.get('op') == 'score':
+                    if not await self.handle_score(header, writer, reader, received_at):
+                        break
+                elif header.get('op') == 'stats':
+                    writer.write(encode_frame({'status': 'ok', **self.latency_summary()}))
+                else:
+                    writer.write(encode_frame({'status': 'error', 'message': f"unknown op: {header.get('op')}"}))
+                await writer.drain()
+        except Exception as e:
+            log_exception(logger, e, "handle_client")
+        finally:
+            writer.close()
+    
+    async def serve(self, stop_event):
+        server = await asyncio.start_server(
+            self.handle_client, self.service_config['host'], self.service_config['port']
+        )
+        logger.info(f"평가 서비스 시작: {self.service_config['host']}:{self.service_config['port']}")
+        async with server:
+            await stop_event.wait()
+        logger.info("평가 서비스 종료 중...")
+    
+    def save_report(self):
+        summary = self.latency_summary()
+        logger.info(f"요청 {summary['requests']}건, 오류 {summary['errors']}건, 거부 {summary['rejected']}건")
+        if 'latency_p50_ms' in summary:
+            logger.info(f"지연시간 p50={summary['latency_p50_ms']:.1f}ms, "
+                        f"p95={summary['latency_p95_ms']:.1f}ms, p99={summary['latency_p99_ms']:.1f}ms")
+        
+        reporter = ExperimentReporter('evaluation_service')
+        reporter.add_stage(
+            'Evaluation Service',
+            metrics={'startup_time_sec': self.startup_time, **summary},
+            parameters={
+                'default_mode': self.default_mode,
+                'num_items': int(self.item_vectors.shape[0]),
+                **self.service_config
+            }
+        )
+        json_path = reporter.save_json()
+        md_path = reporter.generate_markdown_report()
+        logger.info(f"실험 결과 저장: {json_path}")
+        logger.info(f"마크다운 리포트: {md_path}")
+
+def run_service():
+    config = load_config()
+    
+    async def main():
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+        
+        service = EvaluationService(config)
+        try:
+            await service.serve(stop_event)
+        finally:
+            service.executor.shutdown(wait=False)
+            service.save_report()
+    
+    asyncio.run(main())
+
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='상주 평가 서비스 (service.host/port, SIGINT/SIGTERM 시 리포트 저장)')
+    parser.parse_args(argv)
+    
+    try:
+        run_service()
+    except Exception as e:
+        log_exception(logger, e, "run_service")
+        logger.critical("평가 서비스 실패!")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,357 @@
+import sys
+import json
+import time
+import queue
+import threading
+import numpy as np
+import tenseal as ts
+from pathlib import Path
+from collections import OrderedDict
+
+sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent.parent / 'server'))
+sys.path.append(str(Path(__file__).parent.parent / 'client'))
+from logger import setup_logger, log_exception
+from report_generator import ExperimentReporter
+from rotations import batch_layout, check_rotation_keys
+from scoring import score_items_batched, pack_scores, drop_levels_serialized, serialize_ciphertexts
+from plaintext_cache import get_item_cache
+from context_registry import load_public_context, load_secret_context, load_config
+from encrypt import encrypt_batch_matrix
+from decrypt import decrypt_layout_scores, select_top_k
+
+logger = setup_logger('batch_driver')
+
+# JSONL 요청 스트림 마이크로배치 처리
+#
+#   입력: 한 줄에 요청 하나 {"request_id": ..., "user_id": ...} (파일 또는 '-': 표준 입력)
+#   출력: 배치가 끝날 때마다 요청별 결과 한 줄씩 (results/{실험 ID}_responses.jsonl)
+#
+# 읽기 스레드가 요청을 도착 시각과 함께 큐에 넣고, 스케줄러는 첫 요청이 들어온 뒤
+# 서로 다른 사용자가 배치 행 수(rows)만큼 모이거나 대기 한도가 지나면
+# 배치 하나로 암호화 -> 서버 배치 연산(enc_matmul_plain) -> 복호화한다.
+# 배치 연산 비용은 아이템 수로 정해지고 배치 안 사용자 수와는 거의 무관하므로,
+# 이미 도착한 요청은 기다리지 않고 채우고 대기 한도는
+# min(max_wait_ms, latency_budget_ms - 최근 배치 처리 시간)으로 둔다.
+#
+# 같은 사용자의 요청은 한 번만 평가한다: 대기 중인 배치에 이미 있으면 그 결과를 함께 받고,
+# 이미 처리된 사용자면 결과 캐시(result_cache_size명, LRU)에서 바로 응답한다.
+# 클라이언트(암호화/복호화)와 서버 역할을 한 프로세스에서 실행하며 네트워크 전송은 포함하지 않는다.
+
+DEFAULT_DRIVER_CONFIG = {
+    'max_batch_users': None,
+    'max_wait_ms': 50,
+    'latency_budget_ms': 30000,
+    'result_cache_size': 1024
+}
+
+_EOF = object()
+
+def read_requests(stream, requests):
+    """요청 줄을 (도착 시각, 줄 번호, 요청 또는 오류 메시지)로 큐에 넣는 읽기 스레드 본문"""
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            record = f"JSON 파싱 실패: {e}"
+        requests.put((time.perf_counter(), line_no, record))
+    requests.put(_EOF)
+
+def percentiles(values, prefix):
+    if not values:
+        return {}
+    values = np.array(values) * 1000
+    return {
+        f'{prefix}_p50_ms': float(np.percentile(values, 50)),
+        f'{prefix}_p95_ms': float(np.percentile(values, 95)),
+        f'{prefix}_p99_ms': float(np.percentile(values, 99)),
+        f'{prefix}_max_ms': float(values.max())
+    }
+
+class BatchDriver:
+    """요청 스트림을 마이크로배치로 묶어 평가하고 결과를 스트림으로 기록"""
+    
+    def __init__(self, config, output):
+        self.config = config
+        self.driver_config = {**DEFAULT_DRIVER_CONFIG, **(config.get('batch_driver') or {})}
+        self.output = output
+        self.slot_count = config['seal']['poly_modulus_degree'] // 2
+        self.threshold = config['recommendation']['threshold']
+        self.top_k = config['recommendation']['top_k']
+        self.level_drop = config['evaluation'].get('level_drop', False)
+        
+        self.secret_context = load_secret_context()
+        self.public_context = load_public_context(n_threads=config['performance'].get('num_threads', 1))
+        self.user_vectors = np.load('data/processed/user_vectors.npy')
+        self.item_ids = np.load('data/processed/item_ids.npy')
+        item_vectors_path = Path('data/processed/item_vectors.npy')
+        item_vectors = np.load(item_vectors_path)
+        self.num_items = len(item_vectors)
+        
+        self.vector_dim = self.user_vectors.shape[1]
+        # max_batch_users가 없으면 keygen이 회전 키를 만든 배치 크기(performance.batch_size)를 따름
+        # (더 큰 배치는 rows * 2^k 회전 키가 추가로 필요)
+        self.rows, self.row_dim = batch_layout(
+            self.vector_dim, self.slot_count,
+            self.driver_config['max_batch_users'] or config['performance']['batch_size']
+        )
+        check_rotation_keys('batched', self.row_dim, self.rows, self.row_dim)
+        
+        # 배치마다 같은 아이템 피연산자를 쓰므로 한 번만 준비
+        eval_config = config['evaluation']
+        if eval_config.get('plaintext_cache', False):
+            self.operands = get_item_cache(
+                config['seal'], item_vectors_path, eval_config.get('plaintext_cache_dir')
+            ).item_rows(self.row_dim)
+        else:
+            self.operands = None
+            self.item_vectors = np.pad(item_vectors, ((0, 0), (0, self.row_dim - item_vectors.shape[1])))
+        
+        self.results = OrderedDict()
+        self.service_time = None
+        self.stats = {
+            'requests': 0, 'errors': 0, 'batch_dedup_hits': 0, 'cache_hits': 0,
+            'evaluated_users': 0, 'batches': 0, 'batch_users': [], 'batch_times': [],
+            'queue_delays': [], 'latencies': []
+        }
+    
+    def wait_limit(self):
+        """첫 요청 도착 후 배치를 모으는 최대 시간 (초)"""
+        max_wait = self.driver_config['max_wait_ms'] / 1000
+        if self.service_time is None:
+            return max_wait
+        return min(max_wait, max(0.0, self.driver_config['latency_budget_ms'] / 1000 - self.service_time))
+    
+    def emit(self, response):
+        self.output.write(json.dumps(response, ensure_ascii=False) + '\n')
+    
+    def respond_error(self, request_id, line_no, message):
+        self.stats['errors'] += 1
+        self.emit({'request_id': request_id, 'status': 'error', 'line': line_no, 'error': message})
+    
+    def respond(self, request, user_id, result, batch_id, deduplicated, cached, dispatch_time):
+        arrival, request_id = request
+        now = time.perf_counter()
+        queue_delay = dispatch_time - arrival
+        self.stats['queue_delays'].append(queue_delay)
+        self.stats['latencies'].append(now - arrival)
+        self.emit({
+            'request_id': request_id,
+            'user_id': user_id,
+            'status': 'ok',
+            'recommendations': result['recommendations'],
+            'num_filtered': result['num_filtered'],
+            'batch_id': batch_id,
+            'deduplicated': deduplicated,
+            'cached': cached,
+            'queue_delay_ms': round(queue_delay * 1000, 3),
+            'latency_ms': round((now - arrival) * 1000, 3)
+        })
+    
+    def admit(self, item, pending):
+        """요청 하나를 검증해 배치에 넣거나 (중복이면 합침) 캐시/오류로 바로 응답"""
+        arrival, line_no, record = item
+        self.stats['requests'] += 1
+        if not isinstance(record, dict):
+            self.respond_error(None, line_no, record)
+            return
+        
+        request_id = record.get('request_id', f'line-{line_no}')
+        user_id = record.get('user_id')
+        if user_id is None:
+            self.respond_error(request_id, line_no, "user_id 없음")
+            return
+        if not isinstance(user_id, int) or isinstance(user_id, bool) or not 0 <= user_id < len(self.user_vectors):
+            self.respond_error(request_id, line_no, f"유효하지 않은 user_id: {user_id!r} (사용자 수: {len(self.user_vectors)})")
+            return
+        
+        if user_id in self.results:
+            self.results.move_to_end(user_id)
+            self.stats['cache_hits'] += 1
+            self.respond((arrival, request_id), user_id, self.results[user_id], None, True, True, arrival)
+        elif user_id in pending:
+            self.stats['batch_dedup_hits'] += 1
+            pending[user_id].append((arrival, request_id))
+        else:
+            pending[user_id] = [(arrival, request_id)]
+    
+    def collect_batch(self, requests):
+        """서로 다른 사용자 rows명 또는 대기 한도까지 요청 모으기 -> (사용자별 요청, 입력 끝 여부)"""
+        pending = OrderedDict()
+        deadline = None
+        while len(pending) < self.rows:
+            try:
+                if deadline is None:
+                    item = requests.get()
+                else:
+                    remaining = deadline - time.perf_counter()
+                    item = requests.get(timeout=remaining) if remaining > 0 else requests.get_nowait()
+            except queue.Empty:
+                break
+            if item is _EOF:
+                return pending, True
+            self.admit(item, pending)
+            if pending and deadline is None:
+                deadline = next(iter(pending.values()))[0][0] + self.wait_limit()
+        return pending, False
+    
+    def run_batch(self, user_ids):
+        """배치 암호화(클라이언트) -> 배치 점수 연산(서버) -> 복호화 및 사용자별 Top-K(클라이언트)"""
+        encrypted_batch = encrypt_batch_matrix(self.secret_context, self.user_vectors, user_ids, self.rows, self.row_dim)
+        encrypted_batch = ts.ckks_vector_from(self.public_context, encrypted_batch.serialize())
+        
+        item_vectors = self.operands if self.operands is not None else self.item_vectors
+        encrypted_scores, _ = score_items_batched(
+            encrypted_batch, item_vectors, self.rows, progress=False, operands=self.operands
+        )
+        encrypted_scores, layout = pack_scores(encrypted_scores, self.slot_count)
+        if self.level_drop:
+            serialized, _ = drop_levels_serialized(encrypted_scores)
+        else:
+            serialized = serialize_ciphertexts(encrypted_scores)
+        
+        scores = decrypt_layout_scores(self.secret_context, serialized, layout, slots_per_item=self.rows)
+        results = {}
+        for row, user_id in enumerate(user_ids):
+            indices, num_filtered = select_top_k(scores[:, row], self.threshold, self.top_k)
+            results[user_id] = {
+                'recommendations': [{'item_id': int(self.item_ids[idx]), 'score': float(scores[idx, row])}
+                                    for idx in indices],
+                'num_filtered': int(num_filtered)
+            }
+        return results
+    
+    def cache_result(self, user_id, result):
+        if self.driver_config['result_cache_size'] <= 0:
+            return
+        self.results[user_id] = result
+        if len(self.results) > self.driver_config['result_cache_size']:
+            self.results.popitem(last=False)
+    
+    def run(self, stream):
+        requests = queue.Queue()
+        reader = threading.Thread(target=read_requests, args=(stream, requests), daemon=True)
+        start_time = time.perf_counter()
+        reader.start()
+        
+        done = False
+        while not done:
+            pending, done = self.collect_batch(requests)
+            if pending:
+                batch_id = self.stats['batches']
+                dispatch_time = time.perf_counter()
+                user_ids = list(pending)
+                results = self.run_batch(user_ids)
+                batch_time = time.perf_counter() - dispatch_time
+                self.service_time = batch_time
+                
+                for user_id in user_ids:
+                    self.cache_result(user_id, results[user_id])
+                    for idx, request in enumerate(pending[user_id]):
+                        self.respond(request, user_id, results[user_id], batch_id, idx > 0, False, dispatch_time)
+                
+                self.stats['batches'] += 1
+                self.stats['evaluated_users'] += len(user_ids)
+                self.stats['batch_users'].append(len(user_ids))
+                self.stats['batch_times'].append(batch_time)
+                logger.info(f"배치 {batch_id}: 사용자 {len(user_ids)}/{self.rows}명, "
+                            f"요청 {sum(len(reqs) for reqs in pending.values())}개, {batch_time:.2f}초")
+            self.output.flush()
+        
+        reader.join()
+        return time.perf_counter() - start_time
+
+def process_requests(input_path, output_path=None):
+    """JSONL 요청 스트림 마이크로배치 처리 with 결과 기록"""
+    reporter = ExperimentReporter('batch_requests')
+    
+    try:
+        config = load_config()
+        output_path = Path(output_path or reporter.results_dir / f'{reporter.experiment_id}_responses.jsonl')
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        logger.info("=" * 60)
+        logger.info(f"배치 요청 처리 시작: {input_path} -> {output_path}")
+        logger.info("=" * 60)
+        
+        stream = sys.stdin if str(input_path) == '-' else open(input_path, 'r', encoding='utf-8')
+        try:
+            with open(output_path, 'w', encoding='utf-8') as output:
+                driver = BatchDriver(config, output)
+                logger.info(f"배치 레이아웃: {driver.rows}행 x {driver.row_dim}열, 아이템 {driver.num_items}개, "
+                            f"대기 한도 {driver.driver_config['max_wait_ms']}ms, "
+                            f"지연 예산 {driver.driver_config['latency_budget_ms']}ms")
+                wall_time = driver.run(stream)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        
+        stats = driver.stats
+        num_ok = stats['requests'] - stats['errors']
+        logger.info(f"요청 {stats['requests']}개 (오류 {stats['errors']}개) -> 배치 {stats['batches']}개, "
+                    f"평가 사용자 {stats['evaluated_users']}명, {wall_time:.2f}초 ({stats['requests'] / wall_time:.2f} 요청/초)")
+        if stats['errors'] == stats['requests']:
+            logger.warning("유효한 요청이 없습니다 (요청마다 user_id 필요)")
+        
+        reporter.add_stage(
+            'Batch Request Driver',
+            metrics={
+                'num_requests': stats['requests'],
+                'num_errors': stats['errors'],
+                'num_batches': stats['batches'],
+                'evaluated_users': stats['evaluated_users'],
+                'batch_dedup_hits': stats['batch_dedup_hits'],
+                'cache_hits': stats['cache_hits'],
+                'dedup_ratio': (num_ok - stats['evaluated_users']) / num_ok if num_ok else 0.0,
+                'mean_batch_users': float(np.mean(stats['batch_users'])) if stats['batches'] else 0.0,
+                'slot_utilization': (float(np.mean(stats['batch_users'])) * driver.vector_dim / driver.slot_count
+                                     if stats['batches'] else 0.0),
+                'mean_batch_time_sec': float(np.mean(stats['batch_times'])) if stats['batches'] else 0.0,
+                'wall_time_sec': wall_time,
+                'requests_per_sec': stats['requests'] / wall_time,
+                'evaluated_users_per_sec': stats['evaluated_users'] / wall_time,
+                **percentiles(stats['queue_delays'], 'queue_delay'),
+                **percentiles(stats['latencies'], 'latency')
+            },
+            parameters={
+                'input': str(input_path),
+                'output_path': str(output_path),
+                'rows': driver.rows,
+                'row_dim': driver.row_dim,
+                'num_items': driver.num_items,
+                'level_drop': driver.level_drop,
+                'plaintext_cache': driver.operands is not None,
+                **driver.driver_config
+            }
+        )
+        
+        json_path = reporter.save_json()
+        md_path = reporter.generate_markdown_report()
+        logger.info(f"실험 결과 저장: {json_path}")
+        logger.info(f"마크다운 리포트: {md_path}")
+        
+        return stats
+    
+    except Exception as e:
+        log_exception(logger, e, "process_requests")
+        raise
+
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='JSONL 요청 스트림 마이크로배치 처리')
+    parser.add_argument('input', nargs='?', default='requests.jsonl', help="요청 JSONL 파일 ('-': 표준 입력)")
+    parser.add_argument('--output', default=None, help='결과 JSONL 경로 (기본값: results/{실험 ID}_responses.jsonl)')
+    args = parser.parse_args(argv)
+    
+    try:
+        process_requests(args.input, args.output)
+    except Exception as e:
+        logger.critical("배치 요청 처리 실패!")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+import sys
+import json
+import time
+import shutil
+import numpy as np
+import tenseal as ts
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent.parent / 'server'))
+sys.path.append(str(Path(__file__).parent.parent / 'client'))
+from logger import setup_logger, log_exception
+from context_registry import load_config
+from report_generator import ExperimentReporter
+from rotations import batch_layout, required_rotation_steps, create_galois_keys, attach_galois_keys
+from scoring import score_items_per_item, score_items_packed, score_items_batched, pack_scores, drop_to_last_level
+from decrypt import StreamingTopK
+
+logger = setup_logger('benchmark')
+
+# 합성 데이터 기반 단계별 벤치마크 (MovieLens 불필요)
+#
+# 각 단계는 warmup회 실행 후 repeats회 측정하고 중앙값/백분위를 기록한다.
+# --save-baseline으로 저장한 결과와 단계별 중앙값을 비교해 tolerance 이상 느려지면
+# 회귀로 보고하고 종료 코드 1을 반환한다.
+PERCENTILES = (50, 90, 95, 99)
+
+def synthetic_vectors(num_users, num_items, vector_dim, seed=0):
+    """data_prep.py 출력과 같이 행 단위 L2 정규화된 비음수 사용자/아이템 행렬"""
+    rng = np.random.default_rng(seed)
+    user_vectors = np.abs(rng.standard_normal((num_users, vector_dim)))
+    item_vectors = np.abs(rng.standard_normal((num_items, vector_dim)))
+    user_vectors /= np.linalg.norm(user_vectors, axis=1, keepdims=True)
+    item_vectors /= np.linalg.norm(item_vectors, axis=1, keepdims=True)
+    return user_vectors, item_vectors
+
+def measure(fn, warmup, repeats, setup=None):
+    """fn을 warmup회 실행한 뒤 repeats회 측정 (마지막 반환값과 초 단위 측정값 리스트)
+
+    setup이 있으면 매 실행 전에 측정 밖에서 호출해 그 반환값을 fn 인자로 넘긴다.
+    """
+    times = []
+    for run in range(warmup + repeats):
+        args = (setup(),) if setup else ()
+        start_time = time.perf_counter()
+        result = fn(*args)
+        if run >= warmup:
+            times.append(time.perf_counter() - start_time)
+    return result, times
+
+def summarize_times(times):
+    times = np.array(times)
+    summary = {f'p{p}_sec': float(np.percentile(times, p)) for p in PERCENTILES}
+    summary.update({
+        'median_sec': float(np.median(times)),
+        'mean_sec': float(times.mean()),
+        'min_sec': float(times.min()),
+        'max_sec': float(times.max()),
+        'repeats': len(times)
+    })
+    return summary
+
+def generate_benchmark_keys(config):
+    """설정의 CKKS 파라미터로 비밀키 컨텍스트와 (최소 회전 키) 공개키 컨텍스트 생성"""
+    seal_config = config['seal']
+    context = ts.context(
+        ts.SCHEME_TYPE.CKKS,
+        poly_modulus_degree=seal_config['poly_modulus_degree'],
+        coeff_mod_bit_sizes=seal_config['coeff_mod_bit_sizes']
+    )
+    context.global_scale = 2 ** seal_config['scale_bits']
+    steps, _ = required_rotation_steps(config, config['benchmark']['modes'])
+    galois_keys = create_galois_keys(context, seal_config, steps)
+    
+    public = context.copy()
+    public.make_context_public()
+    public_context = ts.context_from(attach_galois_keys(public.serialize(), galois_keys))
+    return context, public_context
+
+def run_benchmarks(config, user_vectors, item_vectors):
+    """단계별 측정
+
+    Returns:
+        [(단계 이름, 측정값 리스트, 파라미터)]
+    """
+    bench_config = config['benchmark']
+    warmup = bench_config['warmup']
+    repeats = bench_config['repeats']
+    modes = bench_config['modes']
+    level_drop = config['evaluation'].get('level_drop', False)
+    slot_count = config['seal']['poly_modulus_degree'] // 2
+    vector_dim = user_vectors.shape[1]
+    user_vector = user_vectors[0].tolist()
+    stages = []
+    
+    logger.info("키 생성 측정...")
+    (context, public_context), times = measure(lambda: generate_benchmark_keys(config), warmup, repeats)
+    stages.append(('keygen', times, {'galois_keys': 'minimal'}))
+    
+    logger.info("사용자 벡터 암호화 측정...")
+    user_bytes, times = measure(lambda: ts.ckks_vector(context, user_vector).serialize(), warmup, repeats)
+    stages.append(('encrypt_user', times, {'vector_dim': vector_dim}))
+    encrypted_user = ts.ckks_vector_from(public_context, user_bytes)
+    
+    score_ciphertexts = {}
+    if 'packed' in modes:
+        logger.info("packed 평가 측정...")
+        (scores, _), times = measure(
+            lambda: score_items_packed(encrypted_user, item_vectors, slot_count, progress=False), warmup, repeats
+        )
+        stages.append(('evaluate_packed', times, {'num_items': len(item_vectors)}))
+        layout = [(idx * slot_count, block.size()) for idx, block in enumerate(scores)]
+        score_ciphertexts['packed'] = (scores, layout, 1)
+    
+    if 'per_item' in modes:
+        logger.info("per_item 평가 측정...")
+        (scores, _), times = measure(
+            lambda: score_items_per_item(encrypted_user, item_vectors, replicated=True, progress=False),
+            warmup, repeats
+        )
+        stages.append(('evaluate_per_item', times, {'num_items': len(item_vectors)}))
+        
+        (packed, layout), times = measure(lambda: pack_scores(scores, slot_count), warmup, repeats)
+        stages.append(('pack_scores', times, {'num_items': len(item_vectors)}))
+        score_ciphertexts['per_item'] = (packed, layout, 1)
+    
+    if 'batched' in modes:
+        rows, row_dim = batch_layout(vector_dim, slot_count, config['performance']['batch_size'])
+        batch = np.zeros((rows, row_dim))
+        batch[:min(rows, len(user_vectors)), :vector_dim] = user_vectors[:rows]
+        
+        logger.info("배치 암호화 측정...")
+        batch_bytes, times = measure(
+            lambda: ts.enc_matmul_encoding(context, batch.tolist()).serialize(), warmup, repeats
+        )
+        stages.append(('encrypt_batch', times, {'rows': rows, 'row_dim': row_dim}))
+        encrypted_batch = ts.ckks_vector_from(public_context, batch_bytes)
+        padded_items = np.pad(item_vectors, ((0, 0), (0, row_dim - vector_dim)))
+        
+        logger.info("batched 평가 측정...")
+        (scores, _), times = measure(
+            lambda: score_items_batched(encrypted_batch, padded_items, rows, progress=False), warmup, repeats
+        )
+        stages.append(('evaluate_batched', times, {'num_items': len(item_vectors), 'rows': rows}))
+        packed, layout = pack_scores(scores, slot_count)
+        score_ciphertexts['batched'] = (packed, layout, rows)
+    
+    for mode, (scores, layout, slots_per_item) in score_ciphertexts.items():
+        if level_drop:
+            # 레벨 하향은 암호문을 제자리에서 바꾸므로 측정마다 역직렬화한 사본 사용
+            # (CKKSVector.copy()는 컨텍스트까지 복사해 측정값을 왜곡)
+            originals = [score.serialize() for score in scores]
+            _, times = measure(
+                drop_to_last_level, warmup, repeats,
+                setup=lambda: [ts.ckks_vector_from(public_context, data) for data in originals]
+            )
+            stages.append((f'level_drop_{mode}', times, {'num_ciphertexts': len(scores)}))
+            drop_to_last_level(scores)
+        
+        serialized, times = measure(lambda: [score.serialize() for score in scores], warmup, repeats)
+        stages.append((f'serialize_{mode}', times, {
+            'num_ciphertexts': len(scores), 'size_kb': sum(len(data) for data in serialized) / 1024
+        }))
+        
+        logger.info(f"{mode} 복호화 + Top-K 측정...")
+        
+        def decrypt_top_k():
+            selector = StreamingTopK(config['recommendation']['top_k'], config['recommendation']['threshold'],
+                                     columns=slots_per_item)
+            for data, (start, count) in zip(serialized, layout):
+                values = ts.ckks_vector_from(context, data).decrypt()[:count * slots_per_item]
+                selector.update(start, np.reshape(values, (count, slots_per_item)))
+            return selector.result()
+        
+        _, times = measure(decrypt_top_k, warmup, repeats)
+        stages.append((f'decrypt_top_k_{mode}', times, {'num_ciphertexts': len(serialized)}))
+    
+    return stages
+
+def compare_with_baseline(reporter, baseline_path, tolerance):
+    """단계별 중앙값을 기준 결과와 비교해 회귀 단계 목록 반환"""
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    baseline_medians = {stage['stage']: stage['metrics']['median_sec'] for stage in baseline['stages']
+                        if 'median_sec' in stage['metrics']}
+    
+    ratios = {}
+    regressions = []
+    for stage in reporter.data['stages']:
+        name = stage['stage']
+        if name not in baseline_medians:
+            continue
+        ratio = stage['metrics']['median_sec'] / baseline_medians[name]
+        ratios[f'{name}_ratio'] = ratio
+        status = '회귀' if ratio > 1 + tolerance else '정상'
+        logger.info(f"  {name}: {baseline_medians[name] * 1000:.2f}ms -> "
+                    f"{stage['metrics']['median_sec'] * 1000:.2f}ms ({ratio:.2f}x, {status})")
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    
+    reporter.add_stage(
+        'Baseline Comparison',
+        metrics={**ratios, 'num_regressions': len(regressions), 'regressions': regressions},
+        parameters={'baseline': str(baseline_path), 'baseline_id': baseline['experiment_id'], 'tolerance': tolerance}
+    )
+    return regressions
+
+def run_benchmark_suite(save_baseline=False):
+    """합성 데이터로 전체 단계 벤치마크 실행 with 결과 기록
+
+    Returns:
+        기준 대비 회귀 단계 이름 리스트 (기준 파일이 없으면 빈 리스트)
+    """
+    reporter = ExperimentReporter('benchmark')
+    
+    try:
+        config = load_config()
+        bench_config = config['benchmark']
+        vector_dim = bench_config.get('vector_dim') or config['dataset']['vector_dim']
+        # 회전 키/배치 레이아웃이 합성 데이터 차원을 따르도록 설정 차원 교체
+        config['dataset'] = {**config['dataset'], 'vector_dim': vector_dim}
+        user_vectors, item_vectors = synthetic_vectors(
+            bench_config['num_users'], bench_config['num_items'], vector_dim, bench_config.get('seed', 0)
+        )
+        
+        logger.info("=" * 60)
+        logger.info(f"벤치마크 시작: 합성 데이터 사용자 {len(user_vectors)}명 x 아이템 {len(item_vectors)}개 "
+                    f"(차원 {vector_dim}), warmup {bench_config['warmup']}회 + 측정 {bench_config['repeats']}회")
+        logger.info("=" * 60)
+        
+        common = {
+            'poly_modulus_degree': config['seal']['poly_modulus_degree'],
+            'coeff_mod_bit_sizes': config['seal']['coeff_mod_bit_sizes'],
+            'warmup': bench_config['warmup']
+        }
+        for name, times, parameters in run_benchmarks(config, user_vectors, item_vectors):
+            summary = summarize_times(times)
+            logger.info(f"{name}: 중앙값 {summary['median_sec'] * 1000:.2f}ms, "
+                        f"p95 {summary['p95_sec'] * 1000:.2f}ms")
+            reporter.add_stage(name, metrics=summary, parameters={**common, **parameters})
+        
+        baseline_path = Path(bench_config['baseline_path'])
+        regressions = []
+        if baseline_path.exists() and not save_baseline:
+            logger.info(f"기준 결과와 비교: {baseline_path} (허용 {bench_config['tolerance'] * 100:.0f}%)")
+            regressions = compare_with_baseline(reporter, baseline_path, bench_config['tolerance'])
+            if regressions:
+                logger.warning(f"성능 회귀 {len(regressions)}개 단계: {', '.join(regressions)}")
+        
+        json_path = reporter.save_json()
+        md_path = reporter.generate_markdown_report()
+        logger.info(f"실험 결과 저장: {json_path}")
+        logger.info(f"마크다운 리포트: {md_path}")
+        
+        if save_baseline:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy(json_path, baseline_path)
+            logger.info(f"기준 결과 저장: {baseline_path}")
+        
+        return regressions
+    
+    except Exception as e:
+        log_exception(logger, e, "run_benchmark_suite")
+        raise
+
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='합성 데이터 단계별 벤치마크')
+    parser.add_argument('--save-baseline', action='store_true', help='이번 결과를 비교 기준으로 저장')
+    args = parser.parse_args(argv)
+    
+    try:
+        regressions = run_benchmark_suite(save_baseline=args.save_baseline)
+    except Exception as e:
+        logger.critical("벤치마크 실패!")
+        sys.exit(1)
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+import json
+import hashlib
+from pathlib import Path
+from container import check_layout
+
+# 카탈로그 버전과 아이템 범위 세그먼트 (data/processed/catalog.json)
+#
+#   {"version": 3, "segments": [{"start": 0, "end": 600, "digest": ..., "version": 1},
+#                               {"start": 600, "end": 612, "digest": ..., "version": 3}]}
+#
+# 아이템 벡터가 바뀌면 세그먼트별 내용 해시(digest)를 다시 계산해
+#   - 뒤에 추가된 아이템은 새 세그먼트로 붙이고
+#   - 내용이 바뀐 세그먼트는 해시와 버전만 갱신하며
+#   - 세그먼트가 max_segments개를 넘으면 뒤쪽 세그먼트를 하나로 합친다.
+# 점수 컨테이너 헤더에 계산에 쓴 세그먼트 목록을 기록하므로 evaluator는 범위와 해시가
+# 같은 세그먼트의 암호문 레코드를 그대로 옮기고 나머지 세그먼트만 다시 계산한다.
+# 매니페스트는 아이템 벡터를 만드는 data_prep만 갱신하고, evaluator는 읽고 확인만 한다.
+
+CATALOG_PATH = 'data/processed/catalog.json'
+DEFAULT_CATALOG_CONFIG = {
+    'incremental': True,
+    'max_segments': 16,
+    'small_segment_items': 256
+}
+
+def catalog_config(config):
+    return {**DEFAULT_CATALOG_CONFIG, **(config.get('catalog') or {})}
+
+def segment_digest(item_vectors, start, end):
+    """아이템 [start, end) 벡터 내용의 sha256 (차원 포함)"""
+    rows = item_vectors[start:end]
+    digest = hashlib.sha256(f'{rows.shape}{rows.dtype}'.encode('utf-8'))
+    digest.update(rows.tobytes())
+    return digest.hexdigest()
+
+def load_catalog(path=CATALOG_PATH):
+    """카탈로그 매니페스트 (없으면 None)"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def sync_catalog(item_vectors, config, path=CATALOG_PATH):
+    """현재 아이템 벡터에 맞춰 세그먼트 목록을 갱신
+
+    바뀐 것이 없으면 버전을 유지하고 파일도 다시 쓰지 않는다.
+
+    Returns:
+        매니페스트, 이번에 추가/갱신된 세그먼트 리스트
+    """
+    max_segments = catalog_config(config)['max_segments']
+    num_items = len(item_vectors)
+    catalog = load_catalog(path) or {'version': 0, 'segments': []}
+    version = catalog['version'] + 1
+    
+    segments = []
+    for segment in catalog['segments']:
+        start, end = segment['start'], min(segment['end'], num_items)
+        if start >= end:
+            break
+        digest = segment_digest(item_vectors, start, end)
+        if (start, end, digest) != (segment['start'], segment['end'], segment['digest']):
+            segment = {'start': start, 'end': end, 'digest': digest, 'version': version}
+        segments.append(segment)
+    
+    covered = segments[-1]['end'] if segments else 0
+    if covered < num_items:
+        segments.append({'start': covered, 'end': num_items,
+                         'digest': segment_digest(item_vectors, covered, num_items), 'version': version})
+    
+    # 작은 세그먼트가 계속 쌓이면 암호문 패킹이 쪼개지므로 뒤쪽을 하나로 합침
+    if len(segments) > max_segments:
+        start = segments[max_segments - 1]['start']
+        segments[max_segments - 1:] = [{'start': start, 'end': num_items,
+                                        'digest': segment_digest(item_vectors, start, num_items),
+                                        'version': version}]
+    
+    if segments == catalog['segments']:
+        return catalog, []
+    
+    catalog = {'version': version, 'num_items': num_items, 'segments': segments}
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(catalog, f, indent=2)
+    return catalog, [segment for segment in segments if segment['version'] == version]
+
+def describe_segments(segments):
+    return ', '.join(f"[{segment['start']}, {segment['end']})" for segment in segments)
+
+def tiles_segment(layout, segment):
+    """레코드들이 세그먼트 범위를 경계를 넘지 않고 빈틈없이 덮는지 (layout은 시작 아이템 순)"""
+    covered = segment['start']
+    for start, count in layout:
+        if segment['start'] <= start < segment['end']:
+            if start != covered:
+                return False
+            covered = start + count
+    return covered == segment['end']
+
+def reusable_segments(header, layout, catalog, user_digest, scoring):
+    """이전 점수 컨테이너에서 다시 계산하지 않고 옮길 수 있는 세그먼트
+
+    같은 사용자 암호문(user_digest)과 같은 점수 계산 설정(scoring: 평가 모드, pack_scores,
+    level_drop)으로 계산했고 범위와 내용 해시가 현재 카탈로그와 같으며, 이전 레코드(layout)가
+    세그먼트를 정확히 나눠 덮는 세그먼트만 해당 (경계를 넘는 레코드는 옮길 수 없음).
+    """
+    if header is None or header.get('user_digest') != user_digest or header.get('scoring') != scoring:
+        return []
+    previous = {(segment['start'], segment['end'], segment['digest']) for segment in header.get('segments', [])}
+    layout = sorted(layout)
+    return [segment for segment in catalog['segments']
+            if (segment['start'], segment['end'], segment['digest']) in previous and tiles_segment(layout, segment)]
+
+def copy_segment_records(reader, writer, segments):
+    """세그먼트 범위 안의 암호문 레코드를 다시 직렬화하지 않고 옮김 -> 옮긴 레코드 수"""
+    ranges = [(segment['start'], segment['end']) for segment in segments]
+    copied = 0
+    for start, count, enc_ser in reader:
+        if any(seg_start <= start and start + count <= seg_end for seg_start, seg_end in ranges):
+            writer.write(bytes(enc_ser), start, count)
+            copied += 1
+    return copied
+
+def validate_catalog(catalog, item_vectors):
+    """카탈로그 매니페스트가 현재 아이템 벡터와 맞는지 확인 (없거나 다르면 예외)"""
+    if catalog is None:
+        raise FileNotFoundError(f"카탈로그가 없습니다 (data_prep.py를 먼저 실행하세요): {CATALOG_PATH}")
+    check_segments(catalog)
+    num_items = len(item_vectors)
+    if catalog['num_items'] != num_items or catalog['segments'][-1]['end'] != num_items:
+        raise ValueError(f"카탈로그 버전 {catalog['version']}의 아이템 수({catalog['num_items']}개)가 "
+                         f"아이템 벡터({num_items}개)와 다릅니다: data_prep.py를 다시 실행하세요")
+    stale = [segment for segment in catalog['segments']
+             if segment_digest(item_vectors, segment['start'], segment['end']) != segment['digest']]
+    if stale:
+        raise ValueError(f"카탈로그 버전 {catalog['version']}의 세그먼트 {describe_segments(stale)} 내용이 "
+                         f"아이템 벡터와 다릅니다: data_prep.py를 다시 실행하세요")
+
+def check_segments(header, catalog=None, layout=None):
+    """점수 컨테이너의 세그먼트가 빈틈 없이 이어지고 레코드(layout)가 모든 아이템을 덮는지 확인하고,
+    현재 카탈로그 버전과 다르면 경고 메시지 반환
+    """
+    segments = header.get('segments')
+    if not segments:
+        if layout is not None:
+            check_layout(layout)
+        return None
+    covered = 0
+    for segment in sorted(segments, key=lambda segment: segment['start']):
+        if segment['start'] != covered:
+            raise ValueError(f"점수 세그먼트에 빈 범위가 있습니다: [{covered}, {segment['start']})")
+        covered = segment['end']
+    if layout is not None:
+        check_layout(layout, covered)
+    if catalog is not None and catalog['version'] != header.get('catalog_version'):
+        return (f"점수가 카탈로그 버전 {header.get('catalog_version')} 기준입니다 "
+                f"(현재 버전 {catalog['version']}, 아이템 {catalog['num_items']}개): evaluator를 다시 실행하세요")
+    return None
@@ -0,0 +1,210 @@
+import os
+import mmap
+import json
+import struct
+from pathlib import Path
+from instrumentation import span
+
+# 암호화된 점수 컨테이너 (pickle 대체)
+#
+#   MAGIC | 헤더 프레임 (4바이트 길이 + JSON)
+#   레코드 * n: (시작 아이템, 아이템 수, 길이) big-endian uint32 3개 + 직렬화 암호문
+#   종료 레코드 (시작 아이템 = END_MARKER)
+#   푸터 프레임 (JSON: 암호문 수, 아이템 수, 레코드 오프셋)
+#   트레일러: 푸터 오프셋 uint64 + MAGIC
+#
+# 레코드는 앞에서부터 순서대로 쓰고 읽을 수 있어 스트리밍이 가능하고,
+# 트레일러의 푸터 오프셋으로 임의 접근도 가능하다.
+MAGIC = b'FHEC'
+VERSION = 2
+END_MARKER = 0xFFFFFFFF
+_LENGTH = struct.Struct('>I')
+_RECORD = struct.Struct('>III')
+_TRAILER = struct.Struct('>Q4s')
+
+def ckks_header(seal_config):
+    """헤더에 기록할 CKKS 파라미터"""
+    return {
+        'poly_modulus_degree': seal_config['poly_modulus_degree'],
+        'coeff_mod_bit_sizes': list(seal_config['coeff_mod_bit_sizes']),
+        'scale_bits': seal_config['scale_bits']
+    }
+
+def check_layout(layout, num_items=None):
+    """레코드 범위 (시작 아이템, 아이템 수)가 [0, num_items)를 빈틈과 겹침 없이 덮는지 확인
+
+    푸터의 item_range/num_items는 기록된 레코드의 최솟값/최댓값과 합이므로
+    빠진 범위가 있어도 드러나지 않는다. num_items가 없으면 마지막 레코드 끝까지 확인.
+
+    Returns:
+        덮인 아이템 수
+    """
+    covered = 0
+    for start, count in sorted(layout):
+        if start > covered:
+            raise ValueError(f"점수 레코드가 아이템 [{covered}, {start})을 덮지 않습니다")
+        if start < covered:
+            raise ValueError(f"점수 레코드가 아이템 [{start}, {covered})을 두 번 덮습니다")
+        covered = start + count
+    if num_items is not None and covered != num_items:
+        raise ValueError(f"점수 레코드가 아이템 {covered}개만 덮습니다 (전체 {num_items}개)")
+    return covered
+
+class ScoreContainerWriter:
+    """암호문을 계산되는 순서대로 파일에 기록
+
+    임시 파일에 쓴 뒤 close()에서 교체하므로 중간에 실패해도 이전 결과 파일이
+    깨지지 않는다. 메모리에는 레코드 오프셋만 유지한다.
+
+    header 필드:
+        ckks: CKKS 파라미터 (ckks_header)
+        packing: 'per_item' (아이템당 암호문 1개, 슬롯 0) | 'packed' (연속 슬롯)
+        slots_per_item: 아이템 하나가 차지하는 슬롯 수 (배치 모드는 rows)
+        그 외 모드별 필드 (예: user_ids, rows)
+    """
+    
+    def __init__(self, path, header):
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(f'.{self.path.name}.{os.getpid()}.tmp')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.tmp_path, 'wb')
+        self.offsets = []
+        self.num_items = 0
+        self.item_range = None
+        
+        header = {'version': VERSION, **header}
+        payload = json.dumps(header).encode('utf-8')
+        self.file.write(MAGIC + _LENGTH.pack(len(payload)) + payload)
+    
+    def write(self, ciphertext, start, count):
+        """암호문 하나 기록 (아이템 [start, start + count) 점수)"""
+        if not isinstance(ciphertext, bytes):
+            with span('serialize'):
+                ciphertext = ciphertext.serialize()
+        self.offsets.append(self.file.tell())
+        self.file.write(_RECORD.pack(start, count, len(ciphertext)))
+        self.file.write(ciphertext)
+        
+        self.num_items += count
+        end = start + count
+        self.item_range = (start, end) if self.item_range is None else (
+            min(self.item_range[0], start), max(self.item_range[1], end)
+        )
+    
+    def write_all(self, ciphertexts, layout):
+        for ciphertext, (start, count) in zip(ciphertexts, layout):
+            self.write(ciphertext, start, count)
+    
+    def close(self):
+        self.file.write(_RECORD.pack(END_MARKER, 0, 0))
+        footer_offset = self.file.tell()
+        footer = json.dumps({
+            'num_ciphertexts': len(self.offsets),
+            'num_items': self.num_items,
+            'item_range': list(self.item_range or (0, 0)),
+            'offsets': self.offsets
+        }).encode('utf-8')
+        self.file.write(_LENGTH.pack(len(footer)) + footer)
+        self.file.write(_TRAILER.pack(footer_offset, MAGIC))
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+    
+    def abort(self):
+        self.file.close()
+        self.tmp_path.unlink(missing_ok=True)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class ScoreContainerReader:
+    """점수 컨테이너 읽기 (mmap 기반, 암호문 단위 스트리밍)
+
+    헤더와 푸터만 파싱하고 암호문은 순회할 때 하나씩 꺼내므로
+    카탈로그 크기와 무관하게 메모리 사용량이 일정하다.
+    """
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self.file = open(self.path, 'rb')
+        try:
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"빈 점수 파일입니다: {self.path}")
+        
+        try:
+            self._parse()
+        except struct.error:
+            # 헤더나 푸터가 가리키는 범위가 파일 밖인 경우 (잘린 파일, 손상된 트레일러)
+            self.close()
+            raise ValueError(f"컨테이너가 잘렸거나 손상되었습니다: {self.path}")
+        except ValueError:
+            self.close()
+            raise
+    
+    def _parse(self):
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"점수 컨테이너 형식이 아닙니다: {self.path}")
+        
+        (length,) = _LENGTH.unpack_from(self.buffer, len(MAGIC))
+        header_start = len(MAGIC) + _LENGTH.size
+        self.header = json.loads(self.buffer[header_start:header_start + length].decode('utf-8'))
+        self.records_start = header_start + length
+        if self.header.get('version') != VERSION:
+            raise ValueError(f"지원하지 않는 컨테이너 버전: {self.header.get('version')}")
+        
+        footer_offset, magic = _TRAILER.unpack_from(self.buffer, len(self.buffer) - _TRAILER.size)
+        if magic != MAGIC:
+            raise ValueError(f"컨테이너가 완전히 기록되지 않았습니다: {self.path}")
+        (length,) = _LENGTH.unpack_from(self.buffer, footer_offset)
+        self.footer = json.loads(
+            self.buffer[footer_offset + _LENGTH.size:footer_offset + _LENGTH.size + length].decode('utf-8')
+        )
+    
+    @property
+    def num_items(self):
+        return self.footer['num_items']
+    
+    @property
+    def layout(self):
+        return [_RECORD.unpack_from(self.buffer, offset)[:2] for offset in self.footer['offsets']]
+    
+    def __len__(self):
+        return self.footer['num_ciphertexts']
+    
+    def _record(self, offset):
+        start, count, length = _RECORD.unpack_from(self.buffer, offset)
+        body = offset + _RECORD.size
+        return start, count, self.buffer[body:body + length]
+    
+    def __getitem__(self, index):
+        """index번째 (시작 아이템, 아이템 수, 직렬화 암호문)"""
+        return self._record(self.footer['offsets'][index])
+    
+    def __iter__(self):
+        offset = self.records_start
+        while True:
+            start, count, length = _RECORD.unpack_from(self.buffer, offset)
+            if start == END_MARKER:
+                return
+            body = offset + _RECORD.size
+            yield start, count, self.buffer[body:body + length]
+            offset = body + length
+    
+    def close(self):
+        if getattr(self, 'buffer', None) is not None:
+            self.buffer.close()
+            self.buffer = None
+        self.file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,169 @@
+import copy
+import time
+import hashlib
+import logging
+import threading
+import tenseal as ts
+import yaml
+from collections import OrderedDict
+from pathlib import Path
+
+# 클라이언트/서버 양쪽에서 import되므로 핸들러는 호출 측 로거 설정을 따른다
+logger = logging.getLogger('context_registry')
+
+PUBLIC_CONTEXT_PATH = 'keys/public_context.bin'
+SECRET_CONTEXT_PATH = 'keys/secret_context.bin'
+CONFIG_PATH = 'config/params.yaml'
+
+class ContextRegistry:
+    """역직렬화한 TenSEAL 컨텍스트를 (경로, 내용 해시, n_threads) 키로 보관하는 LRU 캐시
+
+    Galois 키가 포함된 공개키 컨텍스트는 수십 MB이고 역직렬화에 수백 ms가 걸리므로
+    프로세스 안에서 한 번만 읽는다. 파일 내용 해시는 (크기, 수정 시각)이 바뀔 때만
+    다시 계산하고, 키 파일이 교체되면 같은 경로의 이전 항목은 바로 버린다.
+
+    여러 클라이언트의 공개키 컨텍스트를 들고 있는 서버를 위해 항목 수와
+    직렬화 크기 합(메모리 사용량 근사)으로 상한을 두고 가장 오래 쓰지 않은 항목부터 내보낸다.
+    """
+    
+    def __init__(self, max_entries=8, max_memory_mb=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_memory_mb * 1024 * 1024 if max_memory_mb else None
+        self.entries = OrderedDict()
+        self.fingerprints = {}
+        self.total_bytes = 0
+        # 서비스 스레드 풀에서 동시에 호출될 수 있으므로 조회/로드를 직렬화
+        self.lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        self.times = {'load_time_sec': 0.0, 'max_load_time_sec': 0.0, 'hash_time_sec': 0.0}
+    
+    def _fingerprint(self, path):
+        """파일 내용 sha256 ((크기, 수정 시각)이 같으면 이전 값 재사용)"""
+        stat = path.stat()
+        signature = (stat.st_size, stat.st_mtime_ns)
+        cached = self.fingerprints.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        
+        start_time = time.time()
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        self.times['hash_time_sec'] += time.time() - start_time
+        self.fingerprints[path] = (signature, digest.hexdigest())
+        return self.fingerprints[path][1]
+    
+    def get(self, path, n_threads=None):
+        """컨텍스트 조회 (없거나 파일 내용이 바뀌었으면 역직렬화)"""
+        path = Path(path).resolve()
+        if not path.exists():
+            raise FileNotFoundError(f"컨텍스트 파일이 없습니다: {path}")
+        
+        with self.lock:
+            digest = self._fingerprint(path)
+            key = (str(path), digest, n_threads)
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.counters['hits'] += 1
+                return entry[0]
+            
+            self.counters['misses'] += 1
+            for stale in [k for k in self.entries if k[0] == str(path) and k[1] != digest]:
+                self._remove(stale)
+                self.counters['invalidations'] += 1
+            
+            start_time = time.time()
+            with open(path, 'rb') as f:
+                data = f.read()
+            context = ts.context_from(data, n_threads=n_threads)
+            load_time = time.time() - start_time
+            self.times['load_time_sec'] += load_time
+            self.times['max_load_time_sec'] = max(self.times['max_load_time_sec'], load_time)
+            logger.info(f"컨텍스트 로드: {path} ({len(data) / 1024 / 1024:.1f} MB, {load_time:.3f}초)")
+            
+            self.entries[key] = (context, len(data))
+            self.total_bytes += len(data)
+            self._evict()
+            return context
+    
+    def _remove(self, key):
+        _, nbytes = self.entries.pop(key)
+        self.total_bytes -= nbytes
+    
+    def _evict(self):
+        # 방금 넣은 항목 하나는 상한을 넘더라도 유지
+        while len(self.entries) > 1 and (
+            len(self.entries) > self.max_entries
+            or (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        ):
+            key = next(iter(self.entries))
+            self._remove(key)
+            self.counters['evictions'] += 1
+            logger.info(f"컨텍스트 캐시에서 제거 (LRU): {key[0]}")
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+    
+    def stats(self):
+        """조회/적중/로드 시간 지표"""
+        lookups = self.counters['hits'] + self.counters['misses']
+        return {
+            **self.counters,
+            'hit_rate': self.counters['hits'] / lookups if lookups else 0.0,
+            'entries': len(self.entries),
+            'cached_mb': self.total_bytes / 1024 / 1024,
+            'load_time_sec': self.times['load_time_sec'],
+            'mean_load_time_ms': self.times['load_time_sec'] / self.counters['misses'] * 1000
+            if self.counters['misses'] else 0.0,
+            'max_load_time_ms': self.times['max_load_time_sec'] * 1000,
+            'hash_time_sec': self.times['hash_time_sec']
+        }
+
+# 프로세스 단위 기본 레지스트리 (첫 사용 시 context_registry 설정으로 생성)
+_registry = None
+_config_cache = {}
+
+def load_config(path=CONFIG_PATH):
+    """설정 로드 (파일이 바뀌지 않았으면 파싱 결과 재사용, 호출 측 수정에 대비해 사본 반환)"""
+    path = Path(path)
+    stat = path.stat()
+    signature = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+    if _config_cache.get('signature') != signature:
+        with open(path, 'r') as f:
+            _config_cache['config'] = yaml.safe_load(f)
+        _config_cache['signature'] = signature
+    return copy.deepcopy(_config_cache['config'])
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        registry_config = load_config().get('context_registry', {})
+        _registry = ContextRegistry(
+            max_entries=registry_config.get('max_entries', 8),
+            max_memory_mb=registry_config.get('max_memory_mb')
+        )
+    return _registry
+
+def load_public_context(n_threads=None, path=PUBLIC_CONTEXT_PATH):
+    """공개키 컨텍스트 (n_threads: TenSEAL 내부 연산 스레드 수)"""
+    return get_registry().get(path, n_threads)
+
+def load_secret_context(n_threads=None, path=SECRET_CONTEXT_PATH):
+    """비밀키 컨텍스트"""
+    return get_registry().get(path, n_threads)
+
+def report_context_registry(reporter):
+    """레지스트리 지표를 리포트 단계로 기록"""
+    registry = get_registry()
+    reporter.add_stage(
+        'Context Registry',
+        metrics=registry.stats(),
+        parameters={
+            'max_entries': registry.max_entries,
+            'max_memory_mb': registry.max_bytes / 1024 / 1024 if registry.max_bytes else None
+        }
+    )
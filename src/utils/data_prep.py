@@ -1,49 +1,147 @@
+import io
 import os
+import json
 import sys
+import time
+import hashlib
 import logging
+import resource
 import numpy as np
-import pandas as pd
-from sklearn.preprocessing import normalize
-import yaml
+from scipy import sparse
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent))
 from logger import setup_logger, log_exception
+from report_generator import ExperimentReporter
+from catalog import sync_catalog, describe_segments
 
 logger = setup_logger('data_prep', level=logging.DEBUG)
 
+# pandas/sklearn은 import에 1초 이상 걸리므로 실제로 쓰는 함수 안에서 import한다
+# (파이프라인이 전처리를 건너뛰거나 ratings_format만 쓸 때 로드하지 않음)
+
 def load_config():
+    # context_registry는 tenseal을 import하므로 설정이 필요할 때 가져온다
+    from context_registry import load_config as load_shared_config
     try:
         logger.info("설정 파일 로드 중...")
-        with open('config/params.yaml', 'r') as f:
-            config = yaml.safe_load(f)
+        config = load_shared_config()
         logger.info("설정 파일 로드 완료")
         return config
     except Exception as e:
         log_exception(logger, e, "load_config")
         raise
 
-def load_movielens_1m():
-    """MovieLens 1M 데이터 로드"""
+# MovieLens 배포판별 평점 파일 형식: (파일명, 구분자, 헤더 여부)
+RATINGS_FORMATS = {
+    'movielens-100k': ('u.data', '\t', False),
+    'movielens-1m': ('ratings.dat', '::', False),
+    'movielens-10m': ('ratings.dat', '::', False),
+    'movielens-20m': ('ratings.csv', ',', True),
+    'movielens-25m': ('ratings.csv', ',', True),
+    'movielens-32m': ('ratings.csv', ',', True)
+}
+RATINGS_COLUMNS = ['userId', 'movieId', 'rating', 'timestamp']
+RATINGS_DTYPES = {'userId': np.int32, 'movieId': np.int32, 'rating': np.float32, 'timestamp': np.int64}
+
+def ratings_format(dataset_config):
+    """dataset 설정의 평점 파일 경로, 구분자, 헤더 여부 (ratings_file/separator/header로 덮어쓰기)"""
+    name = dataset_config['name']
+    if name not in RATINGS_FORMATS and 'ratings_file' not in dataset_config:
+        raise ValueError(f"알 수 없는 데이터셋: {name} ({' | '.join(RATINGS_FORMATS)}, "
+                         f"또는 dataset.ratings_file/separator/header 지정)")
+    filename, separator, header = RATINGS_FORMATS.get(name, (None, ',', False))
+    return (
+        Path(dataset_config['path']) / dataset_config.get('ratings_file', filename),
+        dataset_config.get('separator', separator),
+        dataset_config.get('header', header)
+    )
+
+def ratings_source_key(ratings_file, method='mtime'):
+    """평점 캐시 무효화 키 - mtime: 크기 + 수정 시각 (즉시) | hash: 파일 내용 sha256"""
+    if method == 'hash':
+        digest = hashlib.sha256()
+        with open(ratings_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    stat = os.stat(ratings_file)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+def parse_ratings(ratings_file, separator, header=False):
+    """pandas C 파서로 평점 파일을 열 단위 파싱
+
+    '::' 같은 여러 글자 구분자는 C 엔진이 지원하지 않아 python 엔진(정규식)으로
+    처리되므로, 파일 바이트에서 한 글자 구분자로 치환한 뒤 C 엔진으로 읽는다.
+    """
+    import pandas as pd
+    source = ratings_file
+    if len(separator) > 1:
+        with open(ratings_file, 'rb') as f:
+            source = io.BytesIO(f.read().replace(separator.encode('utf-8'), b'\t'))
+        separator = '\t'
+    
+    return pd.read_csv(
+        source,
+        sep=separator,
+        header=0 if header else None,
+        names=RATINGS_COLUMNS,
+        dtype=RATINGS_DTYPES,
+        engine='c'
+    )
+
+def load_ratings_cache(cache_path, source_key):
+    """키가 일치하는 열 단위 평점 캐시 로드 (없거나 오래되면 None)"""
+    import pandas as pd
+    if not cache_path.exists():
+        return None
+    with np.load(cache_path) as stored:
+        if str(stored['source_key']) != source_key:
+            logger.info(f"평점 캐시가 원본과 다름 (재파싱): {cache_path}")
+            return None
+        return pd.DataFrame({column: stored[column] for column in RATINGS_COLUMNS})
+
+def save_ratings_cache(cache_path, ratings, source_key):
+    """평점 열을 npz로 저장 (임시 파일 기록 후 교체)"""
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(f'.{cache_path.name}.{os.getpid()}.tmp.npz')
+    np.savez(tmp_path, source_key=np.array(source_key),
+             **{column: ratings[column].to_numpy() for column in RATINGS_COLUMNS})
+    os.replace(tmp_path, cache_path)
+    logger.info(f"평점 캐시 저장: {cache_path} ({cache_path.stat().st_size / 1024 / 1024:.1f} MB)")
+
+def load_movielens(config=None):
+    """MovieLens 평점 데이터 로드 (dataset.name으로 배포판 형식 선택)
+
+    파싱 결과는 dataset.ratings_cache_dir에 열 단위 npz로 저장하고,
+    원본 파일의 키(ratings_cache_key)가 같으면 다음 실행에서 파싱을 건너뛴다.
+    """
     try:
-        logger.info("MovieLens 1M 데이터셋 로드 시작")
-        config = load_config()
-        data_path = config['dataset']['path']
+        config = config or load_config()
+        dataset_config = config['dataset']
+        logger.info(f"MovieLens 데이터셋 로드 시작 ({dataset_config['name']})")
         
-        ratings_file = os.path.join(data_path, 'ratings.dat')
+        ratings_file, separator, header = ratings_format(dataset_config)
         logger.debug(f"파일 경로: {ratings_file}")
         
         if not os.path.exists(ratings_file):
             logger.error(f"파일이 존재하지 않음: {ratings_file}")
-            raise FileNotFoundError(f"ratings.dat not found at {ratings_file}")
-        
-        logger.info("ratings.dat 파싱 중...")
-        ratings = pd.read_csv(
-            ratings_file,
-            sep='::',
-            engine='python',
-            names=['userId', 'movieId', 'rating', 'timestamp']
-        )
+            raise FileNotFoundError(f"{ratings_file.name} not found at {ratings_file}")
+        
+        start_time = time.time()
+        cache_dir = dataset_config.get('ratings_cache_dir')
+        cache_path = Path(cache_dir) / f"ratings_{dataset_config['name']}.npz" if cache_dir else None
+        source_key = ratings_source_key(ratings_file, dataset_config.get('ratings_cache_key', 'mtime'))
+        
+        ratings = load_ratings_cache(cache_path, source_key) if cache_path else None
+        if ratings is not None:
+            logger.info(f"평점 캐시 사용: {cache_path} ({time.time() - start_time:.3f}초)")
+        else:
+            logger.info(f"{ratings_file.name} 파싱 중...")
+            ratings = parse_ratings(ratings_file, separator, header)
+            logger.info(f"파싱 완료 ({time.time() - start_time:.3f}초)")
+            if cache_path:
+                save_ratings_cache(cache_path, ratings, source_key)
         
         logger.info(f"데이터 로드 완료:")
         logger.info(f"  - 총 평점 수: {len(ratings):,}")
@@ -54,94 +152,217 @@ def load_movielens_1m():
         return ratings
         
     except Exception as e:
-        log_exception(logger, e, "load_movielens_1m")
+        log_exception(logger, e, "load_movielens")
         raise
 
+def sparse_nbytes(matrix):
+    """CSR/CSC 행렬이 차지하는 바이트 (data + indices + indptr)"""
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
 def create_user_item_matrix(ratings, min_rating=3.0):
-    """User-Item 행렬 생성"""
+    """User-Item 행렬 생성 (scipy.sparse CSR)
+
+    사용자/영화 ID를 정렬된 정수 코드로 바꿔 평점 >= min_rating인 (사용자, 영화)만
+    1로 채운다. 밀집 pivot_table과 같은 행/열 순서이지만 메모리는 평점 수에 비례한다.
+
+    Returns:
+        (num_users, num_movies) CSR 행렬, 행별 userId, 열별 movieId
+    """
     try:
         logger.info(f"User-Item 행렬 생성 시작 (최소 평점: {min_rating})")
         
         original_count = len(ratings)
-        ratings_filtered = ratings[ratings['rating'] >= min_rating].copy()
+        ratings_filtered = ratings[ratings['rating'] >= min_rating]
         filtered_count = len(ratings_filtered)
         
         logger.info(f"필터링: {original_count:,} -> {filtered_count:,} ({filtered_count/original_count*100:.1f}%)")
         
-        ratings_filtered['rating'] = 1.0
+        logger.info("희소 행렬(CSR) 생성 중...")
+        user_ids, user_codes = np.unique(ratings_filtered['userId'].to_numpy(), return_inverse=True)
+        movie_ids, movie_codes = np.unique(ratings_filtered['movieId'].to_numpy(), return_inverse=True)
         
-        logger.info("Pivot table 생성 중...")
-        user_item = ratings_filtered.pivot_table(
-            index='userId',
-            columns='movieId',
-            values='rating',
-            fill_value=0
+        user_item = sparse.csr_matrix(
+            (np.ones(filtered_count, dtype=np.float32), (user_codes, movie_codes)),
+            shape=(len(user_ids), len(movie_ids))
         )
+        # 같은 (사용자, 영화) 평점이 중복되면 합산되므로 다시 이진화
+        user_item.sum_duplicates()
+        user_item.data[:] = 1.0
         
-        logger.info(f"User-Item 행렬 shape: {user_item.shape}")
-        logger.info(f"Sparsity: {(user_item == 0).sum().sum() / (user_item.shape[0] * user_item.shape[1]) * 100:.2f}%")
+        density = user_item.nnz / (user_item.shape[0] * user_item.shape[1])
+        logger.info(f"User-Item 행렬 shape: {user_item.shape}, 0이 아닌 원소 {user_item.nnz:,}개")
+        logger.info(f"Sparsity: {(1 - density) * 100:.2f}%")
+        logger.info(f"메모리: CSR {sparse_nbytes(user_item) / 1024 / 1024:.2f} MB "
+                    f"(밀집 float64 기준 {user_item.shape[0] * user_item.shape[1] * 8 / 1024 / 1024:.2f} MB)")
         
-        return user_item
+        return user_item, user_ids, movie_ids
         
     except Exception as e:
         log_exception(logger, e, "create_user_item_matrix")
         raise
 
-def vectorize_and_normalize(user_item_matrix, max_dim=512):
-    """벡터화 및 정규화 - 올바른 버전"""
+def fit_embeddings(matrix, dim, embedding_config):
+    """(사용자, 아이템) 행렬의 dim차원 저랭크 분해
+
+    randomized: 희소 행렬에 randomized SVD (Halko et al.) - 비용 O(nnz * dim)
+    incremental: 사용자 행 batch_size개씩 IncrementalPCA (메모리는 배치 크기에 비례,
+                 평균을 뺀 공분산 기준이라 점수는 아이템 평균 대비 선호도)
+
+    성분은 특이값 내림차순이므로 앞쪽 k열만 잘라 더 작은 차원 임베딩으로 쓸 수 있다.
+
+    Returns:
+        사용자 인자 (num_users, dim), 아이템 인자 (num_items, dim) - 특이값 제곱근 배분,
+        fold-in용 상태 {'singular_values': (dim,), 'mean': (num_items,)}
+    """
+    from sklearn.decomposition import IncrementalPCA
+    from sklearn.utils.extmath import randomized_svd
+    method = embedding_config.get('method', 'randomized')
+    seed = embedding_config.get('seed', 42)
+    rank = min(dim, *matrix.shape)
+    if rank < dim:
+        logger.warning(f"임베딩 차원 {dim} > 행렬 최대 랭크 {rank}, 남는 차원은 0으로 채움")
+    
+    if method == 'randomized':
+        U, S, Vt = randomized_svd(
+            matrix, n_components=rank, n_iter=embedding_config.get('n_iter', 5), random_state=seed
+        )
+        scale = np.sqrt(S)
+        user_factors, item_factors = U * scale, Vt.T * scale
+        mean = np.zeros(matrix.shape[1])
+    elif method == 'incremental':
+        if matrix.shape[0] < max(rank, 1):
+            raise ValueError(f"incremental 임베딩에는 사용자 행이 랭크 {rank} 이상 필요합니다 "
+                             f"(사용자 {matrix.shape[0]}명)")
+        batch_size = max(embedding_config.get('batch_size', 2048), rank)
+        # partial_fit은 랭크보다 적은 행을 받지 못하므로 짧은 마지막 배치는 앞 배치에 합침
+        bounds = list(range(0, matrix.shape[0], batch_size)) + [matrix.shape[0]]
+        if len(bounds) > 2 and bounds[-1] - bounds[-2] < rank:
+            del bounds[-2]
+        batches = list(zip(bounds[:-1], bounds[1:]))
+        pca = IncrementalPCA(n_components=rank, batch_size=batch_size)
+        for start, end in batches:
+            pca.partial_fit(matrix[start:end].toarray())
+        scale = np.sqrt(pca.singular_values_)
+        user_factors = np.vstack([pca.transform(matrix[start:end].toarray()) for start, end in batches]) / scale
+        item_factors = pca.components_.T * scale
+        S, mean = pca.singular_values_, pca.mean_
+    else:
+        raise ValueError(f"지원하지 않는 임베딩 방식: {method} (randomized | incremental)")
+    
+    if rank < dim:
+        user_factors = np.pad(user_factors, ((0, 0), (0, dim - rank)))
+        item_factors = np.pad(item_factors, ((0, 0), (0, dim - rank)))
+        S = np.pad(S, (0, dim - rank), constant_values=1.0)
+    return user_factors, item_factors, {'singular_values': S, 'mean': mean}
+
+def fold_in_users(rows, item_factors, state):
+    """고정된 아이템 인자 공간에 사용자 행 투영: (x - mean) V S^(-1/2)
+
+    fit_embeddings의 사용자 인자 U S^(1/2)와 같은 스케일이므로 전체 분해 없이
+    평점이 바뀐 사용자만 다시 계산할 수 있다.
+    """
+    rows = rows.toarray() if sparse.issparse(rows) else rows
+    return (rows - state['mean']) @ item_factors / state['singular_values']
+
+def fold_in_items(columns, user_factors, state):
+    """고정된 사용자 인자 공간에 새 아이템 열 투영 ((num_users, n) 열 -> (n, dim) 인자)"""
+    columns = columns.toarray() if sparse.issparse(columns) else columns
+    if state['mean'].any():
+        # incremental(PCA)은 아이템별 평균을 빼고 분해하므로 새 열도 중심화
+        columns = columns - columns.mean(axis=0)
+    return columns.T @ user_factors / state['singular_values']
+
+def split_holdout(matrix, holdout_ratio, seed=42):
+    """평점의 holdout_ratio를 평가용으로 분리 (학습 행렬, 평가 행렬)"""
+    coo = matrix.tocoo()
+    held = np.random.default_rng(seed).random(coo.nnz) < holdout_ratio
+    
+    def subset(mask):
+        return sparse.csr_matrix((coo.data[mask], (coo.row[mask], coo.col[mask])), shape=matrix.shape)
+    
+    return subset(~held), subset(held)
+
+def recall_at_k(train, heldout, user_vectors, item_vectors, k, users):
+    """평가 사용자들의 평균 recall@k (학습에 쓴 아이템은 후보에서 제외)"""
+    recalls = []
+    for start in range(0, len(users), 256):
+        chunk = users[start:start + 256]
+        scores = user_vectors[chunk] @ item_vectors.T
+        scores[train[chunk].nonzero()] = -np.inf
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        
+        for row, user in enumerate(chunk):
+            relevant = heldout.indices[heldout.indptr[user]:heldout.indptr[user + 1]]
+            recalls.append(np.isin(top[row], relevant).sum() / len(relevant))
+    return float(np.mean(recalls))
+
+def embedding_recall_curve(matrix, embedding_config):
+    """임베딩 차원별 recall@k (holdout 평가)
+
+    가장 큰 차원으로 한 번만 분해하고 앞쪽 성분을 잘라 작은 차원을 평가한다.
+
+    Returns:
+        {차원: recall}, 최대 recall 대비 recall_tolerance 이상인 가장 작은 차원
+    """
+    from sklearn.preprocessing import normalize
+    dims = sorted(embedding_config['curve_dims'])
+    k = embedding_config.get('recall_k', 10)
+    seed = embedding_config.get('seed', 42)
+    
+    train, heldout = split_holdout(matrix, embedding_config.get('holdout_ratio', 0.2), seed)
+    users = np.flatnonzero(np.diff(heldout.indptr))
+    num_eval = embedding_config.get('eval_users', 1000)
+    if len(users) > num_eval:
+        users = np.sort(np.random.default_rng(seed).choice(users, num_eval, replace=False))
+    
+    user_factors, item_factors, _ = fit_embeddings(train, dims[-1], embedding_config)
+    curve = {}
+    for dim in dims:
+        user_vectors = normalize(user_factors[:, :dim], axis=1)
+        item_vectors = normalize(item_factors[:, :dim], axis=1)
+        curve[dim] = recall_at_k(train, heldout, user_vectors, item_vectors, k, users)
+        logger.info(f"  차원 {dim}: recall@{k} = {curve[dim]:.4f}")
+    
+    target = max(curve.values()) * embedding_config.get('recall_tolerance', 0.95)
+    suggested = min(dim for dim, recall in curve.items() if recall >= target)
+    return curve, suggested
+
+def vectorize_and_normalize(user_item_matrix, movie_ids, num_items=512, vector_dim=512, embedding_config=None):
+    """벡터화 및 정규화 (희소 행렬 입력)
+
+    상위 num_items개 인기 영화를 카탈로그로 두고, (사용자, 영화) 행렬을
+    vector_dim차원으로 분해해 사용자/아이템 벡터를 같은 임베딩 공간에 놓는다.
+    반환하는 state(인자, 특이값, 카탈로그 행렬)는 증분 갱신(apply_ratings_delta)에 쓴다.
+    두 벡터 모두 L2 정규화하므로 암호화 내적이 코사인 유사도가 된다.
+    vector_dim이 암호화 벡터 길이(동형 연산 비용)를 결정하며 카탈로그 크기와는 독립이다.
+    """
+    from sklearn.preprocessing import normalize
     try:
-        logger.info(f"벡터 차원 축소 및 정규화 시작 (목표 차원: {max_dim})")
+        embedding_config = embedding_config or {}
+        logger.info(f"벡터 임베딩 및 정규화 시작 (카탈로그 {num_items}개, 임베딩 차원: {vector_dim})")
         
-        # 차원 축소: 상위 인기 영화 선택
-        item_counts = user_item_matrix.sum(axis=0).sort_values(ascending=False)
-        top_items = item_counts.head(max_dim).index
+        # 카탈로그: 상위 인기 영화 선택 (동점은 movieId 순)
+        item_counts = np.asarray(user_item_matrix.sum(axis=0)).ravel()
+        top_columns = np.argsort(-item_counts, kind='stable')[:num_items]
         
-        logger.info(f"상위 {max_dim}개 인기 영화 선택")
-        logger.info(f"선택된 영화의 평균 평점 수: {item_counts.head(max_dim).mean():.1f}")
+        logger.info(f"상위 {len(top_columns)}개 인기 영화 선택")
+        logger.info(f"선택된 영화의 평균 평점 수: {item_counts[top_columns].mean():.1f}")
         
         # 선택된 영화로 축소
-        user_item_reduced = user_item_matrix[top_items]
+        user_item_reduced = user_item_matrix[:, top_columns]
         
         logger.info(f"축소된 User-Item 행렬 shape: {user_item_reduced.shape}")
         logger.info(f"  → {user_item_reduced.shape[0]}명 사용자 × {user_item_reduced.shape[1]}개 영화")
         
-        # 정규화
-        logger.info("L2 정규화 수행 중...")
-        
-        # 사용자 벡터: 각 사용자의 영화 선호도 (행 단위 정규화)
-        # shape: (num_users, max_dim)
-        user_vectors = normalize(user_item_reduced.values, axis=1)
-        
-        # 아이템 벡터: 각 영화에 대한 사용자 반응 패턴을 영화 특성으로 변환
-        # 전치 후 다시 max_dim 차원으로 축소
-        item_matrix_T = user_item_reduced.T  # (max_dim, num_users)
-        
-        # 아이템도 사용자와 같은 차원(max_dim)으로 맞추기 위해
-        # 사용자 중 상위 max_dim명 선택 또는 차원 축소
-        # 여기서는 간단히: 아이템 벡터 = 전치된 행렬의 각 행 (영화별 사용자 평점 패턴)
-        
-        # 방법 1: 아이템 벡터를 사용자 벡터와 동일한 공간으로 투영
-        # 가장 간단한 방법: 아이템 행렬을 전치하지 않고, 같은 영화 차원 사용
-        item_vectors = user_vectors[:max_dim].copy()  # 상위 max_dim명 사용자를 아이템 대표로
-        
-        # 방법 2 (더 정확): 아이템을 max_dim 차원의 임베딩으로 표현
-        # SVD 등으로 차원 축소 가능하지만, 여기서는 단순화
-        # 실제로는: 각 아이템의 특성을 max_dim 차원으로 인코딩
-        
-        # 수정된 방법: 각 아이템을 max_dim 차원 벡터로 표현
-        # user_item_reduced는 이미 (num_users, max_dim)
-        # item 벡터는 이 행렬을 전치한 후, 각 아이템(영화)의 벡터를 추출
-        # 하지만 차원을 맞추려면, 아이템도 max_dim 차원이어야 함
-        
-        # 최종 방법: 아이템 벡터 = 전치 행렬에서 상위 사용자 패턴 기반 축소
-        from sklearn.decomposition import TruncatedSVD
-        
-        logger.info("아이템 벡터 차원 축소 (SVD) 수행 중...")
-        svd = TruncatedSVD(n_components=max_dim, random_state=42)
-        item_features = svd.fit_transform(user_item_reduced.T.values)  # (max_dim, max_dim)
+        # 임베딩 (희소 행렬 그대로 분해)
+        method = embedding_config.get('method', 'randomized')
+        logger.info(f"임베딩 분해 수행 중 ({method})...")
+        user_factors, item_factors, state = fit_embeddings(user_item_reduced, vector_dim, embedding_config)
         
         # 정규화
-        item_vectors = normalize(item_features, axis=1)
+        logger.info("L2 정규화 수행 중...")
+        user_vectors = normalize(user_factors, axis=1)
+        item_vectors = normalize(item_factors, axis=1)
         
         logger.info(f"사용자 벡터 shape: {user_vectors.shape}")
         logger.info(f"아이템 벡터 shape: {item_vectors.shape}")
@@ -155,14 +376,176 @@ def vectorize_and_normalize(user_item_matrix, max_dim=512):
         logger.info("✓ 내적 연산을 위한 차원 일치 확인 완료")
         logger.info(f"벡터 메모리 사용량: {(user_vectors.nbytes + item_vectors.nbytes) / 1024 / 1024:.2f} MB")
         
-        return user_vectors, item_vectors, top_items.tolist()
+        state.update({'item_factors': item_factors, 'matrix': user_item_reduced})
+        return user_vectors, item_vectors, movie_ids[top_columns].tolist(), state
         
     except Exception as e:
         log_exception(logger, e, "vectorize_and_normalize")
         raise
 
-def save_processed_data(user_vectors, item_vectors, item_ids):
-    """전처리 데이터 저장"""
+def save_embedding_state(state, user_ids, item_ids, method):
+    """증분 갱신용 임베딩 상태 저장 (data/processed/embedding_state.npz)"""
+    matrix = state['matrix'].tocsr()
+    path = Path('data/processed') / 'embedding_state.npz'
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp.npz')
+    np.savez(
+        tmp_path,
+        method=np.array(method),
+        user_ids=np.asarray(user_ids),
+        item_ids=np.asarray(item_ids),
+        item_factors=state['item_factors'],
+        singular_values=state['singular_values'],
+        mean=state['mean'],
+        matrix_data=matrix.data,
+        matrix_indices=matrix.indices,
+        matrix_indptr=matrix.indptr,
+        matrix_shape=np.array(matrix.shape)
+    )
+    os.replace(tmp_path, path)
+    logger.info(f"임베딩 상태 저장: {path} ({path.stat().st_size / 1024:.1f} KB)")
+
+def load_embedding_state():
+    path = Path('data/processed') / 'embedding_state.npz'
+    if not path.exists():
+        raise FileNotFoundError(f"임베딩 상태가 없습니다 (전체 전처리를 먼저 실행하세요): {path}")
+    with np.load(path) as stored:
+        state = {name: stored[name] for name in stored.files}
+    state['matrix'] = sparse.csr_matrix(
+        (state.pop('matrix_data'), state.pop('matrix_indices'), state.pop('matrix_indptr')),
+        shape=tuple(state.pop('matrix_shape'))
+    )
+    return state
+
+def apply_ratings_delta(delta_path, config=None):
+    """새 평점 파일(delta)만 반영해 전처리 결과를 갱신
+
+    전체 재파싱/재분해 없이
+        - 평점이 바뀐 사용자 행만 고정된 아이템 인자 공간에 다시 투영 (새 사용자는 뒤에 추가)
+        - 카탈로그에 없던 영화 중 긍정 평점이 min_new_item_ratings 이상인 것은
+          사용자 인자 공간에 투영해 아이템으로 추가
+    하고, 다시 암호화해야 하는 사용자 행을 data/processed/changed_users.json에 기록한다.
+    delta 평점은 (사용자, 영화) 값을 덮어쓰므로 min_rating 미만으로 바뀐 평점은 제거된다.
+
+    Returns:
+        변경 기록 dict
+    """
+    import pandas as pd
+    from sklearn.preprocessing import normalize
+    from rotations import batch_layout
+    try:
+        config = config or load_config()
+        dataset_config = config['dataset']
+        min_rating = dataset_config.get('min_rating', 3.0)
+        min_item_ratings = config.get('incremental', {}).get('min_new_item_ratings', 5)
+        
+        logger.info(f"평점 변경분 반영 시작: {delta_path}")
+        start_time = time.time()
+        
+        state = load_embedding_state()
+        _, separator, header = ratings_format(dataset_config)
+        delta = parse_ratings(delta_path, separator, header)
+        positive = (delta['rating'] >= min_rating).to_numpy()
+        logger.info(f"변경 평점 {len(delta):,}개 (긍정 {positive.sum():,}개)")
+        
+        user_ids, item_ids = state['user_ids'], state['item_ids']
+        matrix = state['matrix']
+        num_old_users, num_old_items = matrix.shape
+        
+        # 새 사용자 (긍정 평점이 있는 경우만) / 새 아이템 (긍정 평점 수 기준)
+        delta_users = delta['userId'].to_numpy()
+        delta_items = delta['movieId'].to_numpy()
+        new_users = np.setdiff1d(delta_users[positive], user_ids)
+        new_item_candidates, new_item_counts = np.unique(
+            delta_items[positive & ~np.isin(delta_items, item_ids)], return_counts=True
+        )
+        new_items = new_item_candidates[new_item_counts >= min_item_ratings]
+        user_ids = np.concatenate([user_ids, new_users])
+        item_ids = np.concatenate([item_ids, new_items])
+        
+        rows = pd.Index(user_ids).get_indexer(delta_users)
+        cols = pd.Index(item_ids).get_indexer(delta_items)
+        mapped = (rows >= 0) & (cols >= 0)
+        ignored = int((~mapped & positive).sum())
+        if ignored:
+            logger.info(f"카탈로그 밖 영화 평점 {ignored}개 무시 (새 아이템 기준 {min_item_ratings}개 미만)")
+        rows, cols, values = rows[mapped], cols[mapped], positive[mapped].astype(np.float32)
+        
+        # delta 항목으로 기존 값 덮어쓰기 (같은 칸이 여러 번 나오면 마지막 값)
+        shape = (len(user_ids), len(item_ids))
+        old = matrix.tocoo()
+        old_keys = old.row.astype(np.int64) * shape[1] + old.col
+        delta_keys = rows.astype(np.int64) * shape[1] + cols
+        last = len(delta_keys) - 1 - np.unique(delta_keys[::-1], return_index=True)[1]
+        keep = ~np.isin(old_keys, delta_keys)
+        set_rows = np.concatenate([old.row[keep], rows[last]])
+        set_cols = np.concatenate([old.col[keep], cols[last]])
+        set_values = np.concatenate([old.data[keep], values[last]])
+        nonzero = set_values != 0
+        matrix = sparse.csr_matrix(
+            (set_values[nonzero], (set_rows[nonzero], set_cols[nonzero])), shape=shape
+        )
+        
+        # 새 아이템: 평가한 사용자의 인자(기존 아이템 기준)로 투영
+        item_factors = state['item_factors']
+        if len(new_items):
+            columns = matrix[:, num_old_items:]
+            raters = np.flatnonzero(columns.getnnz(axis=1))
+            user_factors = np.zeros((shape[0], item_factors.shape[1]))
+            user_factors[raters] = fold_in_users(matrix[raters, :num_old_items], item_factors, state)
+            item_factors = np.vstack([item_factors, fold_in_items(columns, user_factors, state)])
+            if state['mean'].any():
+                state['mean'] = np.concatenate([state['mean'], np.asarray(columns.mean(axis=0)).ravel()])
+            else:
+                state['mean'] = np.zeros(shape[1])
+            logger.info(f"새 아이템 {len(new_items)}개 추가: {new_items.tolist()}")
+        
+        # 평점이 바뀐 사용자만 다시 투영
+        changed_rows = np.unique(rows)
+        user_vectors = np.load('data/processed/user_vectors.npy')
+        item_vectors = np.load('data/processed/item_vectors.npy')
+        # 투영 결과(float64)는 기존 dtype으로 맞춤 (dtype이 바뀌면 카탈로그 세그먼트 해시와 평문 캐시 키가 모두 바뀜)
+        user_vectors = np.vstack([user_vectors, np.zeros((len(new_users), user_vectors.shape[1]), dtype=user_vectors.dtype)])
+        user_vectors[changed_rows] = normalize(fold_in_users(matrix[changed_rows], item_factors, state), axis=1)
+        if len(new_items):
+            new_item_vectors = normalize(item_factors[num_old_items:], axis=1).astype(item_vectors.dtype)
+            item_vectors = np.vstack([item_vectors, new_item_vectors])
+        
+        catalog = save_processed_data(user_vectors, item_vectors, item_ids.tolist(), config)
+        state.update({'item_factors': item_factors, 'matrix': matrix})
+        save_embedding_state(state, user_ids, item_ids, str(state['method']))
+        
+        # encrypt_user_batch와 같은 배치 행 수 (2의 거듭제곱으로 올림, 암호문 용량으로 제한)
+        batch_rows = batch_layout(user_vectors.shape[1], config['seal']['poly_modulus_degree'] // 2,
+                                  config['performance']['batch_size'])[0]
+        changes = {
+            'delta': str(delta_path),
+            'user_rows': changed_rows.tolist(),
+            'user_ids': user_ids[changed_rows].tolist(),
+            'new_user_rows': list(range(num_old_users, shape[0])),
+            'new_item_ids': new_items.tolist(),
+            'batches': sorted({int(row) // batch_rows for row in changed_rows}),
+            'catalog_version': catalog['version'],
+            'update_time_sec': time.time() - start_time
+        }
+        changes_path = Path('data/processed') / 'changed_users.json'
+        with open(changes_path, 'w') as f:
+            json.dump(changes, f, indent=2)
+        
+        logger.info(f"변경 사용자 {len(changed_rows)}명 (새 사용자 {len(new_users)}명), "
+                    f"새 아이템 {len(new_items)}개 ({changes['update_time_sec']:.3f}초)")
+        logger.info(f"재암호화 대상 기록: {changes_path}")
+        return changes
+        
+    except Exception as e:
+        log_exception(logger, e, "apply_ratings_delta")
+        raise
+
+def peak_memory_mb():
+    """프로세스 최대 RSS (MB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def save_processed_data(user_vectors, item_vectors, item_ids, config=None):
+    """전처리 데이터 저장 후 카탈로그 세그먼트 갱신 (src/utils/catalog.py) -> 카탈로그 매니페스트"""
     try:
         logger.info("전처리 데이터 저장 시작")
         
@@ -182,26 +565,150 @@ def save_processed_data(user_vectors, item_vectors, item_ids):
         
         logger.info("전처리 데이터 저장 완료")
         
+        # 아이템이 뒤에 추가되기만 했으면 기존 세그먼트는 그대로, 새 아이템만 새 세그먼트가 됨
+        catalog, updated = sync_catalog(np.asarray(item_vectors), config or load_config())
+        if updated:
+            logger.info(f"카탈로그 버전 {catalog['version']}: 세그먼트 {len(catalog['segments'])}개, "
+                        f"갱신 {describe_segments(updated)}")
+        return catalog
+    
     except Exception as e:
         log_exception(logger, e, "save_processed_data")
         raise
 
-if __name__ == '__main__':
+def preprocess(config=None):
+    """평점 로드 -> 사용자-아이템 행렬 -> 임베딩 -> data/processed 저장 with 결과 기록
+
+    Returns:
+        user_vectors, item_vectors, item_ids (파이프라인에서 다음 단계로 그대로 전달)
+    """
+    reporter = ExperimentReporter('data_preprocessing')
+    
     try:
         logger.info("=" * 60)
         logger.info("MovieLens 데이터 전처리 시작")
         logger.info("=" * 60)
         
-        ratings = load_movielens_1m()
-        user_item = create_user_item_matrix(ratings)
-        user_vectors, item_vectors, item_ids = vectorize_and_normalize(user_item)
-        save_processed_data(user_vectors, item_vectors, item_ids)
+        config = config or load_config()
+        dataset_config = config['dataset']
+        
+        start_time = time.time()
+        ratings = load_movielens(config)
+        load_time = time.time() - start_time
+        
+        start_time = time.time()
+        user_item, user_ids, movie_ids = create_user_item_matrix(ratings, dataset_config.get('min_rating', 3.0))
+        matrix_time = time.time() - start_time
+        
+        embedding_config = config.get('embedding', {})
+        num_items = dataset_config.get('num_items', 512)
+        start_time = time.time()
+        user_vectors, item_vectors, item_ids, state = vectorize_and_normalize(
+            user_item, movie_ids, num_items, dataset_config.get('vector_dim', 512), embedding_config
+        )
+        vectorize_time = time.time() - start_time
+        save_processed_data(user_vectors, item_vectors, item_ids, config)
+        save_embedding_state(state, user_ids, item_ids, embedding_config.get('method', 'randomized'))
+        
+        if embedding_config.get('recall_curve', False):
+            logger.info(f"임베딩 차원별 recall@{embedding_config.get('recall_k', 10)} 측정 "
+                        f"(holdout {embedding_config.get('holdout_ratio', 0.2) * 100:.0f}%)")
+            catalog = user_item[:, np.argsort(-np.asarray(user_item.sum(axis=0)).ravel(), kind='stable')[:num_items]]
+            curve_start = time.time()
+            curve, suggested_dim = embedding_recall_curve(catalog, embedding_config)
+            logger.info(f"추천 임베딩 차원: {suggested_dim} (최대 recall의 "
+                        f"{embedding_config.get('recall_tolerance', 0.95) * 100:.0f}% 이상인 최소 차원)")
+            reporter.add_stage(
+                'Embedding Recall Curve',
+                metrics={
+                    **{f"recall_at_{embedding_config.get('recall_k', 10)}_dim_{dim}": recall for dim, recall in curve.items()},
+                    'suggested_dim': suggested_dim,
+                    'curve_time_sec': time.time() - curve_start
+                },
+                parameters={
+                    'method': embedding_config.get('method', 'randomized'),
+                    'curve_dims': sorted(curve),
+                    'holdout_ratio': embedding_config.get('holdout_ratio', 0.2),
+                    'eval_users': embedding_config.get('eval_users', 1000),
+                    'num_items': catalog.shape[1]
+                }
+            )
+        
+        reporter.add_stage(
+            'Data Preprocessing',
+            metrics={
+                'ratings_load_time_sec': load_time,
+                'user_item_matrix_time_sec': matrix_time,
+                'vectorize_time_sec': vectorize_time,
+                'num_ratings': len(ratings),
+                'num_users': user_item.shape[0],
+                'num_movies': user_item.shape[1],
+                'nonzero_entries': int(user_item.nnz),
+                'density': user_item.nnz / (user_item.shape[0] * user_item.shape[1]),
+                'user_item_csr_mb': sparse_nbytes(user_item) / 1024 / 1024,
+                'user_item_dense_equivalent_mb': user_item.shape[0] * user_item.shape[1] * 8 / 1024 / 1024,
+                'ratings_memory_mb': ratings.memory_usage(index=False).sum() / 1024 / 1024,
+                'peak_rss_mb': peak_memory_mb()
+            },
+            parameters={
+                'dataset': dataset_config['name'],
+                'min_rating': dataset_config.get('min_rating', 3.0),
+                'vector_dim': user_vectors.shape[1],
+                'num_items': item_vectors.shape[0],
+                'embedding_method': embedding_config.get('method', 'randomized'),
+                'matrix_format': 'csr'
+            }
+        )
+        json_path = reporter.save_json()
+        reporter.generate_markdown_report()
+        logger.info(f"실험 결과 저장: {json_path}")
         
         logger.info("=" * 60)
         logger.info("전처리 완료!")
         logger.info("=" * 60)
         
+        return user_vectors, item_vectors, item_ids
+        
+    except Exception as e:
+        log_exception(logger, e, "preprocess")
+        raise
+
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='MovieLens 데이터 전처리')
+    parser.add_argument('--delta', default=None, help='새 평점 파일 (dataset 형식) - 변경된 사용자/아이템만 갱신')
+    args = parser.parse_args(argv)
+    
+    if args.delta is not None:
+        reporter = ExperimentReporter('data_preprocessing')
+        try:
+            changes = apply_ratings_delta(args.delta)
+            reporter.add_stage(
+                'Incremental Update',
+                metrics={
+                    'update_time_sec': changes['update_time_sec'],
+                    'changed_users': len(changes['user_rows']),
+                    'new_users': len(changes['new_user_rows']),
+                    'new_items': len(changes['new_item_ids']),
+                    'affected_batches': len(changes['batches']),
+                    'catalog_version': changes['catalog_version'],
+                    'peak_rss_mb': peak_memory_mb()
+                },
+                parameters={'delta': changes['delta']}
+            )
+            reporter.save_json()
+            reporter.generate_markdown_report()
+        except Exception as e:
+            logger.critical("증분 전처리 실패!")
+            sys.exit(1)
+        return
+    
+    try:
+        preprocess()
     except Exception as e:
         logger.critical("전처리 실패!")
-        log_exception(logger, e, "main")
         sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+import bisect
+import time
+from pathlib import Path
+
+# 구간(span) 계측: encode / encrypt / multiply / rotate / serialize / deserialize / decrypt 등
+#
+#   with span('encrypt'):
+#       encrypted = ts.ckks_vector(context, values)
+#
+# 단조 시계(perf_counter)로 잰 구간 시간을 고정 버킷 히스토그램에 누적하므로
+# 측정 횟수와 무관하게 span마다 메모리가 일정하고, 워커 프로세스의 히스토그램을
+# 버킷별 합으로 그대로 병합할 수 있다. 백분위는 버킷 안 선형 보간으로 추정한다.
+#
+# instrumentation.enabled가 false이면 span()은 미리 만든 빈 컨텍스트 매니저를 돌려주므로
+# 핫 루프에서도 함수 호출 1회 비용만 남는다.
+
+# 1us ~ 1000s, 10년(decade)당 10개 로그 간격 경계 (상대 폭 약 26%)
+BUCKET_BOUNDS = tuple(10 ** (exponent / 10) for exponent in range(-60, 31))
+QUANTILES = (50, 95, 99)
+
+class Histogram:
+    """고정 버킷 지연시간 히스토그램 (초 단위)"""
+    
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+    
+    def __init__(self):
+        # 마지막 버킷은 최대 경계 초과 (+Inf)
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+    
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+    
+    def merge(self, state):
+        """다른 프로세스의 히스토그램 상태(to_state) 합치기"""
+        for idx, value in enumerate(state['counts']):
+            self.counts[idx] += value
+        self.count += state['count']
+        self.total += state['total']
+        self.min = min(self.min, state['min'])
+        self.max = max(self.max, state['max'])
+    
+    def to_state(self):
+        return {'counts': list(self.counts), 'count': self.count, 'total': self.total,
+                'min': self.min, 'max': self.max}
+    
+    def percentile(self, q):
+        """버킷 누적 개수로 q 백분위 추정 (버킷 안 선형 보간, 관측 최소/최대로 제한)"""
+        if self.count == 0:
+            return 0.0
+        rank = q / 100 * self.count
+        cumulative = 0
+        for idx, value in enumerate(self.counts):
+            if value and cumulative + value >= rank:
+                lower = BUCKET_BOUNDS[idx - 1] if idx > 0 else 0.0
+                upper = BUCKET_BOUNDS[idx] if idx < len(BUCKET_BOUNDS) else self.max
+                estimate = lower + (upper - lower) * (rank - cumulative) / value
+                return min(max(estimate, self.min), self.max)
+            cumulative += value
+        return self.max
+    
+    def summary(self):
+        summary = {
+            'count': self.count,
+            'total_sec': self.total,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'min_ms': self.min * 1000 if self.count else 0.0,
+            'max_ms': self.max * 1000
+        }
+        summary.update({f'p{q}_ms': self.percentile(q) * 1000 for q in QUANTILES})
+        return summary
+
+class _Span:
+    __slots__ = ('histogram', 'start')
+    
+    def __init__(self, histogram):
+        self.histogram = histogram
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+class _NullSpan:
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+# 프로세스 단위 상태 (enabled는 첫 span 호출 때 설정에서 읽음, configure로 덮어쓰기)
+_histograms = {}
+_state = {'enabled': None}
+
+def configure(enabled):
+    _state['enabled'] = bool(enabled)
+
+def is_enabled():
+    if _state['enabled'] is None:
+        from context_registry import load_config
+        _state['enabled'] = bool(load_config().get('instrumentation', {}).get('enabled', False))
+    return _state['enabled']
+
+def histogram(name):
+    if name not in _histograms:
+        _histograms[name] = Histogram()
+    return _histograms[name]
+
+def span(name):
+    """구간 계측 컨텍스트 매니저 (비활성화 시 아무것도 기록하지 않음)"""
+    if not (_state['enabled'] or (_state['enabled'] is None and is_enabled())):
+        return _NULL_SPAN
+    return _Span(histogram(name))
+
+def observe(name, seconds):
+    """이미 측정한 구간 시간 기록"""
+    if is_enabled():
+        histogram(name).observe(seconds)
+
+def export_state():
+    """워커 프로세스에서 부모로 넘길 히스토그램 상태"""
+    return {name: hist.to_state() for name, hist in _histograms.items() if hist.count}
+
+def merge_state(states):
+    for name, state in (states or {}).items():
+        histogram(name).merge(state)
+
+def reset():
+    _histograms.clear()
+
+def snapshot():
+    """span별 요약 (count, 합계, 평균/최소/최대, p50/p95/p99)"""
+    return {name: hist.summary() for name, hist in sorted(_histograms.items()) if hist.count}
+
+def _format_bound(bound):
+    return f'{bound:.6g}'
+
+def write_metrics_text(path):
+    """Prometheus 텍스트 형식으로 히스토그램과 백분위 추정값 저장"""
+    lines = [
+        '# HELP fhe_span_seconds Span duration measured with a monotonic clock',
+        '# TYPE fhe_span_seconds histogram'
+    ]
+    for name, hist in sorted(_histograms.items()):
+        if not hist.count:
+            continue
+        cumulative = 0
+        for bound, value in zip(BUCKET_BOUNDS, hist.counts):
+            cumulative += value
+            lines.append(f'fhe_span_seconds_bucket{{span="{name}",le="{_format_bound(bound)}"}} {cumulative}')
+        lines.append(f'fhe_span_seconds_bucket{{span="{name}",le="+Inf"}} {hist.count}')
+        lines.append(f'fhe_span_seconds_sum{{span="{name}"}} {hist.total:.9g}')
+        lines.append(f'fhe_span_seconds_count{{span="{name}"}} {hist.count}')
+    
+    lines.append('# HELP fhe_span_quantile_seconds Span duration quantiles estimated from histogram buckets')
+    lines.append('# TYPE fhe_span_quantile_seconds gauge')
+    for name, hist in sorted(_histograms.items()):
+        if not hist.count:
+            continue
+        for q in QUANTILES:
+            lines.append(f'fhe_span_quantile_seconds{{span="{name}",quantile="{q / 100}"}} '
+                         f'{hist.percentile(q):.9g}')
+    
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return path
@@ -0,0 +1,181 @@
+import sys
+import time
+import numpy as np
+import tenseal as ts
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent.parent / 'server'))
+sys.path.append(str(Path(__file__).parent.parent / 'client'))
+from logger import setup_logger, log_exception
+from report_generator import ExperimentReporter
+from user_shards import read_user_ciphertext
+from scoring import drop_to_last_level, serialize_ciphertexts
+from ivf import get_ivf_index, score_centroids, score_clusters
+from context_registry import load_public_context, load_secret_context, load_config, report_context_registry
+from evaluator import compute_encrypted_recommendations
+from decrypt import decrypt_scores, decrypt_layout_scores, select_clusters
+
+logger = setup_logger('ivf_benchmark')
+
+# IVF 2단계 검색과 전수 평가(compute_encrypted_recommendations) 비교
+#
+# 사용자마다 전수 평가 점수의 Top-K를 기준으로 nprobe별 recall@k와
+# 종단 지연시간(서버 연산 + 직렬화 + 클라이언트 복호화, 두 단계 합)을 측정한다.
+# 네트워크 전송은 포함하지 않는다 (서비스 경로: service_client.py --ivf).
+
+def top_k_indices(scores, top_k):
+    return np.argsort(-scores, kind='stable')[:top_k]
+
+def run_exhaustive(user_id, mode, secret_context, seal_config):
+    """전수 평가 후 전체 점수 복호화 -> (점수, 지연시간)"""
+    # 지연시간 비교용이므로 이전 점수 세그먼트를 재사용하지 않고 카탈로그 전체를 계산
+    result = compute_encrypted_recommendations(user_id=user_id, mode=mode, incremental=False)
+    start_time = time.time()
+    scores, _ = decrypt_scores(secret_context, result['output_path'], seal_config)
+    decrypt_time = time.time() - start_time
+    return scores[:, 0], result['total_computation_time_sec'] + decrypt_time
+
+def run_ivf(encrypted_user, item_vectors, index, nprobe, mode, slot_count, secret_context, level_drop):
+    """IVF 2단계 검색 -> (후보 아이템, 후보 점수, 단계별 시간)"""
+    def serialize(scores):
+        if level_drop:
+            drop_to_last_level(scores)
+        return serialize_ciphertexts(scores)
+    
+    start_time = time.time()
+    scores, layout = score_centroids(encrypted_user, index, mode, slot_count)
+    centroid_scores = decrypt_layout_scores(secret_context, serialize(scores), layout)
+    clusters = select_clusters(centroid_scores, nprobe)
+    stage1_time = time.time() - start_time
+    
+    start_time = time.time()
+    scores, layout, item_ids = score_clusters(encrypted_user, item_vectors, index, clusters, mode, slot_count)
+    candidate_scores = decrypt_layout_scores(secret_context, serialize(scores), layout)
+    stage2_time = time.time() - start_time
+    return item_ids, candidate_scores, stage1_time, stage2_time
+
+def benchmark_ivf(user_ids=None, nprobe_values=None, mode=None):
+    """nprobe별 IVF recall@k와 지연시간을 전수 평가와 비교 with 결과 기록"""
+    reporter = ExperimentReporter('ivf_retrieval')
+    
+    try:
+        config = load_config()
+        ivf_config = config['ivf']
+        user_ids = user_ids or ivf_config['eval_users']
+        nprobe_values = nprobe_values or ivf_config['nprobe_values']
+        mode = mode or config['evaluation']['mode']
+        level_drop = config['evaluation'].get('level_drop', False)
+        slot_count = config['seal']['poly_modulus_degree'] // 2
+        top_k = config['recommendation']['top_k']
+        
+        item_vectors = np.load('data/processed/item_vectors.npy')
+        index = get_ivf_index(ivf_config)
+        nlist = len(index['centroids'])
+        list_sizes = np.diff(index['list_offsets'])
+        
+        logger.info("=" * 60)
+        logger.info(f"IVF 검색 비교: 사용자 {len(user_ids)}명, 아이템 {len(item_vectors)}개, "
+                    f"클러스터 {nlist}개, nprobe {nprobe_values}, 평가 모드 {mode}")
+        logger.info("=" * 60)
+        
+        reporter.add_stage(
+            'IVF Index',
+            metrics={
+                'num_items': len(item_vectors),
+                'nlist': nlist,
+                'build_time_sec': index['build_time_sec'],
+                'min_list_size': int(list_sizes.min()),
+                'max_list_size': int(list_sizes.max()),
+                'mean_list_size': float(list_sizes.mean())
+            },
+            parameters={key: ivf_config.get(key) for key in ('nlist', 'max_iter', 'seed', 'index_dir')}
+        )
+        
+        secret_context = load_secret_context()
+        public_context = load_public_context(n_threads=config['performance'].get('num_threads', 1))
+        
+        exhaustive = {}
+        results = {nprobe: [] for nprobe in nprobe_values}
+        for user_id in user_ids:
+            scores, latency = run_exhaustive(user_id, mode, secret_context, config['seal'])
+            exhaustive[user_id] = latency
+            reference = set(top_k_indices(scores, top_k).tolist())
+            
+            encrypted_user = ts.ckks_vector_from(public_context, read_user_ciphertext(user_id))
+            for nprobe in nprobe_values:
+                item_ids, candidate_scores, stage1_time, stage2_time = run_ivf(
+                    encrypted_user, item_vectors, index, min(nprobe, nlist), mode, slot_count,
+                    secret_context, level_drop
+                )
+                found = set(item_ids[top_k_indices(candidate_scores, top_k)].tolist())
+                results[nprobe].append({
+                    'recall': len(found & reference) / len(reference),
+                    'latency': stage1_time + stage2_time,
+                    'stage1': stage1_time,
+                    'stage2': stage2_time,
+                    'candidates': len(item_ids)
+                })
+                logger.info(f"사용자 {user_id} nprobe={nprobe}: recall@{top_k} "
+                            f"{results[nprobe][-1]['recall']:.2f}, 후보 {len(item_ids)}개, "
+                            f"{(stage1_time + stage2_time) * 1000:.1f}ms (전수 {latency * 1000:.1f}ms)")
+        
+        exhaustive_latency = float(np.mean(list(exhaustive.values())))
+        for nprobe, runs in results.items():
+            latencies = np.array([run['latency'] for run in runs])
+            recall = float(np.mean([run['recall'] for run in runs]))
+            logger.info(f"nprobe={nprobe}: 평균 recall@{top_k} {recall:.3f}, "
+                        f"지연시간 {latencies.mean() * 1000:.1f}ms (전수 대비 {exhaustive_latency / latencies.mean():.2f}x)")
+            reporter.add_stage(
+                f'IVF Retrieval (nprobe={nprobe})',
+                metrics={
+                    f'recall_at_{top_k}': recall,
+                    f'min_recall_at_{top_k}': float(min(run['recall'] for run in runs)),
+                    'latency_mean_sec': float(latencies.mean()),
+                    'latency_p50_sec': float(np.percentile(latencies, 50)),
+                    'latency_p95_sec': float(np.percentile(latencies, 95)),
+                    'stage1_time_mean_sec': float(np.mean([run['stage1'] for run in runs])),
+                    'stage2_time_mean_sec': float(np.mean([run['stage2'] for run in runs])),
+                    'exhaustive_latency_mean_sec': exhaustive_latency,
+                    'speedup_vs_exhaustive': exhaustive_latency / float(latencies.mean()),
+                    'candidate_fraction': float(np.mean([run['candidates'] for run in runs])) / len(item_vectors)
+                },
+                parameters={
+                    'nprobe': nprobe,
+                    'nlist': nlist,
+                    'evaluation_mode': mode,
+                    'level_drop': level_drop,
+                    'num_users': len(user_ids),
+                    'top_k': top_k
+                }
+            )
+        
+        report_context_registry(reporter)
+        json_path = reporter.save_json()
+        md_path = reporter.generate_markdown_report()
+        logger.info(f"실험 결과 저장: {json_path}")
+        logger.info(f"마크다운 리포트: {md_path}")
+        
+        return results
+    
+    except Exception as e:
+        log_exception(logger, e, "benchmark_ivf")
+        raise
+
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='IVF 2단계 검색 vs 전수 평가 비교')
+    parser.add_argument('--user-id', type=int, nargs='+', default=None, help='비교 사용자 (기본값: ivf.eval_users)')
+    parser.add_argument('--nprobe', type=int, nargs='+', default=None, help='기본값: ivf.nprobe_values')
+    parser.add_argument('--mode', choices=['packed', 'per_item'], default=None)
+    args = parser.parse_args(argv)
+    
+    try:
+        benchmark_ivf(user_ids=args.user_id, nprobe_values=args.nprobe, mode=args.mode)
+    except Exception as e:
+        logger.critical("IVF 비교 실패!")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,31 +1,29 @@
 import sys
+import json
 import time
 import tenseal as ts
-import yaml
 from pathlib import Path
 
 from logger import setup_logger, log_exception
 from report_generator import ExperimentReporter
+from rotations import required_rotation_steps, create_galois_keys, attach_galois_keys
+from context_registry import load_config
 
 logger = setup_logger('keygen')
 
-def load_config():
-    try:
-        logger.info("설정 파일 로드 중...")
-        with open('config/params.yaml', 'r') as f:
-            config = yaml.safe_load(f)
-        logger.debug(f"SEAL 파라미터: {config['seal']}")
-        return config
-    except Exception as e:
-        log_exception(logger, e, "load_config")
-        raise
+def generate_keys(compare_full=False):
+    """CKKS 키 생성 with 결과 기록
 
-def generate_keys():
-    """CKKS 키 생성 with 결과 기록"""
+    compare_full이면 minimal 모드에서 전체 Galois 키 컨텍스트를 한 번 더 만들어
+    공개키 크기와 로드 시간을 비교해 기록한다 (측정용, 키 생성 시간이 늘어남).
+    """
     reporter = ExperimentReporter('key_generation')
     
     try:
-        config = load_config()['seal']
+        full_config = load_config()
+        config = full_config['seal']
+        logger.debug(f"SEAL 파라미터: {config}")
+        galois_mode = config.get('galois_keys', 'full')
         
         logger.info("=" * 60)
         logger.info("CKKS 컨텍스트 생성 시작")
@@ -51,9 +49,19 @@ def generate_keys():
         logger.info(f"Global scale 설정: {context.global_scale}")
         
         # Galois keys
+        # minimal: 서버 연산에 필요한 회전 스텝만 생성해 공개키 컨텍스트에 넣는다.
+        # 클라이언트(암호화/복호화)는 회전을 쓰지 않으므로 비밀키 컨텍스트에는 넣지 않는다.
         galois_start = time.time()
-        logger.info("Galois keys 생성 중...")
-        context.generate_galois_keys()
+        galois_keys = None
+        rotation_steps, steps_per_mode = [], {}
+        if galois_mode == 'minimal':
+            rotation_steps, steps_per_mode = required_rotation_steps(full_config)
+            logger.info(f"필요 회전 스텝 ({', '.join(f'{m}: {n}' for m, n in steps_per_mode.items())}): {rotation_steps}")
+            logger.info(f"Galois keys 생성 중... ({len(rotation_steps)}개)")
+            galois_keys = create_galois_keys(context, config, rotation_steps)
+        else:
+            logger.info("Galois keys 생성 중... (전체)")
+            context.generate_galois_keys()
         galois_time = time.time() - galois_start
         logger.info(f"Galois keys 생성 완료 ({galois_time:.3f}초)")
         
@@ -76,17 +84,71 @@ def generate_keys():
         secret_size = secret_path.stat().st_size
         logger.info(f"비밀키 저장 완료 ({secret_size / 1024:.1f} KB)")
         
+        # 전체 키 기준 비교용 컨텍스트 (--compare-full, minimal 모드에서 크기/로드 시간 비교)
+        full_public = None
+        if galois_keys is not None and compare_full:
+            full_context = context.copy()
+            full_start = time.time()
+            full_context.generate_galois_keys()
+            full_galois_time = time.time() - full_start
+            full_context.make_context_public()
+            full_public = full_context.serialize()
+        
         # 공개키 저장
         context.make_context_public()
         public_path = key_dir / 'public_context.bin'
         logger.info(f"공개키 저장 중: {public_path}")
+        public_bytes = context.serialize()
+        if galois_keys is not None:
+            public_bytes = attach_galois_keys(public_bytes, galois_keys)
         with open(public_path, 'wb') as f:
-            f.write(context.serialize())
+            f.write(public_bytes)
         public_size = public_path.stat().st_size
         logger.info(f"공개키 저장 완료 ({public_size / 1024:.1f} KB)")
         
+        # 서버가 평가 모드별 회전 키 보유 여부를 확인할 수 있도록 기록
+        with open(key_dir / 'galois_keys.json', 'w') as f:
+            json.dump({
+                'galois_keys': galois_mode,
+                'modes': list(steps_per_mode),
+                'steps': rotation_steps
+            }, f, indent=2)
+        
         total_time = time.time() - start_time
         
+        # 서버 측 공개키 컨텍스트 로드 시간
+        load_start = time.time()
+        ts.context_from(public_bytes)
+        public_load_time = time.time() - load_start
+        
+        # 클라이언트 측 비밀키 컨텍스트 로드 시간 (Galois 키 생성 플래그가 켜져 있으면 로드마다 전체 키 재생성)
+        load_start = time.time()
+        with open(secret_path, 'rb') as f:
+            ts.context_from(f.read())
+        secret_load_time = time.time() - load_start
+        
+        galois_metrics = {
+            'public_context_load_time_sec': public_load_time,
+            'secret_context_load_time_sec': secret_load_time
+        }
+        if galois_keys is not None:
+            galois_metrics['galois_key_count'] = len(rotation_steps)
+        if full_public is not None:
+            load_start = time.time()
+            ts.context_from(full_public)
+            full_load_time = time.time() - load_start
+            
+            logger.info(f"전체 Galois 키 대비 공개키 크기: {len(full_public) / 1024:.1f} KB -> "
+                        f"{public_size / 1024:.1f} KB ({(1 - public_size / len(full_public)) * 100:.1f}% 감소)")
+            logger.info(f"공개키 로드 시간: {full_load_time:.3f}초 -> {public_load_time:.3f}초")
+            galois_metrics.update({
+                'full_galois_keys_generation_time_sec': full_galois_time,
+                'full_public_key_size_kb': len(full_public) / 1024,
+                'full_public_context_load_time_sec': full_load_time,
+                'public_key_size_reduction': 1 - public_size / len(full_public),
+                'public_context_load_speedup': full_load_time / public_load_time
+            })
+        
         # 결과 기록
         reporter.add_stage(
             'CKKS Key Generation',
@@ -97,14 +159,18 @@ def generate_keys():
                 'total_time_sec': total_time,
                 'secret_key_size_kb': secret_size / 1024,
                 'public_key_size_kb': public_size / 1024,
-                'total_key_size_kb': (secret_size + public_size) / 1024
+                'total_key_size_kb': (secret_size + public_size) / 1024,
+                **galois_metrics
             },
             parameters={
                 'poly_modulus_degree': config['poly_modulus_degree'],
                 'coeff_mod_bit_sizes': config['coeff_mod_bit_sizes'],
                 'scale_bits': config['scale_bits'],
                 'number_of_levels': len(config['coeff_mod_bit_sizes']) - 2,
-                'max_slot_count': config['poly_modulus_degree'] // 2
+                'max_slot_count': config['poly_modulus_degree'] // 2,
+                'galois_keys': galois_mode,
+                'galois_modes': list(steps_per_mode),
+                'galois_rotation_steps': rotation_steps
             }
         )
         
@@ -130,11 +196,19 @@ def generate_keys():
         log_exception(logger, e, "generate_keys")
         raise
 
-if __name__ == '__main__':
-    import logging
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='CKKS 키 생성 (keys/secret_context.bin, keys/public_context.bin)')
+    parser.add_argument('--compare-full', action='store_true',
+                        help='minimal 모드에서 전체 Galois 키 대비 공개키 크기/로드 시간 비교 (전체 키를 추가로 생성)')
+    args = parser.parse_args(argv)
     
     try:
-        generate_keys()
+        generate_keys(compare_full=args.compare_full)
     except Exception as e:
         logger.critical("키 생성 실패!")
         sys.exit(1)
+
+if __name__ == '__main__':
+    main()
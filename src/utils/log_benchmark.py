@@ -0,0 +1,148 @@
+import sys
+import time
+import logging
+import tempfile
+import numpy as np
+import tenseal as ts
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent.parent / 'server'))
+from logger import setup_logger, log_exception, flush_logs, logging_stats, set_debug_sampling, debug_sampled
+from report_generator import ExperimentReporter
+from context_registry import load_public_context, load_config
+from user_shards import read_user_ciphertext
+from scoring import score_items_per_item
+
+logger = setup_logger('log_benchmark')
+
+# 아이템 루프 안 로깅 비용 측정
+#
+#   호출 측: 아이템 루프와 같은 형태의 debug 호출을 반복해 호출 스레드가 쓰는 시간 (레코드당 ns)
+#            CPU가 하나뿐이면 리스너 스레드가 같은 코어에서 돌아 호출 구간 벽시계 시간에 섞이므로
+#            호출 스레드 CPU 시간(thread_time)을 따로 기록한다
+#            - disabled: 로거 레벨 INFO (debug는 isEnabledFor에서 바로 버려짐)
+#            - sync / queue: 모든 레코드 기록, sampled: stage별 100개 중 1개만 기록
+#   아이템 루프: 실제 score_items_per_item을 evaluator 로거 레벨 INFO vs DEBUG(백엔드별)로 실행
+#
+# 로그는 임시 디렉토리에 기록하고 측정이 끝나면 삭제한다.
+
+VARIANTS = [
+    # (이름, 레벨, 백엔드, 샘플 간격)
+    ('disabled', logging.INFO, 'queue', 1),
+    ('sync', logging.DEBUG, 'sync', 1),
+    ('sync_sampled', logging.DEBUG, 'sync', 100),
+    ('queue', logging.DEBUG, 'queue', 1),
+    ('queue_sampled', logging.DEBUG, 'queue', 100)
+]
+
+def configure_target(name, log_dir, level, backend, sample_every):
+    target = setup_logger(name, log_file=Path(log_dir) / f'{name}.log', level=level, backend=backend)
+    set_debug_sampling(name, {'default': sample_every})
+    return target
+
+def measure_caller(log_dir, num_records):
+    """변형별 debug 호출 비용 (호출 스레드 기준) 및 큐 백엔드 기록 완료까지의 시간"""
+    results = {}
+    for variant, level, backend, sample_every in VARIANTS:
+        target = configure_target('log_benchmark_target', log_dir, level, backend, sample_every)
+        dropped_before = logging_stats()['dropped']
+        
+        start_time = time.perf_counter()
+        start_cpu = time.thread_time()
+        for idx in range(num_records):
+            debug_sampled(target, 'dot', "아이템 %d 내적 %.2fms", idx, 25.0)
+        caller_cpu = time.thread_time() - start_cpu
+        caller_time = time.perf_counter() - start_time
+        flush_logs()
+        total_time = time.perf_counter() - start_time
+        
+        results[variant] = {
+            'caller_cpu_ns_per_record': caller_cpu / num_records * 1e9,
+            'caller_ns_per_record': caller_time / num_records * 1e9,
+            'drained_ns_per_record': total_time / num_records * 1e9,
+            'dropped': logging_stats()['dropped'] - dropped_before
+        }
+        logger.info(f"{variant:<14} 호출 스레드 CPU {results[variant]['caller_cpu_ns_per_record']:8.0f}ns/레코드, "
+                    f"호출 {results[variant]['caller_ns_per_record']:8.0f}ns/레코드, "
+                    f"기록 완료까지 {results[variant]['drained_ns_per_record']:8.0f}ns/레코드")
+    return results
+
+def measure_item_loop(log_dir, num_items):
+    """실제 아이템별 내적 루프의 아이템당 시간 (evaluator 로거 레벨/백엔드별)"""
+    config = load_config()
+    context = load_public_context(n_threads=config['performance'].get('num_threads', 1))
+    encrypted_user = ts.ckks_vector_from(context, read_user_ciphertext(0))
+    item_vectors = np.load('data/processed/item_vectors.npy')[:num_items]
+    
+    results = {}
+    for variant, level, backend, sample_every in VARIANTS:
+        configure_target('evaluator', log_dir, level, backend, sample_every)
+        _, times = score_items_per_item(encrypted_user, item_vectors, replicated=True, progress=False)
+        flush_logs()
+        results[variant] = {'item_ms': float(np.mean(times)) * 1000, 'item_p50_ms': float(np.median(times)) * 1000}
+        logger.info(f"{variant:<14} 아이템당 {results[variant]['item_ms']:.2f}ms")
+    setup_logger('evaluator')
+    return results
+
+def benchmark_logging(num_records=5000, num_items=64):
+    """로깅 백엔드별 호출 비용과 아이템 루프 오버헤드 측정 with 결과 기록"""
+    reporter = ExperimentReporter('logging_overhead')
+    
+    try:
+        logger.info("=" * 60)
+        logger.info(f"로깅 오버헤드 측정: debug 레코드 {num_records}개, 아이템 {num_items}개")
+        logger.info("=" * 60)
+        
+        with tempfile.TemporaryDirectory() as log_dir:
+            caller = measure_caller(log_dir, num_records)
+            items = measure_item_loop(log_dir, num_items) if num_items else {}
+        
+        reporter.add_stage(
+            'Logging Caller Cost',
+            metrics={f'{variant}_{key}': value for variant, result in caller.items() for key, value in result.items()},
+            parameters={'num_records': num_records, 'variants': [variant[0] for variant in VARIANTS]}
+        )
+        
+        if items:
+            baseline = items['disabled']['item_ms']
+            reporter.add_stage(
+                'Logging Item Loop Overhead',
+                metrics={
+                    **{f'{variant}_item_ms': result['item_ms'] for variant, result in items.items()},
+                    **{f'{variant}_overhead_pct': (result['item_ms'] - baseline) / baseline * 100
+                       for variant, result in items.items() if variant != 'disabled'},
+                    # 루프 시간의 변동이 로깅 비용보다 크므로 호출 측 측정값으로 본 아이템당 비율을 함께 기록
+                    **{f'{variant}_caller_share_pct': caller[variant]['caller_cpu_ns_per_record'] / 1e6 / baseline * 100
+                       for variant in caller}
+                },
+                parameters={'num_items': num_items, 'operation': 'enc_matmul_plain', 'user_id': 0}
+            )
+        
+        json_path = reporter.save_json()
+        md_path = reporter.generate_markdown_report()
+        logger.info(f"실험 결과 저장: {json_path}")
+        logger.info(f"마크다운 리포트: {md_path}")
+        
+        return caller, items
+    
+    except Exception as e:
+        log_exception(logger, e, "benchmark_logging")
+        raise
+
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='로깅 백엔드별 오버헤드 측정')
+    parser.add_argument('--records', type=int, default=5000, help='호출 측 측정 debug 레코드 수 (logging.queue_size 이하)')
+    parser.add_argument('--items', type=int, default=64, help='아이템 루프 측정 아이템 수 (0: 생략)')
+    args = parser.parse_args(argv)
+    
+    try:
+        benchmark_logging(num_records=args.records, num_items=args.items)
+    except Exception as e:
+        logger.critical("로깅 오버헤드 측정 실패!")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
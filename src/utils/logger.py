@@ -1,24 +1,238 @@
-import logging
+import os
 import sys
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
 from pathlib import Path
-from datetime import datetime
 
-def setup_logger(name, log_file=None, level=logging.INFO):
+# 로깅 백엔드 (config logging 섹션)
+#
+#   queue: 로거에는 QueueHandler 하나만 붙이고, 포맷팅과 콘솔/파일 기록은
+#          QueueListener 백그라운드 스레드가 처리 (호출 스레드는 큐에 넣기만 함)
+#   sync:  기존처럼 호출 스레드에서 핸들러를 바로 실행
+#
+# 파일은 logs/{이름}.log 하나를 크기 기준으로 회전하고 (실행마다 새 파일을 만들지 않음),
+# 아이템 루프처럼 빈도가 높은 debug 레코드는 debug_sampled로 stage별 N개 중 1개만 남긴다.
+#
+# fork된 워커 프로세스는 부모와 같은 파일을 회전시키면 안 되므로, forward_worker_logs()를 호출한 뒤
+# 만든 프로세스 풀의 레코드는 파이프로 부모에 보내 부모가 기록하고, 그 밖의 워커는
+# logs/{이름}.{pid}.log 처럼 프로세스별 파일에 기록한다.
+
+CONFIG_PATH = 'config/params.yaml'
+DEFAULT_LOGGING_CONFIG = {
+    'backend': 'queue',
+    'level': None,
+    'max_bytes': 10 * 1024 * 1024,
+    'backup_count': 5,
+    'queue_size': 10000,
+    'debug_sample_every': {'default': 1}
+}
+
+# 프로세스 단위 상태 (리스너는 첫 setup_logger 호출 때 시작, 종료 시 큐를 비우고 정지)
+_state = {'config': None, 'queue': None, 'listener': None, 'pid': None, 'console': None,
+          'worker_queue': None, 'worker_thread': None}
+_routes = {}
+_counters = {'enqueued': 0, 'processed': 0, 'dropped': 0, 'sampled_out': 0}
+_samplers = {}
+
+def logging_config():
+    """config logging 섹션 (처음 한 번만 읽음, 설정 파일이 없으면 기본값)"""
+    if _state['config'] is None:
+        config = dict(DEFAULT_LOGGING_CONFIG)
+        try:
+            import yaml
+            with open(CONFIG_PATH, 'r') as f:
+                config.update((yaml.safe_load(f) or {}).get('logging') or {})
+        except FileNotFoundError:
+            pass
+        _state['config'] = config
+    return _state['config']
+
+class DeferredFileHandler(logging.handlers.RotatingFileHandler):
+    """첫 레코드를 기록할 때 디렉토리와 파일을 만들고, max_bytes를 넘으면 회전하는 파일 핸들러
+
+    모듈 import 시점에 setup_logger가 호출되므로, 아무것도 기록하지 않는
+    실행(--help, 다른 서브커맨드)은 logs/에 빈 파일을 남기지 않는다.
+    """
+    
+    def __init__(self, filename, max_bytes=0, backup_count=0, encoding='utf-8'):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding, delay=True)
+        self.owner_pid = os.getpid()
+    
+    def emit(self, record):
+        # fork된 프로세스에서는 부모가 연 파일 대신 프로세스별 파일에 기록
+        if os.getpid() != self.owner_pid:
+            self.owner_pid = os.getpid()
+            self.stream = None
+            path = Path(self.baseFilename)
+            self.baseFilename = str(path.with_name(f'{path.stem}.{self.owner_pid}{path.suffix}'))
+        super().emit(record)
+    
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
+class StageSampler:
+    """stage별 debug 레코드를 debug_sample_every[stage]개 중 1개만 통과"""
+    
+    def __init__(self, sample_every):
+        self.sample_every = sample_every
+        self.counts = {}
+    
+    def keep(self, stage):
+        every = self.sample_every.get(stage, self.sample_every.get('default', 1))
+        count = self.counts.get(stage, 0)
+        self.counts[stage] = count + 1
+        if count % every == 0:
+            return True
+        _counters['sampled_out'] += 1
+        return False
+
+class _Router(logging.Handler):
+    """리스너 스레드에서 레코드를 로거 이름별 핸들러로 전달"""
+    
+    def handle(self, record):
+        _counters['processed'] += 1
+        for handler in _routes.get(record.name, ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+_router = _Router()
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """레코드를 포맷하지 않고 큐에 넣는 핸들러
+
+    같은 프로세스 안의 스레드로만 전달하므로 메시지 합치기(msg % args)와 예외 포맷을
+    리스너 스레드로 미룬다 (args로 넘긴 가변 객체는 기록 전에 바뀌면 안 됨).
+    큐(SimpleQueue, 잠금 없는 C 구현)가 queue_size를 넘으면 WARNING 미만 레코드는 기다리지 않고
+    버린 개수만 세고, WARNING 이상은 크기와 관계없이 큐에 넣는다.
+    """
+    
+    def __init__(self, queue, max_size):
+        super().__init__(queue)
+        self.max_size = max_size
+    
+    def prepare(self, record):
+        return record
+    
+    def enqueue(self, record):
+        if record.levelno < logging.WARNING and self.queue.qsize() >= self.max_size:
+            _counters['dropped'] += 1
+            return
+        _counters['enqueued'] += 1
+        self.queue.put(record)
+    
+    def emit(self, record):
+        if _state['listener'] is not None and os.getpid() != _state['pid']:
+            # fork된 워커 프로세스: 부모로 보낼 수 있으면 포맷한 레코드를 보내고, 아니면 직접 기록
+            if _state['worker_queue'] is not None:
+                try:
+                    _state['worker_queue'].put(logging.handlers.QueueHandler.prepare(self, record))
+                except Exception:
+                    self.handleError(record)
+                return
+            _router.handle(record)
+            return
+        if _state['listener'] is None:
+            _router.handle(record)
+            return
+        super().emit(record)
+
+def _start_listener():
+    _state['queue'] = queue.SimpleQueue()
+    _state['listener'] = logging.handlers.QueueListener(_state['queue'], _router)
+    _state['pid'] = os.getpid()
+    _state['listener'].start()
+    atexit.register(stop_logging)
+
+def _drain_worker_logs(worker_queue):
+    # 워커 레코드를 부모 로거로 다시 보냄 (레벨 확인은 워커에서 끝났음)
+    while True:
+        record = worker_queue.get()
+        if record is None:
+            return
+        logging.getLogger(record.name).handle(record)
+
+def forward_worker_logs():
+    """이후 fork되는 워커 프로세스의 로그를 부모 프로세스로 보내 기록하도록 설정
+
+    ProcessPoolExecutor를 만들기 전에 호출한다. 큐 백엔드에서만 동작하며, 워커는 레코드를
+    포맷해 파이프로 보내고 부모의 수신 스레드가 같은 이름의 로거로 다시 기록한다.
+    """
+    if _state['listener'] is None or os.getpid() != _state['pid'] or _state['worker_queue'] is not None:
+        return
+    import threading
+    import multiprocessing
+    _state['worker_queue'] = multiprocessing.SimpleQueue()
+    _state['worker_thread'] = threading.Thread(target=_drain_worker_logs, args=(_state['worker_queue'],),
+                                               name='worker-log-receiver', daemon=True)
+    _state['worker_thread'].start()
+
+def stop_logging():
+    """워커와 큐에 남은 레코드를 모두 기록하고 리스너 정지"""
+    if _state['worker_thread'] is not None and os.getpid() == _state['pid']:
+        _state['worker_queue'].put(None)
+        _state['worker_thread'].join()
+        _state['worker_thread'] = None
+        _state['worker_queue'] = None
+    listener = _state['listener']
+    if listener is not None and os.getpid() == _state['pid']:
+        _state['listener'] = None
+        listener.stop()
+
+def flush_logs(timeout=10.0):
+    """큐에 들어간 레코드가 모두 기록될 때까지 대기"""
+    deadline = time.monotonic() + timeout
+    while (_state['listener'] is not None and _counters['processed'] < _counters['enqueued']
+           and time.monotonic() < deadline):
+        time.sleep(0.001)
+
+def set_debug_sampling(name, sample_every):
+    """로거의 stage별 debug 샘플 간격 ({stage: N, 'default': N})"""
+    _samplers[name] = StageSampler(sample_every)
+
+def debug_sampled(logger, stage, msg, *args):
+    """빈도가 높은 debug 기록 (stage별 샘플링)
+
+    레벨과 샘플링을 LogRecord 생성 전에 확인하므로 버려지는 레코드는 생성 비용도 들지 않는다.
+    메시지는 %-인자로 넘겨 포맷을 기록하는 쪽(큐 백엔드에서는 리스너 스레드)으로 미룬다.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    sampler = _samplers.get(logger.name)
+    if sampler is not None and not sampler.keep(stage):
+        return
+    logger.debug(msg, *args, extra={'stage': stage})
+
+def logging_stats():
+    config = logging_config()
+    return {
+        'backend': config['backend'],
+        **_counters,
+        'queue_depth': _state['queue'].qsize() if _state['queue'] is not None else 0
+    }
+
+def setup_logger(name, log_file=None, level=logging.INFO, backend=None):
     """
     통합 로거 설정
-    - 콘솔과 파일에 동시 출력
-    - 에러는 별도 파일에 기록
+    - 콘솔과 파일에 동시 출력 (logs/{name}.log, 크기 기준 회전)
+    - 에러는 별도 파일에 기록 (파일은 첫 기록 시 생성)
+    - backend: 'queue' | 'sync' (기본값: logging.backend)
     """
-    # 로그 디렉토리 생성
+    config = logging_config()
+    backend = backend or config['backend']
     log_dir = Path('logs')
-    log_dir.mkdir(exist_ok=True)
     
-    # 로거 생성
+    # 로거 생성 (logging.level이 있으면 모듈 기본값 대신 사용)
     logger = logging.getLogger(name)
-    logger.setLevel(level)
+    logger.setLevel(config['level'] or level)
     
     # 기존 핸들러 제거 (중복 방지)
     logger.handlers.clear()
+    set_debug_sampling(name, config['debug_sample_every'])
     
     # 포맷 설정
     formatter = logging.Formatter(
@@ -26,28 +240,33 @@ def setup_logger(name, log_file=None, level=logging.INFO):
         datefmt='%Y-%m-%d %H:%M:%S'
     )
     
-    # 콘솔 핸들러
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    # 콘솔 핸들러 (모든 로거가 공유)
+    if _state['console'] is None:
+        _state['console'] = logging.StreamHandler(sys.stdout)
+        _state['console'].setLevel(logging.INFO)
+        _state['console'].setFormatter(formatter)
     
     # 파일 핸들러 (전체 로그)
-    if log_file is None:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        log_file = log_dir / f'{name}_{timestamp}.log'
-    
-    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    file_handler = DeferredFileHandler(log_file or log_dir / f'{name}.log',
+                                       config['max_bytes'], config['backup_count'])
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
     
     # 에러 전용 파일 핸들러
-    error_file = log_dir / f'{name}_errors.log'
-    error_handler = logging.FileHandler(error_file, encoding='utf-8')
+    error_handler = DeferredFileHandler(log_dir / f'{name}_errors.log', config['max_bytes'], config['backup_count'])
     error_handler.setLevel(logging.ERROR)
     error_handler.setFormatter(formatter)
-    logger.addHandler(error_handler)
+    
+    handlers = [_state['console'], file_handler, error_handler]
+    if backend == 'queue':
+        if _state['listener'] is None:
+            _start_listener()
+        _routes[name] = handlers
+        logger.addHandler(NonBlockingQueueHandler(_state['queue'], config['queue_size']))
+    else:
+        _routes.pop(name, None)
+        for handler in handlers:
+            logger.addHandler(handler)
     
     return logger
 
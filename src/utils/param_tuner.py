@@ -0,0 +1,298 @@
+import sys
+import time
+import numpy as np
+import tenseal as ts
+import tenseal.sealapi as sealapi
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent.parent / 'server'))
+sys.path.append(str(Path(__file__).parent.parent / 'client'))
+from logger import setup_logger, log_exception
+from context_registry import load_config
+from report_generator import ExperimentReporter
+from rotations import rotation_steps, create_galois_keys, attach_galois_keys
+from scoring import score_items_per_item, score_items_packed, pack_scores, drop_to_last_level
+from decrypt import select_top_k
+from benchmark import synthetic_vectors
+
+logger = setup_logger('param_tuner')
+
+# CKKS 파라미터 자동 튜닝
+#
+# 계수 모듈러스 체인은 [첫 소수, scale 소수 * depth, 특수 소수] 형태로 만든다.
+#   depth: 평가 모드가 소비하는 레벨 수 (평문 곱 1 + pack_scores 마스크 곱 1)
+#   첫/특수 소수: scale_bits + integer_bits (최대 60) - 마지막 레벨에서 점수 정수부를 담고
+#                 키 스위칭 잡음을 흡수하도록 가장 큰 소수와 같게 둔다
+# 128비트 보안 한도(CoeffModulus.MaxBitCount)를 넘는 조합과 슬롯 수가 벡터 차원보다
+# 작은 조합은 건너뛴다.
+TUNING_MODES = ('packed', 'per_item')
+
+def required_depth(mode, pack):
+    """평가 모드가 소비하는 곱셈 레벨 수 (level_drop은 남는 레벨만 소비하므로 제외)"""
+    if mode not in TUNING_MODES:
+        raise ValueError(f"튜닝을 지원하지 않는 평가 모드: {mode} ({' | '.join(TUNING_MODES)})")
+    return 2 if mode == 'per_item' and pack else 1
+
+def candidate_parameters(config):
+    """스윕할 (poly_modulus_degree, coeff_mod_bit_sizes, scale_bits) 후보 생성
+
+    현재 설정(config['seal'])은 비교 기준으로 항상 첫 후보에 포함한다.
+    """
+    tuning = config['tuning']
+    eval_config = config['evaluation']
+    depth = required_depth(eval_config['mode'], eval_config.get('pack_scores', True))
+    vector_dim = config['dataset']['vector_dim']
+    
+    current = {key: config['seal'][key] for key in ('poly_modulus_degree', 'coeff_mod_bit_sizes', 'scale_bits')}
+    candidates = [current]
+    for degree in tuning['poly_modulus_degrees']:
+        if degree // 2 < vector_dim:
+            logger.info(f"N={degree}: 슬롯 수 {degree // 2} < 벡터 차원 {vector_dim}, 제외")
+            continue
+        max_bits = sealapi.CoeffModulus.MaxBitCount(degree, sealapi.SEC_LEVEL_TYPE.TC128)
+        for scale_bits in tuning['scale_bits']:
+            outer = min(60, scale_bits + tuning['integer_bits'])
+            bit_sizes = [outer] + [scale_bits] * depth + [outer]
+            if sum(bit_sizes) > max_bits:
+                logger.info(f"N={degree}, {bit_sizes}: {sum(bit_sizes)}비트 > 보안 한도 {max_bits}비트, 제외")
+                continue
+            candidate = {'poly_modulus_degree': degree, 'coeff_mod_bit_sizes': bit_sizes, 'scale_bits': scale_bits}
+            if candidate not in candidates:
+                candidates.append(candidate)
+    return candidates
+
+def load_vectors(config):
+    """튜닝용 사용자/아이템 벡터 (processed 데이터가 없으면 합성 데이터)"""
+    tuning = config['tuning']
+    num_users = tuning['num_users']
+    num_items = tuning['num_items']
+    processed = Path('data/processed')
+    
+    if tuning.get('data', 'processed') == 'processed' and (processed / 'item_vectors.npy').exists():
+        user_vectors = np.load(processed / 'user_vectors.npy')[:num_users]
+        item_vectors = np.load(processed / 'item_vectors.npy')[:num_items]
+        return user_vectors, item_vectors, 'processed'
+    
+    user_vectors, item_vectors = synthetic_vectors(
+        num_users, num_items, config['dataset']['vector_dim'], tuning.get('seed', 0)
+    )
+    return user_vectors, item_vectors, 'synthetic'
+
+def generate_tuning_keys(params, mode, vector_dim):
+    """후보 파라미터로 비밀키 컨텍스트와 (필요 회전 키만 담은) 공개키 컨텍스트 생성
+
+    Returns:
+        비밀키 컨텍스트, 공개키 컨텍스트, 공개키 직렬화 크기, 키 생성 시간
+    """
+    start_time = time.time()
+    context = ts.context(
+        ts.SCHEME_TYPE.CKKS,
+        poly_modulus_degree=params['poly_modulus_degree'],
+        coeff_mod_bit_sizes=params['coeff_mod_bit_sizes']
+    )
+    context.global_scale = 2 ** params['scale_bits']
+    galois_keys = create_galois_keys(context, params, sorted(rotation_steps(mode, vector_dim)))
+    
+    public = context.copy()
+    public.make_context_public()
+    public_bytes = attach_galois_keys(public.serialize(), galois_keys)
+    keygen_time = time.time() - start_time
+    
+    return context, ts.context_from(public_bytes), len(public_bytes), keygen_time
+
+def evaluate_candidate(params, config, user_vectors, item_vectors):
+    """후보 파라미터 하나로 사용자별 암호화 -> 평가 -> 복호화를 수행하고 시간/크기/오차 측정"""
+    eval_config = config['evaluation']
+    mode = eval_config['mode']
+    pack = eval_config.get('pack_scores', True)
+    threshold = config['recommendation']['threshold']
+    top_k = config['recommendation']['top_k']
+    slot_count = params['poly_modulus_degree'] // 2
+    
+    context, public_context, public_size, keygen_time = generate_tuning_keys(
+        params, mode, user_vectors.shape[1]
+    )
+    
+    timings = {'encrypt': [], 'evaluate': [], 'decrypt': []}
+    user_sizes, score_sizes, max_errors, mean_errors = [], [], [], []
+    top_k_preserved = True
+    # 앞쪽 warmup회는 첫 사용자로 측정 없이 실행 (첫 호출의 메모리 풀/NTT 테이블 초기화 비용 제외)
+    warmup = config['tuning'].get('warmup', 1)
+    for run, user_vector in enumerate([user_vectors[0]] * warmup + list(user_vectors)):
+        measured = run >= warmup
+        plain_scores = item_vectors @ user_vector
+        
+        # 클라이언트 암호화 (비밀키 컨텍스트) -> 서버 전송
+        start_time = time.time()
+        user_bytes = ts.ckks_vector(context, user_vector.tolist()).serialize()
+        encrypt_time = time.time() - start_time
+        
+        # 서버 평가 (공개키 컨텍스트)
+        start_time = time.time()
+        encrypted_user = ts.ckks_vector_from(public_context, user_bytes)
+        if mode == 'packed':
+            encrypted_scores, _ = score_items_packed(encrypted_user, item_vectors, slot_count, progress=False)
+            layout = [(idx * slot_count, block.size()) for idx, block in enumerate(encrypted_scores)]
+        else:
+            encrypted_scores, _ = score_items_per_item(encrypted_user, item_vectors, replicated=pack, progress=False)
+            layout = [(idx, 1) for idx in range(len(encrypted_scores))]
+            if pack:
+                encrypted_scores, layout = pack_scores(encrypted_scores, slot_count)
+        if eval_config.get('level_drop', False):
+            drop_to_last_level(encrypted_scores)
+        score_bytes = [encrypted.serialize() for encrypted in encrypted_scores]
+        evaluate_time = time.time() - start_time
+        
+        # 클라이언트 복호화
+        start_time = time.time()
+        decrypted = np.empty(len(item_vectors))
+        for data, (start, count) in zip(score_bytes, layout):
+            decrypted[start:start + count] = ts.ckks_vector_from(context, data).decrypt()[:count]
+        decrypt_time = time.time() - start_time
+        if not measured:
+            continue
+        
+        timings['encrypt'].append(encrypt_time)
+        timings['evaluate'].append(evaluate_time)
+        timings['decrypt'].append(decrypt_time)
+        user_sizes.append(len(user_bytes))
+        score_sizes.append(sum(len(data) for data in score_bytes))
+        
+        errors = np.abs(decrypted - plain_scores)
+        max_errors.append(float(errors.max()))
+        mean_errors.append(float(errors.mean()))
+        
+        # 임계값 필터링 + Top-K 결과가 평문과 같아야 한다 (동점 근처 순서 뒤바뀜 포함)
+        plain_top, plain_filtered = select_top_k(plain_scores, threshold, top_k)
+        enc_top, enc_filtered = select_top_k(decrypted, threshold, top_k)
+        if plain_filtered != enc_filtered or not np.array_equal(plain_top, enc_top):
+            top_k_preserved = False
+    
+    metrics = {
+        'keygen_time_sec': keygen_time,
+        'public_context_size_kb': public_size / 1024,
+        'user_ciphertext_size_kb': float(np.median(user_sizes)) / 1024,
+        'score_ciphertexts_size_kb': float(np.median(score_sizes)) / 1024,
+        'max_abs_error': float(np.max(max_errors)),
+        'mean_abs_error': float(np.mean(mean_errors)),
+        'top_k_preserved': top_k_preserved
+    }
+    for stage, values in timings.items():
+        metrics[f'{stage}_time_sec'] = float(np.median(values))
+    metrics['latency_sec'] = metrics['encrypt_time_sec'] + metrics['evaluate_time_sec'] + metrics['decrypt_time_sec']
+    return metrics
+
+def format_params(params):
+    return f"N={params['poly_modulus_degree']}, {params['coeff_mod_bit_sizes']}, scale=2^{params['scale_bits']}"
+
+def tune_parameters():
+    """후보 파라미터를 스윕해 오차 한도와 Top-K를 만족하는 가장 빠른 조합 선택 with 결과 기록
+
+    지연시간은 사용자 한 명의 암호화 + 서버 평가 + 복호화 중앙값이다.
+    키 생성은 한 번만 수행하므로 비교 기준에서 제외하고 기록만 한다.
+    """
+    reporter = ExperimentReporter('parameter_tuning')
+    
+    try:
+        config = load_config()
+        tuning = config['tuning']
+        user_vectors, item_vectors, data_source = load_vectors(config)
+        
+        logger.info("=" * 60)
+        logger.info(f"CKKS 파라미터 튜닝 시작 ({config['evaluation']['mode']} 모드, {data_source} 데이터: "
+                    f"사용자 {len(user_vectors)}명 x 아이템 {len(item_vectors)}개)")
+        logger.info("=" * 60)
+        
+        max_error = tuning['max_abs_error']
+        results = []
+        for params in candidate_parameters(config):
+            logger.info(f"후보 측정: {format_params(params)}")
+            try:
+                metrics = evaluate_candidate(params, config, user_vectors, item_vectors)
+            except ValueError as e:
+                # SEAL이 거부하는 조합 (예: 해당 비트 크기의 NTT 소수 부족)
+                logger.warning(f"  {format_params(params)} 사용 불가: {e}")
+                continue
+            
+            metrics['meets_error_bound'] = metrics['max_abs_error'] <= max_error
+            metrics['feasible'] = metrics['meets_error_bound'] and metrics['top_k_preserved']
+            results.append((params, metrics))
+            
+            logger.info(f"  지연시간 {metrics['latency_sec'] * 1000:.1f}ms "
+                        f"(암호화 {metrics['encrypt_time_sec'] * 1000:.1f} / 평가 {metrics['evaluate_time_sec'] * 1000:.1f} / "
+                        f"복호화 {metrics['decrypt_time_sec'] * 1000:.1f}), 키 생성 {metrics['keygen_time_sec']:.2f}초")
+            logger.info(f"  최대 오차 {metrics['max_abs_error']:.2e}, 평균 오차 {metrics['mean_abs_error']:.2e}, "
+                        f"Top-K 유지 {metrics['top_k_preserved']}, "
+                        f"점수 암호문 {metrics['score_ciphertexts_size_kb']:.1f} KB")
+            
+            reporter.add_stage(f'Candidate {format_params(params)}', metrics=metrics, parameters=params)
+        
+        if not results:
+            raise ValueError("측정 가능한 파라미터 후보가 없습니다")
+        
+        baseline_params, baseline = results[0]
+        feasible = [result for result in results if result[1]['feasible']]
+        if not feasible:
+            logger.warning(f"최대 오차 {max_error} 이하이면서 Top-K를 유지하는 후보가 없습니다")
+            best_params, best = baseline_params, baseline
+        else:
+            best_params, best = min(feasible, key=lambda result: result[1]['latency_sec'])
+        
+        logger.info("=" * 60)
+        logger.info(f"추천 파라미터: {format_params(best_params)}")
+        logger.info(f"현재 설정 대비 지연시간 {baseline['latency_sec'] / best['latency_sec']:.2f}x, "
+                    f"점수 암호문 {baseline['score_ciphertexts_size_kb'] / best['score_ciphertexts_size_kb']:.2f}x 축소, "
+                    f"공개키 {baseline['public_context_size_kb'] / best['public_context_size_kb']:.2f}x 축소")
+        logger.info("config/params.yaml seal 섹션에 반영:")
+        for key, value in best_params.items():
+            logger.info(f"  {key}: {value}")
+        logger.info("=" * 60)
+        
+        reporter.add_stage(
+            'Recommended CKKS Parameters',
+            metrics={
+                **best,
+                'latency_speedup_vs_current': baseline['latency_sec'] / best['latency_sec'],
+                'score_size_reduction_vs_current': 1 - best['score_ciphertexts_size_kb'] / baseline['score_ciphertexts_size_kb'],
+                'num_candidates': len(results),
+                'num_feasible': len(feasible)
+            },
+            parameters={
+                **best_params,
+                'current': baseline_params,
+                'evaluation_mode': config['evaluation']['mode'],
+                'max_abs_error': max_error,
+                'threshold': config['recommendation']['threshold'],
+                'top_k': config['recommendation']['top_k'],
+                'data': data_source,
+                'num_users': len(user_vectors),
+                'num_items': len(item_vectors)
+            }
+        )
+        
+        json_path = reporter.save_json()
+        md_path = reporter.generate_markdown_report()
+        logger.info(f"실험 결과 저장: {json_path}")
+        logger.info(f"마크다운 리포트: {md_path}")
+        
+        return best_params, best
+    
+    except Exception as e:
+        log_exception(logger, e, "tune_parameters")
+        raise
+
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='CKKS 파라미터 스윕 (tuning 설정)')
+    parser.parse_args(argv)
+    
+    try:
+        tune_parameters()
+    except Exception as e:
+        logger.critical("파라미터 튜닝 실패!")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
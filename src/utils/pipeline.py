@@ -0,0 +1,315 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import numpy as np
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent.parent / 'server'))
+sys.path.append(str(Path(__file__).parent.parent / 'client'))
+from logger import setup_logger, log_exception
+from report_generator import ExperimentReporter
+from context_registry import load_config, report_context_registry
+from data_prep import preprocess, ratings_format
+from keygen import generate_keys
+from encrypt import encrypt_user_vector
+from evaluator import compute_encrypted_recommendations
+from decrypt import decrypt_and_recommend
+
+logger = setup_logger('pipeline')
+
+# 한 프로세스에서 전처리 -> 키 생성 -> 암호화 -> 서버 연산 -> 복호화 실행
+#
+# 단계마다 입력 파일 내용 해시 + 관련 설정 값 + 파라미터로 입력 해시를 만들고,
+# 이전 실행과 입력 해시가 같고 출력 파일도 그대로면 그 단계를 건너뛴다.
+# 하위 단계의 입력은 상위 단계의 출력 파일이므로 상위 단계가 다시 실행돼도
+# 출력 내용이 같으면 (예: 같은 평점으로 다시 전처리) 하위 단계는 계속 건너뛴다.
+# CKKS 키 생성과 암호화는 무작위성이 있어 다시 실행하면 하위 단계도 모두 다시 실행된다.
+#
+# 전처리 결과 배열은 메모리로 다음 단계에 넘기고, 컨텍스트는 context_registry가
+# 프로세스 안에서 한 번만 역직렬화해 암호화/서버 연산/복호화가 공유한다.
+
+STATE_PATH = 'data/cache/pipeline_state.json'
+
+def build_stages(config, user_id):
+    """파이프라인 단계 정의 (deps: 선행 단계, config: 입력 해시에 넣을 설정 키)"""
+    ratings_file, _, _ = ratings_format(config['dataset'])
+    processed = Path('data/processed')
+    return [
+        {
+            'name': 'prepare',
+            'deps': [],
+            'inputs': [ratings_file],
+            'config': ['dataset', 'embedding'],
+            'outputs': [processed / 'user_vectors.npy', processed / 'item_vectors.npy', processed / 'item_ids.npy',
+                        processed / 'catalog.json'],
+            'run': run_prepare
+        },
+        {
+            'name': 'keygen',
+            'deps': [],
+            # minimal Galois 키는 평가 모드/벡터 차원/배치 크기에 필요한 회전 스텝만 생성
+            'inputs': [],
+            'config': ['seal', 'evaluation.mode', 'dataset.vector_dim', 'performance.batch_size'],
+            'outputs': [Path('keys/secret_context.bin'), Path('keys/public_context.bin'), Path('keys/galois_keys.json')],
+            'run': run_keygen
+        },
+        {
+            'name': 'encrypt',
+            'deps': ['prepare', 'keygen'],
+            'inputs': [processed / 'user_vectors.npy', Path('keys/secret_context.bin')],
+            'config': [],
+            'outputs': [Path(f'data/encrypted/user_{user_id}.bin')],
+            'run': run_encrypt
+        },
+        {
+            'name': 'evaluate',
+            'deps': ['prepare', 'keygen', 'encrypt'],
+            'inputs': [Path(f'data/encrypted/user_{user_id}.bin'), processed / 'item_vectors.npy',
+                       Path('keys/public_context.bin')],
+            'config': ['evaluation', 'catalog'],
+            'outputs': [Path(f'data/encrypted/scores_user_{user_id}.bin')],
+            'run': run_evaluate
+        },
+        {
+            'name': 'decrypt',
+            'deps': ['prepare', 'keygen', 'evaluate'],
+            'inputs': [Path(f'data/encrypted/scores_user_{user_id}.bin'), processed / 'item_ids.npy',
+                       Path('keys/secret_context.bin')],
+            'config': ['recommendation'],
+            'outputs': [],
+            'run': run_decrypt
+        }
+    ]
+
+def run_prepare(artifacts, config, user_id):
+    user_vectors, item_vectors, item_ids = preprocess(config)
+    artifacts.update(user_vectors=user_vectors, item_vectors=item_vectors, item_ids=item_ids)
+
+def run_keygen(artifacts, config, user_id):
+    generate_keys()
+
+def run_encrypt(artifacts, config, user_id):
+    encrypt_user_vector(user_id, user_vectors=artifacts.get('user_vectors'))
+
+def run_evaluate(artifacts, config, user_id):
+    compute_encrypted_recommendations(user_id, item_vectors=artifacts.get('item_vectors'))
+
+def run_decrypt(artifacts, config, user_id):
+    item_ids = artifacts.get('item_ids')
+    if item_ids is None:
+        item_ids = np.load('data/processed/item_ids.npy')
+    indices, scores = decrypt_and_recommend(user_id, config=config, item_ids=item_ids)
+    # 건너뛴 실행에서도 추천 결과를 보여줄 수 있도록 상태 파일에 기록
+    return {'top_k_item_ids': [int(item_ids[idx]) for idx in indices],
+            'top_k_scores': [round(float(score), 6) for score in scores]}
+
+def topological_order(stages):
+    """deps 기준 실행 순서 (정의 순서 유지, 순환이나 없는 선행 단계는 오류)"""
+    by_name = {stage['name']: stage for stage in stages}
+    ordered, visiting, done = [], set(), set()
+    
+    def visit(name):
+        if name in done:
+            return
+        if name not in by_name:
+            raise ValueError(f"정의되지 않은 선행 단계: {name}")
+        if name in visiting:
+            raise ValueError(f"단계 의존성에 순환이 있습니다: {name}")
+        visiting.add(name)
+        for dep in by_name[name]['deps']:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+        ordered.append(by_name[name])
+    
+    for stage in stages:
+        visit(stage['name'])
+    return ordered
+
+def config_value(config, key):
+    """점 표기 설정 키 값 (없으면 None)"""
+    value = config
+    for part in key.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+class FileDigests:
+    """파일 내용 sha256 ((크기, 수정 시각)이 같으면 이전 실행에서 계산한 값 재사용)"""
+    
+    def __init__(self, cached=None):
+        self.cached = cached or {}
+        self.hash_time_sec = 0.0
+    
+    def get(self, path):
+        path = Path(path)
+        if not path.exists():
+            return None
+        stat = path.stat()
+        signature = [stat.st_size, stat.st_mtime_ns]
+        cached = self.cached.get(str(path))
+        if cached is not None and cached[:2] == signature:
+            return cached[2]
+        
+        start_time = time.time()
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        self.hash_time_sec += time.time() - start_time
+        self.cached[str(path)] = signature + [digest.hexdigest()]
+        return digest.hexdigest()
+
+def input_hash(stage, config, digests, user_id):
+    """입력 파일 내용 해시 + 설정 값 + 파라미터를 합친 단계 입력 해시"""
+    payload = {
+        'inputs': {str(path): digests.get(path) for path in stage['inputs']},
+        'config': {key: config_value(config, key) for key in stage['config']},
+        'user_id': user_id if stage['name'] not in ('prepare', 'keygen') else None
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def load_state(state_path):
+    if not Path(state_path).exists():
+        return {'stages': {}, 'files': {}}
+    with open(state_path, 'r') as f:
+        return json.load(f)
+
+def save_state(state, state_path):
+    state_path = Path(state_path)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = state_path.with_name(f'.{state_path.name}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+def stage_key(stage, user_id):
+    # 사용자별 단계는 사용자마다 따로 기록해 다른 사용자 실행이 서로를 무효화하지 않도록 함
+    if stage['name'] in ('prepare', 'keygen'):
+        return stage['name']
+    return f"{stage['name']}_user_{user_id}"
+
+def run_pipeline(user_id=0, force=None, state_path=STATE_PATH):
+    """단계 의존성 순서로 실행하고, 입력이 바뀌지 않은 단계는 건너뜀 with 결과 기록
+
+    Args:
+        force: 입력 해시와 관계없이 다시 실행할 단계 이름 목록 ('all'이면 전체)
+    """
+    reporter = ExperimentReporter('pipeline')
+    force = set(force or [])
+    
+    try:
+        config = load_config()
+        state = load_state(state_path)
+        digests = FileDigests(state.get('files'))
+        stages = topological_order(build_stages(config, user_id))
+        
+        logger.info("=" * 60)
+        logger.info(f"파이프라인 실행: 사용자 {user_id}, 단계 {' -> '.join(stage['name'] for stage in stages)}")
+        logger.info("=" * 60)
+        
+        artifacts = {}
+        timings = []
+        pipeline_start = time.time()
+        for stage in stages:
+            key = stage_key(stage, user_id)
+            previous = state['stages'].get(key)
+            current_hash = input_hash(stage, config, digests, user_id)
+            
+            outputs_intact = previous is not None and all(
+                digests.get(path) == previous['outputs'].get(str(path)) for path in stage['outputs']
+            )
+            forced = 'all' in force or stage['name'] in force
+            if not forced and outputs_intact and previous['input_hash'] == current_hash:
+                logger.info(f"[{stage['name']}] 입력 변경 없음 - 건너뜀 "
+                            f"(이전 실행 {previous['wall_time_sec']:.2f}초 절약)")
+                if previous.get('result'):
+                    logger.info(f"[{stage['name']}] 이전 결과: {previous['result']}")
+                timings.append((stage, True, 0.0, previous['wall_time_sec']))
+                continue
+            
+            reason = '강제 실행' if forced else ('첫 실행' if previous is None else
+                                              '출력 변경' if not outputs_intact else '입력 변경')
+            logger.info(f"[{stage['name']}] 실행 ({reason})")
+            start_time = time.time()
+            result = stage['run'](artifacts, config, user_id)
+            wall_time = time.time() - start_time
+            
+            state['stages'][key] = {
+                'input_hash': current_hash,
+                'outputs': {str(path): digests.get(path) for path in stage['outputs']},
+                'wall_time_sec': wall_time,
+                'result': result
+            }
+            state['files'] = digests.cached
+            save_state(state, state_path)
+            timings.append((stage, False, wall_time, 0.0))
+            logger.info(f"[{stage['name']}] 완료 ({wall_time:.2f}초)")
+        
+        total_time = time.time() - pipeline_start
+        saved_time = sum(saved for _, _, _, saved in timings)
+        skipped = [stage['name'] for stage, was_skipped, _, _ in timings if was_skipped]
+        state['files'] = digests.cached
+        save_state(state, state_path)
+        
+        logger.info(f"전체 {total_time:.2f}초, 건너뛴 단계 {len(skipped)}개 {skipped}, "
+                    f"절약 시간 {saved_time:.2f}초 (해시 계산 {digests.hash_time_sec:.3f}초)")
+        
+        for stage, was_skipped, wall_time, saved in timings:
+            reporter.add_stage(
+                f"Pipeline Stage: {stage['name']}",
+                metrics={'wall_time_sec': wall_time, 'skipped': was_skipped, 'saved_time_sec': saved},
+                parameters={
+                    'deps': stage['deps'],
+                    'inputs': [str(path) for path in stage['inputs']],
+                    'config_keys': stage['config'],
+                    'input_hash': state['stages'][stage_key(stage, user_id)]['input_hash']
+                }
+            )
+        
+        reporter.add_stage(
+            'Pipeline Summary',
+            metrics={
+                'total_wall_time_sec': total_time,
+                'executed_stages': len(timings) - len(skipped),
+                'skipped_stages': len(skipped),
+                'wall_time_saved_sec': saved_time,
+                'hash_time_sec': digests.hash_time_sec
+            },
+            parameters={'user_id': user_id, 'force': sorted(force), 'state_path': str(state_path)}
+        )
+        report_context_registry(reporter)
+        
+        json_path = reporter.save_json()
+        md_path = reporter.generate_markdown_report()
+        logger.info(f"실험 결과 저장: {json_path}")
+        logger.info(f"마크다운 리포트: {md_path}")
+        
+        return state['stages']
+    
+    except Exception as e:
+        log_exception(logger, e, "run_pipeline")
+        raise
+
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='단일 프로세스 파이프라인 (입력이 바뀐 단계만 실행)')
+    parser.add_argument('--user-id', type=int, default=0)
+    parser.add_argument('--force', nargs='+', default=None,
+                        choices=['all', 'prepare', 'keygen', 'encrypt', 'evaluate', 'decrypt'],
+                        help='입력 해시와 관계없이 다시 실행할 단계')
+    args = parser.parse_args(argv)
+    
+    try:
+        run_pipeline(user_id=args.user_id, force=args.force)
+    except Exception as e:
+        logger.critical("파이프라인 실행 실패!")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
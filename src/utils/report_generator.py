@@ -4,6 +4,7 @@ import time
 from datetime import datetime
 from pathlib import Path
 import numpy as np
+import instrumentation
 
 class ExperimentReporter:
     """실험 결과를 JSON과 마크다운으로 자동 기록"""
@@ -23,6 +24,7 @@ class ExperimentReporter:
             'timestamp': datetime.now().isoformat(),
             'stages': []
         }
+        self.metrics_path = None
     
     def add_stage(self, stage_name, metrics, parameters=None):
         """스테이지별 결과 추가"""
@@ -34,8 +36,36 @@ class ExperimentReporter:
         }
         self.data['stages'].append(stage_data)
     
+    def add_span_stage(self):
+        """구간 계측(instrumentation.span) 결과를 단계로 추가하고 텍스트 지표 파일 저장
+        
+        계측이 꺼져 있거나 기록된 구간이 없으면 아무것도 하지 않는다.
+        히스토그램은 프로세스 단위로 누적되므로 같은 프로세스의 이후 리포트에도 포함된다.
+        """
+        if self.metrics_path is not None or not instrumentation.is_enabled():
+            return None
+        spans = instrumentation.snapshot()
+        if not spans:
+            return None
+        
+        self.metrics_path = instrumentation.write_metrics_text(self.results_dir / f'{self.experiment_id}.prom')
+        metrics = {}
+        for name, summary in spans.items():
+            metrics.update({f'{name}_{key}': value for key, value in summary.items()})
+        self.add_stage(
+            'Span Latency',
+            metrics=metrics,
+            parameters={
+                'clock': 'time.perf_counter',
+                'num_buckets': len(instrumentation.BUCKET_BOUNDS) + 1,
+                'metrics_file': str(self.metrics_path)
+            }
+        )
+        return self.metrics_path
+    
     def save_json(self):
-        """JSON 형식으로 저장"""
+        """JSON 형식으로 저장 (구간 계측이 켜져 있으면 Span Latency 단계 포함)"""
+        self.add_span_stage()
         json_path = self.results_dir / f'{self.experiment_id}.json'
         with open(json_path, 'w', encoding='utf-8') as f:
             json.dump(self.data, f, indent=2, ensure_ascii=False)
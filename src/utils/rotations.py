@@ -0,0 +1,225 @@
+import os
+import json
+import tempfile
+import tenseal.sealapi as sealapi
+from pathlib import Path
+
+# 평가 모드별로 서버가 실제로 사용하는 회전(Galois) 키만 계산/생성
+#
+# TenSEAL의 generate_galois_keys()는 ±2^k 회전 키를 모두 만들지만,
+# 서버 연산에 필요한 회전은 벡터 차원과 배치 레이아웃으로 정해진다.
+#   per_item (dot / enc_matmul_plain(row=1)): 합산 회전 2^k (2^k < vector_dim)
+#   batched  (enc_matmul_plain(row=rows))  : rows * 2^k (2^k < row_dim)
+#   packed   (대각선 matmul)               : 회전 i (0 < i < vector_dim)를 SEAL이
+#                                            NAF(±2^k 합)로 분해하므로 그 성분들
+# pack_scores(pack_vectors)는 마스크 곱셈만 사용하므로 회전 키가 필요 없다.
+GALOIS_MODES = ('packed', 'per_item', 'batched')
+
+def batch_layout(vector_dim, slot_count, batch_size):
+    """배치 암호문의 행 수와 행 길이 계산
+
+    enc_matmul_encoding은 (rows, row_dim) 행렬을 열 우선으로 슬롯에 배치하므로
+    row_dim은 2의 거듭제곱으로 패딩되고, rows * row_dim이 slot_count를 나누어야
+    슬롯 복제 후 회전 합산이 올바르게 동작한다.
+    """
+    row_dim = 1 << (vector_dim - 1).bit_length()
+    capacity = slot_count // row_dim
+    if capacity < 1:
+        raise ValueError(f"벡터 차원 {vector_dim}이 슬롯 수 {slot_count}를 초과합니다")
+    
+    rows = 1 << (max(batch_size, 1) - 1).bit_length()
+    return min(rows, capacity), row_dim
+
+def naf(value):
+    """SEAL과 같은 방식의 non-adjacent form 분해 (부호 있는 2의 거듭제곱 리스트)"""
+    digits = []
+    sign = -1 if value < 0 else 1
+    value = abs(value)
+    bit = 0
+    while value:
+        digit = 2 - (value & 3) if value & 1 else 0
+        value = (value - digit) >> 1
+        if digit:
+            digits.append(sign * digit * (1 << bit))
+        bit += 1
+    return digits
+
+def rotation_steps(mode, vector_dim, rows=1, row_dim=None):
+    """평가 모드 하나에 필요한 회전 스텝 집합"""
+    sum_span = 1 << (vector_dim - 1).bit_length()
+    
+    if mode == 'per_item':
+        return {1 << k for k in range(sum_span.bit_length() - 1)}
+    if mode == 'batched':
+        row_dim = row_dim or sum_span
+        return {rows * (1 << k) for k in range(row_dim.bit_length() - 1)}
+    if mode == 'packed':
+        steps = set()
+        for step in range(1, vector_dim):
+            steps.update(naf(step))
+        return steps
+    raise ValueError(f"지원하지 않는 평가 모드: {mode} ({' | '.join(GALOIS_MODES)})")
+
+def required_rotation_steps(config, modes=None):
+    """설정의 벡터 차원/배치 크기로 지정한 모드들의 회전 스텝 합집합 계산
+
+    Returns:
+        정렬된 스텝 리스트, 모드별 스텝 수
+    """
+    seal_config = config['seal']
+    modes = modes or seal_config.get('galois_modes') or [config['evaluation']['mode']]
+    vector_dim = config['dataset']['vector_dim']
+    slot_count = seal_config['poly_modulus_degree'] // 2
+    
+    steps = set()
+    per_mode = {}
+    for mode in modes:
+        rows, row_dim = 1, None
+        if mode == 'batched':
+            rows, row_dim = batch_layout(vector_dim, slot_count, config['performance']['batch_size'])
+        mode_steps = rotation_steps(mode, vector_dim, rows, row_dim)
+        # 슬롯 수 이상 회전은 항등/중복이므로 제외 (SEAL도 허용하지 않음)
+        mode_steps = {step for step in mode_steps if abs(step) < slot_count}
+        per_mode[mode] = len(mode_steps)
+        steps |= mode_steps
+    return sorted(steps), per_mode
+
+def check_rotation_keys(mode, vector_dim, rows=1, row_dim=None, manifest_path='keys/galois_keys.json'):
+    """공개키 컨텍스트에 평가 모드에 필요한 회전 키가 있는지 확인
+
+    keygen.py가 남긴 keys/galois_keys.json 기준이며, 기록이 없거나 전체 키(full)면 통과.
+    """
+    path = Path(manifest_path)
+    if not path.exists():
+        return
+    with open(path, 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('galois_keys') != 'minimal':
+        return
+    
+    missing = sorted(rotation_steps(mode, vector_dim, rows, row_dim) - set(manifest['steps']))
+    if missing:
+        if mode == 'batched' and mode in manifest.get('modes', [mode]):
+            # batched 회전 스텝은 keygen 시점의 performance.batch_size로 정해짐
+            hint = f"performance.batch_size를 {rows} 이상으로 설정한 뒤 keygen.py를 다시 실행하세요"
+        else:
+            hint = "seal.galois_modes에 추가한 뒤 keygen.py를 다시 실행하세요"
+        raise ValueError(f"공개키에 {mode} 모드 회전 키가 없습니다 (누락 스텝: {missing}). {hint}")
+
+def galois_elt(step, poly_modulus_degree):
+    """CKKS 회전 스텝 -> Galois 원소 (SEAL GaloisTool::get_elt_from_step과 동일)"""
+    slot_count = poly_modulus_degree // 2
+    step = step % slot_count
+    return pow(3, step, 2 * poly_modulus_degree)
+
+def create_galois_keys(context, seal_config, steps):
+    """지정한 회전 스텝의 Galois 키만 생성해 SEAL 직렬화 바이트로 반환
+
+    TenSEAL 파이썬 API는 전체 키 생성만 제공하므로, 같은 파라미터의
+    sealapi 컨텍스트에 비밀키를 옮겨 KeyGenerator로 직접 생성한다.
+    (sealapi 객체는 파일 단위로만 직렬화되어 임시 디렉토리를 사용)
+    """
+    degree = seal_config['poly_modulus_degree']
+    parms = sealapi.EncryptionParameters(sealapi.SCHEME_TYPE.CKKS)
+    parms.set_poly_modulus_degree(degree)
+    parms.set_coeff_modulus(sealapi.CoeffModulus.Create(degree, seal_config['coeff_mod_bit_sizes']))
+    seal_context = sealapi.SEALContext(parms, True, sealapi.SEC_LEVEL_TYPE.TC128)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        secret_path = os.path.join(tmp_dir, 'secret_key')
+        galois_path = os.path.join(tmp_dir, 'galois_keys')
+        
+        context.secret_key().data.save(secret_path)
+        secret_key = sealapi.SecretKey()
+        secret_key.load(seal_context, secret_path)
+        
+        galois_keys = sealapi.GaloisKeys()
+        elts = sorted({galois_elt(step, degree) for step in steps})
+        sealapi.KeyGenerator(seal_context, secret_key).create_galois_keys(elts, galois_keys)
+        galois_keys.save(galois_path)
+        
+        with open(galois_path, 'rb') as f:
+            return f.read()
+
+# TenSEALContextProto (tenseal/proto/tensealcontext.proto) 필드 번호
+_PUBLIC_CONTEXT = 2
+_PRIVATE_CONTEXT = 3
+_PUBLIC_GALOIS_KEYS = 5
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return value, pos
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def _parse_message(data):
+    """protobuf 메시지를 (필드 번호, wire type, 값) 리스트로 분해"""
+    fields = []
+    pos = 0
+    while pos < len(data):
+        key, pos = _read_varint(data, pos)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = _read_varint(data, pos)
+        elif wire_type == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        elif wire_type == 2:
+            length, pos = _read_varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        elif wire_type == 5:
+            value, pos = data[pos:pos + 4], pos + 4
+        else:
+            raise ValueError(f"지원하지 않는 protobuf wire type: {wire_type}")
+        fields.append((number, wire_type, value))
+    return fields
+
+def _encode_message(fields):
+    out = bytearray()
+    for number, wire_type, value in sorted(fields, key=lambda field: field[0]):
+        out += _varint(number << 3 | wire_type)
+        if wire_type == 0:
+            out += _varint(value)
+        elif wire_type == 2:
+            out += _varint(len(value)) + value
+        else:
+            out += value
+    return bytes(out)
+
+def _replace_field(fields, number, wire_type, value):
+    return [field for field in fields if field[0] != number] + [(number, wire_type, value)]
+
+def _get_field(fields, number):
+    return next((value for field_number, _, value in fields if field_number == number), b'')
+
+def attach_galois_keys(serialized_context, galois_keys):
+    """직렬화된 공개키 TenSEAL 컨텍스트에 Galois 키 바이트를 넣어 다시 직렬화
+
+    비밀키 컨텍스트는 저장된 Galois 키를 읽지 않고 로드 시 생성 플래그에 따라
+    전체 키를 재생성하므로, 공개키 컨텍스트에만 사용한다.
+    TenSEAL 내부 직렬화 형식에 의존하므로 버전은 requirements.txt에 고정하고,
+    다시 로드한 컨텍스트의 회전은 tests/test_rotations.py에서 확인한다.
+    """
+    fields = _parse_message(serialized_context)
+    if _get_field(fields, _PRIVATE_CONTEXT):
+        raise ValueError("비밀키 컨텍스트에는 선택적 Galois 키를 넣을 수 없습니다")
+    
+    public = _parse_message(_get_field(fields, _PUBLIC_CONTEXT))
+    public = _replace_field(public, _PUBLIC_GALOIS_KEYS, 2, galois_keys)
+    fields = _replace_field(fields, _PUBLIC_CONTEXT, 2, _encode_message(public))
+    return _encode_message(fields)
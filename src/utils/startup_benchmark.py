@@ -0,0 +1,131 @@
+import sys
+import json
+import time
+import subprocess
+import numpy as np
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+from logger import setup_logger, log_exception
+from report_generator import ExperimentReporter
+
+logger = setup_logger('startup_benchmark')
+
+# 서브커맨드별 시작 시간: 새 프로세스에서 `cli.py <서브커맨드> --help`가 끝날 때까지의 시간
+# (인터프리터 시작 + 해당 모듈과 의존성 import + 인자 파싱)을 반복 측정한다.
+# 비교 기준으로 CLI 자체(--help)와 모든 서브커맨드 모듈을 한 번에 import하는 경우를 함께 잰다.
+
+CLI_PATH = Path(__file__).parent.parent / 'cli.py'
+HEAVY_MODULES = ('numpy', 'scipy', 'tenseal', 'yaml', 'tqdm', 'pandas', 'sklearn')
+
+def time_command(args, repeats):
+    """새 프로세스 실행 시간 목록 (초)"""
+    times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        result = subprocess.run([sys.executable, *args], capture_output=True, text=True)
+        times.append(time.perf_counter() - start_time)
+        if result.returncode != 0:
+            raise RuntimeError(f"{' '.join(args)} 실패 (종료 코드 {result.returncode}): {result.stderr[-500:]}")
+    return times
+
+def probe_script(commands):
+    """서브커맨드 모듈을 import한 뒤 로드된 무거운 모듈 이름을 출력하는 스크립트"""
+    return (
+        f"import sys, json; sys.path.insert(0, {str(CLI_PATH.parent)!r}); import cli\n"
+        f"for name in {list(commands)!r}: cli.load_command(name)\n"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+
+def heavy_imports(commands):
+    result = subprocess.run([sys.executable, '-c', probe_script(commands)], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import 확인 실패: {result.stderr[-500:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def summarize(times):
+    times = np.array(times) * 1000
+    return {
+        'p50_ms': float(np.percentile(times, 50)),
+        'min_ms': float(times.min()),
+        'max_ms': float(times.max())
+    }
+
+def count_log_files(log_dir='logs'):
+    log_dir = Path(log_dir)
+    return len(list(log_dir.iterdir())) if log_dir.exists() else 0
+
+def benchmark_startup(commands=None, repeats=5):
+    """서브커맨드별 시작 시간과 import되는 무거운 의존성 측정 with 결과 기록"""
+    sys.path.insert(0, str(CLI_PATH.parent))
+    import cli
+    
+    reporter = ExperimentReporter('cli_startup')
+    
+    try:
+        commands = commands or [name for name in cli.COMMANDS if name != 'startup']
+        logger.info("=" * 60)
+        logger.info(f"서브커맨드 시작 시간 측정: {len(commands)}개, 반복 {repeats}회")
+        logger.info("=" * 60)
+        
+        log_files_before = count_log_files()
+        baseline = summarize(time_command([str(CLI_PATH), '--help'], repeats))
+        logger.info(f"CLI --help: p50 {baseline['p50_ms']:.1f}ms")
+        
+        results = {}
+        for name in commands:
+            results[name] = summarize(time_command([str(CLI_PATH), name, '--help'], repeats))
+            modules = heavy_imports([name])
+            logger.info(f"{name:<14} p50 {results[name]['p50_ms']:7.1f}ms  (import: {', '.join(modules) or '-'})")
+            reporter.add_stage(
+                f'Startup: {name}',
+                metrics=results[name],
+                parameters={'module': cli.COMMANDS[name][1], 'heavy_imports': modules, 'repeats': repeats}
+            )
+        log_files_created = count_log_files() - log_files_before
+        
+        # 모든 서브커맨드 모듈을 import하는 경우 (진입점이 모듈을 미리 import할 때의 하한)
+        eager_script = probe_script(commands)
+        eager = summarize(time_command(['-c', eager_script], repeats))
+        logger.info(f"전체 모듈 import: p50 {eager['p50_ms']:.1f}ms, "
+                    f"--help 실행 중 생성된 로그 파일 {log_files_created}개")
+        
+        reporter.add_stage(
+            'CLI Startup',
+            metrics={
+                'cli_help_p50_ms': baseline['p50_ms'],
+                'eager_import_all_p50_ms': eager['p50_ms'],
+                'max_subcommand_p50_ms': max(result['p50_ms'] for result in results.values()),
+                'mean_subcommand_p50_ms': float(np.mean([result['p50_ms'] for result in results.values()])),
+                'log_files_created': log_files_created
+            },
+            parameters={'commands': commands, 'repeats': repeats, 'python': sys.executable}
+        )
+        
+        json_path = reporter.save_json()
+        md_path = reporter.generate_markdown_report()
+        logger.info(f"실험 결과 저장: {json_path}")
+        logger.info(f"마크다운 리포트: {md_path}")
+        
+        return results
+    
+    except Exception as e:
+        log_exception(logger, e, "benchmark_startup")
+        raise
+
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='서브커맨드별 시작 시간 벤치마크')
+    parser.add_argument('--commands', nargs='+', default=None, help='측정할 서브커맨드 (기본값: 전체)')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args(argv)
+    
+    try:
+        benchmark_startup(commands=args.commands, repeats=args.repeats)
+    except Exception as e:
+        logger.critical("시작 시간 벤치마크 실패!")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import os
+import json
+from pathlib import Path
+
+from container import ScoreContainerReader
+
+# 벌크 암호화(encrypt.py --all) 사용자 암호문 샤드
+#
+#   {shard_dir}/index.json           : 샤드 크기, 사용자 수, 샤드별 (경로, 사용자 범위)
+#   {shard_dir}/users_{shard:05d}.bin : 컨테이너 (src/utils/container.py)
+#                                       레코드 (시작 = 사용자 ID, 개수 1) + 푸터 오프셋 인덱스
+#
+# 사용자 i의 암호문은 index.json에서 샤드를 찾고 푸터 오프셋으로 바로 읽으므로
+# 사용자 수와 무관하게 파일 하나, 레코드 하나만 접근한다.
+DEFAULT_SHARD_DIR = 'data/encrypted/users'
+
+def shard_path(shard_dir, shard_id):
+    return Path(shard_dir) / f'users_{shard_id:05d}.bin'
+
+def write_shard_index(shard_dir, shard_size, num_users, shards, header):
+    """샤드 인덱스 기록 (모든 샤드를 쓴 뒤 마지막에 교체)"""
+    path = Path(shard_dir) / 'index.json'
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'shard_size': shard_size,
+            'num_users': num_users,
+            'header': header,
+            'shards': shards
+        }, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+def read_user_ciphertext(user_id, encrypted_dir='data/encrypted', shard_dir=DEFAULT_SHARD_DIR):
+    """사용자 암호문 바이트 (user_{id}.bin이 있으면 우선, 없으면 벌크 샤드에서 읽기)"""
+    user_path = Path(encrypted_dir) / f'user_{user_id}.bin'
+    if user_path.exists():
+        with open(user_path, 'rb') as f:
+            return f.read()
+    
+    index_path = Path(shard_dir) / 'index.json'
+    if not index_path.exists():
+        raise FileNotFoundError(f"암호화된 사용자 파일이 없습니다: {user_path} (벌크 샤드 인덱스도 없음)")
+    with open(index_path, 'r') as f:
+        index = json.load(f)
+    if not 0 <= user_id < index['num_users']:
+        raise ValueError(f"유효하지 않은 사용자 ID: {user_id} (샤드 사용자 수: {index['num_users']})")
+    
+    shard = index['shards'][user_id // index['shard_size']]
+    with ScoreContainerReader(Path(shard_dir) / shard['path']) as reader:
+        start, _, ciphertext = reader[user_id - shard['start']]
+        if start != user_id:
+            raise ValueError(f"샤드 인덱스 불일치: 사용자 {user_id} 위치에 사용자 {start} 레코드")
+        return bytes(ciphertext)
@@ -0,0 +1,49 @@
+import asyncio
+import json
+import struct
+
+# 모든 프레임은 4바이트 big-endian 길이 + 본문
+_LENGTH = struct.Struct('>I')
+MAX_FRAME_BYTES = 1 << 30
+
+def encode_frame(payload):
+    """bytes 또는 dict(JSON)을 길이 접두 프레임으로 변환"""
+    if isinstance(payload, dict):
+        payload = json.dumps(payload).encode('utf-8')
+    return _LENGTH.pack(len(payload)) + payload
+
+def _check_length(length):
+    if length > MAX_FRAME_BYTES:
+        raise ValueError(f"프레임 크기 초과: {length} bytes")
+    return length
+
+async def read_frame(reader):
+    """asyncio StreamReader에서 프레임 하나 읽기 (연결 종료 시 None)"""
+    try:
+        header = await reader.readexactly(_LENGTH.size)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise
+    (length,) = _LENGTH.unpack(header)
+    return await reader.readexactly(_check_length(length))
+
+def recv_exactly(sock, size):
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(min(size - len(buffer), 1 << 20))
+        if not chunk:
+            raise ConnectionError("서버 연결이 종료되었습니다")
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+def recv_frame(sock):
+    """블로킹 소켓에서 프레임 하나 읽기"""
+    (length,) = _LENGTH.unpack(recv_exactly(sock, _LENGTH.size))
+    return recv_exactly(sock, _check_length(length))
+
+def recv_json(sock):
+    return json.loads(recv_frame(sock).decode('utf-8'))
+
+def send_frame(sock, payload):
+    sock.sendall(encode_frame(payload))
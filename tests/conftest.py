@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# 스크립트와 같은 방식으로 src 하위 모듈을 이름으로 import
+SRC_DIR = Path(__file__).resolve().parent.parent / 'src'
+for sub_dir in ('utils', 'server', 'client'):
+    sys.path.insert(0, str(SRC_DIR / sub_dir))
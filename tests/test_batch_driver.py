@@ -0,0 +1,44 @@
+import json
+import numpy as np
+import yaml
+from pathlib import Path
+
+REPO_CONFIG = Path(__file__).resolve().parent.parent / 'config' / 'params.yaml'
+VECTOR_DIM = 64
+
+def test_default_config_with_small_vector_dim(tmp_path, monkeypatch):
+    """기본 설정(max_batch_users: null, 최소 회전 키)에서 벡터 차원이 작아도 배치 처리"""
+    with open(REPO_CONFIG, 'r') as f:
+        config = yaml.safe_load(f)
+    assert config['batch_driver']['max_batch_users'] is None
+    config['dataset']['vector_dim'] = VECTOR_DIM
+    config['performance']['num_threads'] = 1
+    (tmp_path / 'config').mkdir()
+    with open(tmp_path / 'config' / 'params.yaml', 'w') as f:
+        yaml.safe_dump(config, f)
+    monkeypatch.chdir(tmp_path)
+    
+    rng = np.random.default_rng(0)
+    processed = Path('data/processed')
+    processed.mkdir(parents=True)
+    user_vectors = (rng.standard_normal((12, VECTOR_DIM)) / np.sqrt(VECTOR_DIM)).astype(np.float32)
+    item_vectors = (rng.standard_normal((40, VECTOR_DIM)) / np.sqrt(VECTOR_DIM)).astype(np.float32)
+    np.save(processed / 'user_vectors.npy', user_vectors)
+    np.save(processed / 'item_vectors.npy', item_vectors)
+    np.save(processed / 'item_ids.npy', np.arange(100, 140))
+    requests_path = tmp_path / 'requests.jsonl'
+    requests_path.write_text(''.join(json.dumps({'request_id': idx, 'user_id': idx}) + '\n' for idx in range(12)))
+    
+    # 모듈 import 시 로그 파일 경로가 정해지므로 작업 디렉토리로 옮긴 뒤 import
+    from keygen import generate_keys
+    from batch_driver import process_requests
+    generate_keys()
+    output_path = tmp_path / 'responses.jsonl'
+    process_requests(requests_path, output_path)
+    
+    responses = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert [response['status'] for response in responses] == ['ok'] * 12
+    for response in responses:
+        expected = item_vectors @ user_vectors[response['user_id']]
+        for recommendation in response['recommendations']:
+            assert abs(recommendation['score'] - expected[recommendation['item_id'] - 100]) < 1e-3
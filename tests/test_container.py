@@ -0,0 +1,87 @@
+import pytest
+
+from container import MAGIC, ScoreContainerWriter, ScoreContainerReader
+from catalog import copy_segment_records, check_segments
+
+HEADER = {'packing': 'packed', 'slots_per_item': 1, 'segments': [{'start': 0, 'end': 10}]}
+# 레코드 내용은 그대로 옮겨지기만 하므로 실제 암호문 대신 임의 바이트 사용
+RECORDS = [(b'a' * 7, 0, 4), (b'bb' * 50, 4, 4), (b'', 8, 2)]
+
+def write_container(path, records=RECORDS, header=HEADER):
+    with ScoreContainerWriter(path, header) as writer:
+        for ciphertext, start, count in records:
+            writer.write(ciphertext, start, count)
+    return path
+
+def test_write_and_read(tmp_path):
+    path = write_container(tmp_path / 'scores.bin')
+    
+    with ScoreContainerReader(path) as reader:
+        assert reader.header == {'version': 2, **HEADER}
+        assert reader.num_items == 10
+        assert reader.footer['item_range'] == [0, 10]
+        assert len(reader) == 3
+        assert reader.layout == [(0, 4), (4, 4), (8, 2)]
+        assert [(start, count, bytes(data)) for start, count, data in reader] == \
+            [(start, count, data) for data, start, count in RECORDS]
+        start, count, data = reader[1]
+        assert (start, count, bytes(data)) == (4, 4, RECORDS[1][0])
+    assert not list(tmp_path.glob('.*.tmp'))
+
+def test_failed_write_keeps_previous_file(tmp_path):
+    path = write_container(tmp_path / 'scores.bin')
+    
+    with pytest.raises(RuntimeError):
+        with ScoreContainerWriter(path, HEADER) as writer:
+            writer.write(b'x', 0, 1)
+            raise RuntimeError('중단')
+    
+    with ScoreContainerReader(path) as reader:
+        assert len(reader) == 3
+    assert not list(tmp_path.glob('.*.tmp'))
+
+@pytest.mark.parametrize('keep', [0, 3, 6, 40, -1, -5])
+def test_truncated_file_rejected(tmp_path, keep):
+    data = write_container(tmp_path / 'scores.bin').read_bytes()
+    path = tmp_path / 'truncated.bin'
+    path.write_bytes(data[:keep])
+    
+    with pytest.raises(ValueError):
+        ScoreContainerReader(path)
+
+def test_corrupted_trailer_rejected(tmp_path):
+    data = bytearray(write_container(tmp_path / 'scores.bin').read_bytes())
+    
+    bad_magic = tmp_path / 'bad_magic.bin'
+    bad_magic.write_bytes(bytes(data[:-len(MAGIC)]) + b'XXXX')
+    with pytest.raises(ValueError):
+        ScoreContainerReader(bad_magic)
+    
+    # 푸터 오프셋이 파일 밖을 가리키는 경우
+    bad_offset = tmp_path / 'bad_offset.bin'
+    bad_offset.write_bytes(bytes(data[:-12]) + (len(data) * 2).to_bytes(8, 'big') + MAGIC)
+    with pytest.raises(ValueError):
+        ScoreContainerReader(bad_offset)
+
+def test_copy_segment_records(tmp_path):
+    source = write_container(tmp_path / 'old.bin')
+    target = tmp_path / 'new.bin'
+    
+    with ScoreContainerReader(source) as reader, ScoreContainerWriter(target, HEADER) as writer:
+        copied = copy_segment_records(reader, writer, [{'start': 0, 'end': 8}])
+        writer.write(b'new', 8, 2)
+    
+    assert copied == 2
+    with ScoreContainerReader(target) as reader:
+        assert reader.layout == [(0, 4), (4, 4), (8, 2)]
+        assert [bytes(data) for _, _, data in reader] == [RECORDS[0][0], RECORDS[1][0], b'new']
+
+def test_check_segments_requires_full_coverage():
+    header = {'segments': [{'start': 0, 'end': 600}, {'start': 600, 'end': 603}, {'start': 603, 'end': 608}]}
+    
+    assert check_segments(header, layout=[(0, 600), (600, 3), (603, 5)]) is None
+    # 이전 파일에서 옮기지 못한 세그먼트가 빠진 경우
+    with pytest.raises(ValueError):
+        check_segments(header, layout=[(603, 5)])
+    with pytest.raises(ValueError):
+        check_segments(header, layout=[(0, 603), (600, 3), (603, 5)])
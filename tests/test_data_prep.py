@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+import yaml
+from pathlib import Path
+from scipy import sparse
+
+from catalog import load_catalog
+
+REPO_CONFIG = Path(__file__).resolve().parent.parent / 'config' / 'params.yaml'
+
+def test_delta_keeps_unchanged_segment_digests(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # 모듈 import 시 로그 파일 경로가 정해지므로 작업 디렉토리로 옮긴 뒤 import
+    from data_prep import vectorize_and_normalize, save_processed_data, save_embedding_state, apply_ratings_delta
+    with open(REPO_CONFIG, 'r') as f:
+        config = yaml.safe_load(f)
+    config['dataset'].update({'name': 'movielens-1m', 'path': 'data/raw/ml-1m'})
+    
+    rng = np.random.default_rng(0)
+    user_ids, movie_ids = np.arange(1, 201), np.arange(1, 61)
+    matrix = sparse.random(len(user_ids), len(movie_ids), density=0.2, random_state=0,
+                           data_rvs=lambda size: np.ones(size), format='csr', dtype=np.float32)
+    user_vectors, item_vectors, item_ids, state = vectorize_and_normalize(
+        matrix, movie_ids, num_items=40, vector_dim=16, embedding_config={'method': 'randomized'}
+    )
+    save_processed_data(user_vectors, item_vectors, item_ids, config)
+    save_embedding_state(state, user_ids, item_ids, 'randomized')
+    before = load_catalog()
+    
+    # 기존 사용자 평점 변경 + 새 영화(긍정 평점 6개) 추가
+    lines = [f'{user}::1000::5::0' for user in rng.choice(user_ids, 6, replace=False)]
+    lines.append(f'{user_ids[0]}::{item_ids[0]}::4::0')
+    delta_path = tmp_path / 'delta.dat'
+    delta_path.write_text('\n'.join(lines) + '\n')
+    changes = apply_ratings_delta(delta_path, config)
+    
+    assert changes['new_item_ids'] == [1000]
+    for name, vectors in (('user_vectors', user_vectors), ('item_vectors', item_vectors)):
+        assert np.load(f'data/processed/{name}.npy').dtype == vectors.dtype
+    after = load_catalog()
+    assert after['segments'][0] == before['segments'][0]
+    assert [(segment['start'], segment['end']) for segment in after['segments']] == [(0, 40), (40, 41)]
+
+def test_incremental_fit_uses_short_last_batch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from data_prep import fit_embeddings
+    # 사용자 25명, 배치 10명, 랭크 8 -> 마지막 5명은 앞 배치에 합쳐 학습
+    matrix = sparse.random(25, 12, density=0.4, random_state=1, format='csr', dtype=np.float32)
+    user_factors, item_factors, state = fit_embeddings(matrix, 8, {'method': 'incremental', 'batch_size': 10})
+    
+    assert user_factors.shape == (25, 8) and item_factors.shape == (12, 8)
+    np.testing.assert_allclose(state['mean'], np.asarray(matrix.mean(axis=0)).ravel(), rtol=1e-5)
+    
+    with pytest.raises(ValueError):
+        fit_embeddings(sparse.csr_matrix((0, 12), dtype=np.float32), 8, {'method': 'incremental'})
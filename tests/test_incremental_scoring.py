@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+import tenseal as ts
+import yaml
+from pathlib import Path
+
+from catalog import sync_catalog, load_catalog
+
+REPO_CONFIG = Path(__file__).resolve().parent.parent / 'config' / 'params.yaml'
+VECTOR_DIM = 64
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """작은 벡터 차원의 키/사용자 암호문/설정을 가진 작업 디렉토리"""
+    with open(REPO_CONFIG, 'r') as f:
+        config = yaml.safe_load(f)
+    config['performance']['num_threads'] = 1
+    config['evaluation']['compare_reference'] = False
+    (tmp_path / 'config').mkdir()
+    with open(tmp_path / 'config' / 'params.yaml', 'w') as f:
+        yaml.safe_dump(config, f)
+    
+    seal = config['seal']
+    context = ts.context(ts.SCHEME_TYPE.CKKS, seal['poly_modulus_degree'],
+                         coeff_mod_bit_sizes=seal['coeff_mod_bit_sizes'])
+    context.global_scale = 2 ** seal['scale_bits']
+    context.generate_galois_keys()
+    user = np.random.default_rng(0).standard_normal(VECTOR_DIM) / np.sqrt(VECTOR_DIM)
+    (tmp_path / 'keys').mkdir()
+    (tmp_path / 'data' / 'encrypted').mkdir(parents=True)
+    (tmp_path / 'data' / 'encrypted' / 'user_0.bin').write_bytes(ts.ckks_vector(context, user.tolist()).serialize())
+    secret = context.copy()
+    context.make_context_public()
+    (tmp_path / 'keys' / 'public_context.bin').write_bytes(context.serialize())
+    
+    monkeypatch.chdir(tmp_path)
+    yield config, secret, user
+
+def evaluate(config, item_vectors):
+    """data_prep처럼 카탈로그를 갱신한 뒤 서버 평가"""
+    # 모듈 import 시 로그 파일 경로가 정해지므로 작업 디렉토리로 옮긴 뒤 import
+    from evaluator import compute_encrypted_recommendations
+    Path('data/processed').mkdir(parents=True, exist_ok=True)
+    np.save('data/processed/item_vectors.npy', item_vectors)
+    sync_catalog(item_vectors, config)
+    return compute_encrypted_recommendations(user_id=0, item_vectors=item_vectors)
+
+def test_delta_then_append_keeps_reused_scores(workspace):
+    config, secret, user = workspace
+    rng = np.random.default_rng(1)
+    item_vectors = rng.standard_normal((600, VECTOR_DIM)).astype(np.float32) / np.sqrt(VECTOR_DIM)
+    evaluate(config, item_vectors)
+    
+    # delta: 기존 아이템 일부가 바뀌고 새 아이템 3개 추가 -> 두 세그먼트를 함께 다시 계산
+    item_vectors = item_vectors.copy()
+    item_vectors[:10] *= 0.5
+    item_vectors = np.vstack([item_vectors, rng.standard_normal((3, VECTOR_DIM)).astype(np.float32) / 8])
+    evaluate(config, item_vectors)
+    
+    # 아이템 5개 추가: 앞의 두 세그먼트는 이전 점수 파일에서 옮김
+    item_vectors = np.vstack([item_vectors, rng.standard_normal((5, VECTOR_DIM)).astype(np.float32) / 8])
+    result = evaluate(config, item_vectors)
+    assert result['num_items_scored'] == 5
+    
+    from decrypt import decrypt_scores
+    scores, header = decrypt_scores(secret, result['output_path'], config['seal'])
+    assert len(header['segments']) == 3
+    assert scores.shape[0] == len(item_vectors)
+    np.testing.assert_allclose(scores[:, 0], item_vectors @ user, atol=1e-3)
+
+def test_evaluator_rejects_missing_or_stale_catalog(workspace):
+    config, _, _ = workspace
+    from evaluator import compute_encrypted_recommendations
+    rng = np.random.default_rng(2)
+    item_vectors = rng.standard_normal((20, VECTOR_DIM)).astype(np.float32) / np.sqrt(VECTOR_DIM)
+    Path('data/processed').mkdir(parents=True, exist_ok=True)
+    np.save('data/processed/item_vectors.npy', item_vectors)
+    
+    with pytest.raises(FileNotFoundError):
+        compute_encrypted_recommendations(user_id=0, item_vectors=item_vectors)
+    
+    catalog, _ = sync_catalog(item_vectors, config)
+    item_vectors[3] *= 2
+    with pytest.raises(ValueError):
+        compute_encrypted_recommendations(user_id=0, item_vectors=item_vectors)
+    # 서버는 카탈로그를 고치지 않음
+    assert load_catalog() == catalog
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+import tenseal as ts
+
+from rotations import rotation_steps, create_galois_keys, attach_galois_keys
+
+# attach_galois_keys는 TenSEAL 직렬화 형식(TenSEALContextProto)을 직접 고치므로
+# requirements.txt에 고정한 버전에서 다시 로드한 컨텍스트로 회전이 되는지 확인한다.
+SEAL_CONFIG = {'poly_modulus_degree': 8192, 'coeff_mod_bit_sizes': [60, 40, 40, 60]}
+VECTOR_DIM = 8
+
+@pytest.fixture(scope='module')
+def contexts():
+    context = ts.context(ts.SCHEME_TYPE.CKKS, SEAL_CONFIG['poly_modulus_degree'],
+                         coeff_mod_bit_sizes=SEAL_CONFIG['coeff_mod_bit_sizes'])
+    context.global_scale = 2 ** 40
+    galois_keys = create_galois_keys(context, SEAL_CONFIG, sorted(rotation_steps('per_item', VECTOR_DIM)))
+    secret_bytes = context.serialize(save_secret_key=True)
+    context.make_context_public()
+    public_bytes = attach_galois_keys(context.serialize(), galois_keys)
+    return ts.context_from(secret_bytes), public_bytes
+
+def test_attached_context_round_trips(contexts):
+    _, public_bytes = contexts
+    public = ts.context_from(public_bytes)
+    
+    assert public.is_public()
+    assert public.has_galois_keys()
+    assert ts.context_from(public.serialize()).has_galois_keys()
+
+def test_attached_keys_rotate(contexts):
+    secret, public_bytes = contexts
+    public = ts.context_from(public_bytes)
+    user = np.arange(1, VECTOR_DIM + 1) / VECTOR_DIM
+    item = np.linspace(-1.0, 1.0, VECTOR_DIM)
+    
+    # dot은 합산 회전(2^k < vector_dim)을 사용
+    enc_user = ts.ckks_vector_from(public, ts.ckks_vector(secret, user.tolist()).serialize())
+    score = ts.ckks_vector_from(secret, enc_user.dot(item.tolist()).serialize()).decrypt()[0]
+    
+    assert score == pytest.approx(float(user @ item), abs=1e-4)
+
+def test_secret_context_rejected(contexts):
+    secret, _ = contexts
+    with pytest.raises(ValueError):
+        attach_galois_keys(secret.serialize(save_secret_key=True), b'')